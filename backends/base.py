@@ -1,5 +1,115 @@
 """Base for all the Backend options for the Storehouse NApp."""
-from abc import ABC
+import hashlib
+import pickle
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+
+from napps.kytos.storehouse.search import MetadataIndex
+
+
+def metadata_from_box(box):
+    """Return a metadata from box."""
+    return {"box_id": box.box_id,
+            "owner": box.owner,
+            "created_at": box.created_at,
+            "revision": box.revision,
+            "hash": box.hash}
+
+
+class _Revisions:
+    """Last revision given to a box by this process."""
+
+    lock = threading.Lock()
+    last = 0
+
+
+def next_revision(after=None):
+    """Return a new revision, greater than after and than the last one.
+
+    Revisions are the current time in microseconds, bumped when needed, so
+    they keep increasing across restarts of the NApp and are exact numbers
+    in JSON.
+    """
+    with _Revisions.lock:
+        _Revisions.last = max(int(time.time() * 1e6), _Revisions.last + 1,
+                              (after or 0) + 1)
+        return _Revisions.last
+
+
+def content_hash(data):
+    """Return a hex digest of the data of a box."""
+    return hashlib.blake2b(pickle.dumps(data, pickle.HIGHEST_PROTOCOL),
+                           digest_size=16).hexdigest()
+
+
+def stamp(box):
+    """Give a box a new revision and the hash of its data before a write."""
+    box.revision = next_revision(box.revision)
+    box.hash = content_hash(box.data)
+    return box
+
+
+def first_box_ids(box_ids, limit, after=None):
+    """Return the limit smallest distinct box_ids greater than after, sorted.
+
+    The box_ids can be any iterable, in any order. At most limit of them
+    are kept in memory.
+    """
+    page = []
+    for box_id in box_ids:
+        if after is not None and box_id <= after:
+            continue
+        if len(page) == limit and box_id >= page[-1]:
+            continue
+        index = bisect_left(page, box_id)
+        if index < len(page) and page[index] == box_id:
+            continue
+        page.insert(index, box_id)
+        if len(page) > limit:
+            page.pop()
+    return page
+
+
+def patch_record(data, metadata=None):
+    """Return what is journaled for a PATCH of a box.
+
+    That is the data, with the new revision and hash of the box when its
+    metadata is given. Journals written by previous versions only hold the
+    data.
+    """
+    if metadata is None:
+        return data
+    return [data, metadata['revision'], metadata['hash']]
+
+
+def apply_patch(box, record):
+    """Merge a PATCH journaled as returned by patch_record into a box."""
+    if isinstance(record, list):
+        data, box.revision, box.hash = record
+    else:
+        data = record
+    box.data.update(data)
+
+
+class NotFoundException(ValueError):
+    """Not Found Exception."""
+
+
+class RevisionConflict(ValueError):
+    """The box does not have the revision expected by a write."""
+
+
+def check_revision(revision, expected_revision=None):
+    """Raise RevisionConflict if revision is not the expected one.
+
+    Nothing is checked if expected_revision is None. The revision of a box
+    that does not exist is None.
+    """
+    if expected_revision is not None and revision != expected_revision:
+        raise RevisionConflict(f"Box revision is {revision}, expected "
+                               f"{expected_revision}")
 
 
 class StoreBase(ABC):
@@ -8,20 +118,151 @@ class StoreBase(ABC):
     Define the necessary methods for those classes.
     """
 
+    @abstractmethod
     def create(self, box):
         """Create a new box."""
 
+    @abstractmethod
     def retrieve(self, namespace, box_id):
-        """Retrieve a box from a namespace."""
+        """Return a box of a namespace, or a false value if not found."""
+
+    @abstractmethod
+    def update(self, namespace, box, expected_revision=None):
+        """Replace a box of a namespace.
+
+        If expected_revision is given, the box is only replaced if it still
+        has that revision, checked atomically with the write. Otherwise
+        RevisionConflict is raised.
+        """
+
+    def patch(self, namespace, box_id, data, expected_revision=None):
+        """Merge data into the data of a box.
+
+        The merged box is stamped with a new revision and the hash of its
+        data. Return it, or False if the box does not exist, and raise
+        RevisionConflict if it does not have the expected_revision. Backends
+        override this method to store only the change instead of rewriting
+        the whole box.
+        """
+        box = self.retrieve(namespace, box_id)
+        if not box:
+            return False
+        check_revision(box.revision, expected_revision)
+        box.data.update(data)
+        self.update(namespace, stamp(box), expected_revision)
+        return box
+
+    def exists(self, namespace, box_id):
+        """Return True if a box exists in a namespace.
 
+        Backends override this method to check without reading the box.
+        """
+        return bool(self.retrieve(namespace, box_id))
+
+    def head(self, namespace, box_id):
+        """Return the 'size' and 'revision' of a box, or None if not found.
+
+        The size is the number of bytes stored for the box and the revision
+        changes whenever the box is written. Either is None if the backend
+        does not know it. Backends override this method to answer without
+        reading and decoding the box.
+        """
+        if not self.exists(namespace, box_id):
+            return None
+        return {'size': None, 'revision': None}
+
+    @abstractmethod
     def delete(self, namespace, box_id):
-        """Delete a box from a namespace."""
+        """Delete a box from a namespace and return whether it existed."""
+
+    def create_many(self, boxes):
+        """Create several boxes.
+
+        Backends override this method to write the boxes in a single batch.
+        """
+        for box in boxes:
+            self.create(box)
+
+    def retrieve_many(self, namespace, box_ids):
+        """Return a dict with the box, or a false value, of each box_id."""
+        return {box_id: self.retrieve(namespace, box_id)
+                for box_id in box_ids}
+
+    def delete_many(self, namespace, box_ids):
+        """Return a dict telling whether each box_id was deleted."""
+        return {box_id: self.delete(namespace, box_id)
+                for box_id in box_ids}
 
+    @abstractmethod
     def list(self, namespace):
-        """List all the boxes in a namespace."""
+        """Return the box_ids of a namespace."""
 
+    def list_page(self, namespace, limit, after=None):
+        """Return up to limit box_ids of a namespace, in order.
+
+        Only the box_ids greater than after are returned, so the last
+        box_id of a page is where the next page starts. Backends storing
+        sorted keys override this method to read only the page.
+        """
+        return first_box_ids(self.list(namespace), limit, after)
+
+    @abstractmethod
     def list_namespaces(self):
-        """List all the namespaces registered."""
+        """Return the namespaces registered."""
+
+    def list_metadata(self, namespace):
+        """Return the metadata of every box in a namespace.
+
+        Boxes that cannot be read, or were deleted meanwhile, are skipped.
+        Backends keeping a metadata manifest override this method to avoid
+        retrieving every box.
+        """
+        boxes = (self.retrieve(namespace, box_id)
+                 for box_id in self.list(namespace))
+        return [metadata_from_box(box) for box in boxes if box]
+
+    def search_metadata(self, namespace, field, query, mode='contains'):
+        """Return the metadata of the boxes of a namespace matching query.
+
+        It is used before the metadata cache of the namespace is loaded.
+        Backends storing indexed metadata override this method to avoid
+        listing the whole namespace.
+
+        Raises:
+            ValueError: if mode is unknown or the regex is invalid.
+
+        """
+        index = MetadataIndex()
+        for metadata in self.list_metadata(namespace):
+            index.add(namespace, metadata)
+        return index.search(namespace, field, query, mode)
+
+    def backup(self, namespace, box_id=None):
+        """Return an iterator over the boxes of a namespace.
+
+        If box_id is given, only that box is returned. The boxes are
+        retrieved one at a time while iterating, but NotFoundException is
+        raised right away if the namespace or the box does not exist.
+        """
+        if box_id is not None:
+            box = self.retrieve(namespace, box_id)
+            if not box:
+                raise NotFoundException("Box not found")
+            return iter([box])
+
+        if namespace not in self.list_namespaces():
+            raise NotFoundException("Namespace not found")
+
+        boxes = (self.retrieve(namespace, box_id)
+                 for box_id in self.list(namespace))
+        return (box for box in boxes if box)
+
+    def sync(self):
+        """Flush the writes returned so far to stable storage.
+
+        Backends whose writes are durable once they return keep this
+        default, which does nothing.
+        """
 
-    def backup(self, namespace, box_id):
-        """Backup one or all the namespaces registered."""
+    def close(self):
+        """Release the resources held by the backend."""
@@ -1,11 +1,23 @@
 """etcd backend for storehouse."""
 
-import pickle
+import json
+from itertools import chain, islice
 from typing import Union
 
 import etcd3
+from etcd3 import etcdrpc
+from etcd3.utils import increment_last_byte, to_bytes
 
-from napps.kytos.storehouse.backends.base import StoreBase
+from kytos.core import log
+from napps.kytos.storehouse import settings
+from napps.kytos.storehouse.backends import serializers
+from napps.kytos.storehouse.backends.base import (NotFoundException,
+                                                  RevisionConflict,
+                                                  StoreBase, check_revision,
+                                                  metadata_from_box)
+
+#: Prefix of the keys holding the metadata manifest, one key per box.
+MANIFEST_PREFIX = '__manifest__/'
 
 
 def split_fullname(fullname: bytes):
@@ -25,41 +37,277 @@ def join_fullname(namespace: Union[bytes, str], box_id: Union[bytes, str]):
     return f'{namespace}.{box_id}'
 
 
+def chunks(items, size):
+    """Split a list of items in lists of at most size items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
 class Etcd(StoreBase):
     """etcd client."""
 
-    def __init__(self):
-        self.etcd = etcd3.client()
+    def __init__(self, client=None):
+        self.etcd = client if client is not None else etcd3.client()
+        self.max_txn_ops = getattr(settings, 'ETCD_MAX_TXN_OPS', 128)
+        self.page_size = getattr(settings, 'ETCD_PAGE_SIZE', 1000)
+        self.serializer = serializers.from_settings()
 
     def _get_all_keys(self):
-        return (r[1].key for r in self.etcd.get_all(keys_only=True))
+        # A range_end of b'\0' reads every key from start onwards.
+        return (key for key, _ in self._scan_range(b'\0', b'\0',
+                                                   keys_only=True)
+                if not key.startswith(MANIFEST_PREFIX.encode()))
+
+    def _range(self, key_range, limit=0, revision=None, keys_only=False):
+        """Send a RangeRequest for the keys in [start, range_end).
+
+        The etcd3 client drops the limit and revision arguments of
+        get_range_response, so the request is built and sent here.
+
+        Args:
+            key_range(tuple): (start, range_end) of the keys.
+
+        """
+        start, range_end = key_range
+        request = etcdrpc.RangeRequest()
+        request.key = to_bytes(start)
+        request.range_end = to_bytes(range_end)
+        request.limit = limit
+        if revision is not None:
+            request.revision = revision
+        request.keys_only = keys_only
+        # The enum values are generated by protobuf, unseen by pylint.
+        # pylint: disable=no-member
+        request.sort_order = etcdrpc.RangeRequest.ASCEND
+        request.sort_target = etcdrpc.RangeRequest.KEY
+        # pylint: enable=no-member
+        return self.etcd.kvstub.Range(
+            request, self.etcd.timeout,
+            credentials=self.etcd.call_credentials,
+            metadata=self.etcd.metadata)
 
     def create(self, box):
-        """Create a new box."""
-        raw_data = pickle.dumps(box)
-        return self.etcd.put(join_fullname(box.namespace, box.box_id),
-                             raw_data)
+        """Create a new box and its manifest entry in one transaction."""
+        fullname = join_fullname(box.namespace, box.box_id)
+        raw_data = self.serializer.dumps(box)
+        metadata = json.dumps(metadata_from_box(box))
+        put = self.etcd.transactions.put
+        return self.etcd.transaction(
+            compare=[],
+            success=[put(fullname, raw_data),
+                     put(MANIFEST_PREFIX + fullname, metadata)],
+            failure=[])
+
+    def create_many(self, boxes):
+        """Create several boxes in as few transactions as possible."""
+        put = self.etcd.transactions.put
+        for batch in chunks(list(boxes), self.max_txn_ops // 2):
+            operations = []
+            for box in batch:
+                fullname = join_fullname(box.namespace, box.box_id)
+                operations.append(put(fullname,
+                                      self.serializer.dumps(box)))
+                operations.append(put(MANIFEST_PREFIX + fullname,
+                                      json.dumps(metadata_from_box(box))))
+            self.etcd.transaction(compare=[], success=operations,
+                                  failure=[])
 
     def retrieve(self, namespace, box_id):
         """Retrieve a box from a namespace."""
         raw_data, _ = self.etcd.get(join_fullname(namespace, box_id))
-        return pickle.loads(raw_data) if raw_data else raw_data
+        return self.serializer.loads(raw_data) if raw_data else raw_data
+
+    def exists(self, namespace, box_id):
+        """Return True if the key of a box exists, reading no value."""
+        key = to_bytes(join_fullname(namespace, box_id))
+        response = self._range((key, key + b'\0'), limit=1, keys_only=True)
+        return bool(response.kvs)
+
+    def head(self, namespace, box_id):
+        """Return the size of a box and its revision, from its manifest."""
+        fullname = join_fullname(namespace, box_id)
+        get = self.etcd.transactions.get
+        _, (box, manifest) = self.etcd.transaction(
+            compare=[], success=[get(fullname),
+                                 get(MANIFEST_PREFIX + fullname)],
+            failure=[])
+        if not box:
+            return None
+        revision = json.loads(manifest[0][0]).get('revision') \
+            if manifest else None
+        return {'size': len(box[0][0]), 'revision': revision}
+
+    def update(self, namespace, box, expected_revision=None):
+        """Replace a box and its manifest entry in one transaction.
+
+        If expected_revision is given, the manifest entry is read first and
+        the transaction compares its mod_revision, so it fails if the box
+        was written in between.
+        """
+        fullname = join_fullname(namespace, box.box_id)
+        compare = []
+        if expected_revision is not None:
+            raw_metadata, metadata = self.etcd.get(MANIFEST_PREFIX + fullname)
+            check_revision(json.loads(raw_metadata).get('revision')
+                           if raw_metadata else None, expected_revision)
+            compare.append(self.etcd.transactions.mod(
+                MANIFEST_PREFIX + fullname) == metadata.mod_revision)
+
+        put = self.etcd.transactions.put
+        succeeded, _ = self.etcd.transaction(
+            compare=compare,
+            success=[put(fullname, self.serializer.dumps(box)),
+                     put(MANIFEST_PREFIX + fullname,
+                         json.dumps(metadata_from_box(box)))],
+            failure=[])
+        if not succeeded:
+            raise RevisionConflict(f"Box {fullname} was changed while being "
+                                   f"updated")
+        return box.box_id
+
+    def retrieve_many(self, namespace, box_ids):
+        """Retrieve several boxes in as few transactions as possible."""
+        get = self.etcd.transactions.get
+        results = {}
+        for batch in chunks(list(box_ids), self.max_txn_ops):
+            _, responses = self.etcd.transaction(
+                compare=[],
+                success=[get(join_fullname(namespace, box_id))
+                         for box_id in batch],
+                failure=[])
+            for box_id, response in zip(batch, responses):
+                results[box_id] = (self.serializer.loads(response[0][0])
+                                   if response else None)
+        return results
 
     def delete(self, namespace, box_id):
-        """Delete a box from a namespace."""
-        return self.etcd.delete(join_fullname(namespace, box_id))
+        """Delete a box and its manifest entry from a namespace."""
+        fullname = join_fullname(namespace, box_id)
+        delete = self.etcd.transactions.delete
+        _, responses = self.etcd.transaction(
+            compare=[],
+            success=[delete(fullname), delete(MANIFEST_PREFIX + fullname)],
+            failure=[])
+        return responses[0].response_delete_range.deleted > 0
+
+    def delete_many(self, namespace, box_ids):
+        """Delete several boxes in as few transactions as possible."""
+        delete = self.etcd.transactions.delete
+        results = {}
+        for batch in chunks(list(box_ids), self.max_txn_ops // 2):
+            operations = []
+            for box_id in batch:
+                fullname = join_fullname(namespace, box_id)
+                operations.append(delete(fullname))
+                operations.append(delete(MANIFEST_PREFIX + fullname))
+            _, responses = self.etcd.transaction(compare=[],
+                                                 success=operations,
+                                                 failure=[])
+            for box_id, response in zip(batch, responses[::2]):
+                results[box_id] = response.response_delete_range.deleted > 0
+        return results
+
+    def _scan_prefix(self, prefix, keys_only=False, start=None):
+        """Yield (key, value) of every key starting with prefix.
+
+        The keys are read in pages of at most page_size keys, from start if
+        given. Every page is read at the revision of the first one, so the
+        scan sees a consistent snapshot even if keys are changed while it
+        is consumed.
+        """
+        range_end = increment_last_byte(to_bytes(prefix))
+        return self._scan_range(start or prefix, range_end, keys_only)
+
+    def _scan_range(self, start, range_end, keys_only=False):
+        """Yield (key, value) of every key in [start, range_end)."""
+        start = to_bytes(start)
+        revision = None
+        while True:
+            response = self._range((start, range_end), limit=self.page_size,
+                                   revision=revision, keys_only=keys_only)
+            if revision is None:
+                revision = response.header.revision
+            for pair in response.kvs:
+                yield pair.key, pair.value
+            if not response.more or not response.kvs:
+                return
+            start = response.kvs[-1].key + b'\0'
+
+    def _scan_namespace(self, prefix, namespace, keys_only=False,
+                        after=None):
+        """Yield (box_id, value) of the keys of a namespace under prefix.
+
+        Keys of nested namespaces, such as "namespace.sub.box_id", share the
+        "namespace." prefix and are skipped. If after is given, the scan
+        starts at the next box_id.
+        """
+        fullname_prefix = join_fullname(prefix + namespace, '')
+        start = None
+        if after is not None:
+            start = to_bytes(fullname_prefix + after) + b'\0'
+        for key, value in self._scan_prefix(fullname_prefix, keys_only,
+                                            start):
+            box_id = key[len(fullname_prefix):]
+            if b'.' not in box_id:
+                yield box_id.decode(), value
+
+    def list_metadata(self, namespace):
+        """Return the metadata of every box in a namespace.
+
+        The metadata is read from the manifest keys. Missing entries are
+        rebuilt from the boxes and stale ones are removed.
+        """
+        records = {box_id: json.loads(value) for box_id, value in
+                   self._scan_namespace(MANIFEST_PREFIX, namespace)}
+        box_ids = {box_id for box_id, _ in
+                   self._scan_namespace('', namespace, keys_only=True)}
+
+        for box_id in box_ids - set(records):
+            log.info(f"Rebuilding manifest entry of {namespace}.{box_id}")
+            box = self.retrieve(namespace, box_id)
+            if not box:
+                log.warning(f"Skipping box {namespace}.{box_id} that could "
+                            "not be read")
+                continue
+            records[box_id] = metadata_from_box(box)
+            self.etcd.put(MANIFEST_PREFIX + join_fullname(namespace, box_id),
+                          json.dumps(records[box_id]))
+        for box_id in set(records) - box_ids:
+            self.etcd.delete(MANIFEST_PREFIX + join_fullname(namespace,
+                                                             box_id))
+            del records[box_id]
+
+        return list(records.values())
 
     def list(self, namespace):
-        """List all the box_id's in a namespace."""
-        result = self.etcd.get_prefix(namespace, keys_only=True)
-        return (split_fullname(obj.key)[1] for (_, obj) in result)
+        """Iterate over the box_id's in a namespace, page by page."""
+        return (box_id for box_id, _ in
+                self._scan_namespace('', namespace, keys_only=True))
+
+    def list_page(self, namespace, limit, after=None):
+        """Return up to limit box_ids of a namespace, read as a key range."""
+        return [box_id for box_id, _ in
+                islice(self._scan_namespace('', namespace, keys_only=True,
+                                            after=after), limit)]
 
     def list_namespaces(self):
         """List all the namespaces registered."""
-        return set(split_fullname(k)[0] for k in self._get_all_keys())
+        return set(split_fullname(k)[0].decode()
+                   for k in self._get_all_keys())
+
+    def backup(self, namespace, box_id=None):
+        """Return an iterator over the boxes of a namespace.
+
+        The namespace is scanned page by page, unpickling one box at a time.
+        NotFoundException is raised right away if it has no boxes.
+        """
+        if box_id is not None:
+            return super().backup(namespace, box_id)
 
-    def backup(self, namespace=None, box_id=None):
-        """Backup all the namespaces registered."""
-        return (pickle.loads(box) for box in self.etcd.get_all())
+        items = self._scan_namespace('', namespace)
+        first = next(items, None)
+        if first is None:
+            raise NotFoundException("Namespace not found")
+        return (self.serializer.loads(value)
+                for _, value in chain([first], items))
 
     get = retrieve
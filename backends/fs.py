@@ -3,16 +3,41 @@
 Save and load data from the local filesystem.
 """
 
-import logging
+import hashlib
 import os
 import pickle
+import struct
+import tempfile
+import threading
 from pathlib import Path
 
-from filelock import FileLock
-
 from kytos.core import log
 from napps.kytos.storehouse import settings
-from napps.kytos.storehouse.backends.base import StoreBase
+from napps.kytos.storehouse.backends import serializers
+from napps.kytos.storehouse.backends.base import (StoreBase, apply_patch,
+                                                  check_revision,
+                                                  first_box_ids,
+                                                  metadata_from_box,
+                                                  patch_record, stamp)
+from napps.kytos.storehouse.backends.locks import (ShardedLock,
+                                                   remove_stale_locks)
+from napps.kytos.storehouse.backends.manifest import (Manifests,
+                                                      load_metadata, tagged)
+
+#: Directory, inside the destination path, holding the metadata manifests.
+MANIFEST_DIR = '.manifests'
+#: Directory, inside the lock path, holding the shard lock files.
+LOCK_DIR = 'storehouse'
+#: Directory, inside the destination path, holding the PATCH journals.
+JOURNAL_DIR = '.journal'
+#: Directory, inside the destination path, where boxes are written before
+#: being renamed into place.
+TMP_DIR = '.tmp'
+#: Number of paths written without a sync after which they are synced.
+MAX_UNSYNCED = 4096
+#: Prefix of every entry of a PATCH journal: inode and modification time of
+#: the box file it applies to, and the length of the record.
+JOURNAL_ENTRY = struct.Struct('>QQI')
 
 
 def _create_dirs(destination):
@@ -20,19 +45,38 @@ def _create_dirs(destination):
     Path(destination).mkdir(parents=True, exist_ok=True)
 
 
-class NotFoundException(Exception):
-    """Not Found Exception."""
+def _fsync(path):
+    """Flush a file, or the entries of a directory, to the disk."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _file_tag(stat):
+    """Return what identifies a version of a box file.
+
+    Every write of a box creates a new file, so the inode and modification
+    time change whenever the box is replaced.
+    """
+    return stat.st_ino, stat.st_mtime_ns
 
 
 class FileSystem(StoreBase):
     """Backend class for dealing with FileSystem operation.
 
     Save and load data from the local filesystem.
+
+    Boxes are written to a temporary file that is renamed over the box file,
+    so readers always see a whole box and take no lock. The file lock of a
+    box only orders its writers. Journaled PATCHes are tagged with the box
+    file they apply to, so a reader ignores the ones already folded into, or
+    superseded by, the box file it opened.
     """
 
     def __init__(self):
         """Initialize directory paths for the FileSystem backend."""
-        logging.getLogger("filelock").setLevel(logging.WARNING)
         self.destination_path = getattr(settings,
                                         'CUSTOM_DESTINATION_PATH',
                                         '/var/tmp/kytos/storehouse')
@@ -40,6 +84,21 @@ class FileSystem(StoreBase):
                                  'CUSTOM_LOCK_PATH',
                                  '/var/tmp/lock')
         self._parse_settings()
+        self.manifests = Manifests(Path(self.destination_path, MANIFEST_DIR))
+        self.serializer = serializers.from_settings()
+        self.journal_max_entries = getattr(settings,
+                                           'PATCH_JOURNAL_MAX_ENTRIES', 64)
+        self._unsynced = set()
+        self._unsynced_lock = threading.Lock()
+        self.locks = ShardedLock(Path(self.lock_path, LOCK_DIR),
+                                 getattr(settings, 'FS_LOCK_SHARDS', 256),
+                                 getattr(settings, 'FS_LOCK_FILES', 16))
+        threading.Thread(target=self._remove_stale_locks,
+                         name='storehouse-lock-cleanup', daemon=True).start()
+        self.hashed_layout = getattr(settings, 'FS_HASHED_LAYOUT', False)
+        if self.hashed_layout:
+            threading.Thread(target=self._migrate_in_background,
+                             name='storehouse-migration', daemon=True).start()
 
     def _parse_settings(self):
         """Parse settings.
@@ -63,90 +122,447 @@ class FileSystem(StoreBase):
         """Get the destination path in this workspace."""
         return Path(self.destination_path, namespace)
 
-    def _write_to_file(self, filename, box):
-        dotted_filename = str(filename).replace('/', '.')
-        lockfile = f'{self.lock_path}/{dotted_filename}.lock'
-        lock = FileLock(lockfile)
-        with lock:
-            with open(filename, 'wb') as save_file:
-                pickle.dump(box, save_file)
+    def _get_hashed_path(self, namespace, box_id):
+        """Get the path of a box in the hashed layout."""
+        digest = hashlib.blake2b(box_id.encode(), digest_size=2).hexdigest()
+        return Path(self.destination_path, namespace, digest[:2], digest[2:],
+                    box_id)
+
+    def _get_box_path(self, namespace, box_id):
+        """Get the path where a new box is written."""
+        if self.hashed_layout:
+            return self._get_hashed_path(namespace, box_id)
+        return self._get_destination(namespace).joinpath(box_id)
+
+    def _box_paths(self, namespace, box_id):
+        """Return the paths a box may be stored at.
+
+        Boxes are only ever moved from the flat to the hashed layout, so a
+        reader trying them in this order finds a box being migrated.
+        """
+        return (self._get_destination(namespace).joinpath(box_id),
+                self._get_hashed_path(namespace, box_id))
+
+    def _find_box(self, namespace, box_id):
+        """Return the path of a stored box, or None."""
+        for path in self._box_paths(namespace, box_id):
+            if path.is_file():
+                return path
+        return None
+
+    def _box_key(self, filename):
+        """Return the (namespace, box_id) stored at filename."""
+        parts = Path(filename).relative_to(self.destination_path).parts
+        return parts[0], parts[-1]
+
+    def _get_journal(self, filename):
+        """Get the path of the PATCH journal of a box file."""
+        return Path(self.destination_path, JOURNAL_DIR,
+                    *self._box_key(filename))
+
+    def _lock(self, filename):
+        return self.locks.acquire('/'.join(self._box_key(filename)))
+
+    def _remove_stale_locks(self):
+        """Remove the lock files of every box left by previous versions."""
+        prefix = str(self.destination_path).replace('/', '.') + '.'
+        removed = remove_stale_locks(self.lock_path, prefix)
+        if removed:
+            log.info(f"Removed {removed} stale lock files from "
+                     f"{self.lock_path}")
+
+    def _write_box(self, filename, box):
+        """Atomically replace a box file, discarding its PATCH journal.
+
+        The temporary file is always synced before it is renamed, so a
+        crash never leaves an empty or partial box file. The directory is
+        flushed by the next sync, which the write pipeline runs before
+        acknowledging the write unless the durability is "none".
+        """
+        tmp_dir = Path(self.destination_path, TMP_DIR)
+        _create_dirs(tmp_dir)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as save_file:
+                save_file.write(self.serializer.dumps(box))
+                save_file.flush()
+                os.fsync(save_file.fileno())
+            os.replace(tmp_path, filename)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._delete_journal(filename)
+        self._mark_unsynced(filename.parent)
+
+    def _delete_journal(self, filename):
+        try:
+            self._get_journal(filename).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _read_journal(self, filename):
+        """Return the (tag, data) of every PATCH journaled for a box file."""
+        try:
+            with open(self._get_journal(filename), 'rb') as journal_file:
+                buffer = journal_file.read()
+        except FileNotFoundError:
+            return []
+
+        patches = []
+        offset = 0
+        while offset + JOURNAL_ENTRY.size <= len(buffer):
+            inode, mtime, size = JOURNAL_ENTRY.unpack_from(buffer, offset)
+            offset += JOURNAL_ENTRY.size
+            if offset + size > len(buffer):
+                log.warning(f"Discarding torn entry of the journal of "
+                            f"{filename}")
+                break
+            patches.append(((inode, mtime), self.serializer.loads_data(
+                buffer[offset:offset + size])))
+            offset += size
+        return patches
+
+    def _load_box(self, filename):
+        """Read a box and apply its journaled PATCHes.
+
+        The journal is read before the box file. Any PATCH missing from it
+        was written after the read started, and PATCHes tagged with another
+        file are already part of the box, or were replaced by a PUT.
+
+        Returns:
+            tuple: the box and the number of PATCHes applied.
+
+        """
+        patches = self._read_journal(filename)
+        with open(filename, 'rb') as load_file:
+            tag = _file_tag(os.fstat(load_file.fileno()))
+            box = self.serializer.loads(load_file.read())
+        applied = 0
+        for patch_tag, record in patches:
+            if patch_tag == tag:
+                apply_patch(box, record)
+                applied += 1
+        return box, applied
 
     def _load_from_file(self, filename):
-        dotted_filename = str(filename).replace('/', '.')
-        lockfile = f'{self.lock_path}/{dotted_filename}.lock'
-        lock = FileLock(lockfile)
-        with lock:
-            try:
-                with open(filename, 'rb') as load_file:
-                    data = pickle.load(load_file)
-                return data
-            except pickle.PickleError:
+        try:
+            box, patches = self._load_box(filename)
+            if patches > self.journal_max_entries:
+                with self._lock(filename):
+                    box, patches = self._load_box(filename)
+                    if patches > self.journal_max_entries:
+                        self._write_box(filename, box)
+        except (FileNotFoundError, IsADirectoryError, EOFError,
+                pickle.PickleError, ValueError):
+            return False
+        return box
+
+    def _make_room(self, namespace, box_id, depth=0):
+        """Migrate a flat box named like the hashed directory of box_id.
+
+        It must be called without holding any box lock.
+        """
+        first = self._get_hashed_path(namespace, box_id).parent.parent
+        if depth < 4 and first.is_file():
+            self._migrate_box(namespace, first.name, depth + 1)
+
+    def _revision(self, filename):
+        """Return the revision of a box file with its PATCHes applied."""
+        if filename is None:
+            return None
+        try:
+            return self._load_box(filename)[0].revision
+        except (FileNotFoundError, EOFError, pickle.PickleError,
+                ValueError):
+            return None
+
+    def _box_tag(self, filename):
+        """Return the manifest tag of a box file and its PATCH journal."""
+        try:
+            journal_size = self._get_journal(filename).stat().st_size
+        except FileNotFoundError:
+            journal_size = 0
+        return [*_file_tag(filename.stat()), journal_size]
+
+    def _store(self, namespace, box, expected_revision=None):
+        """Write a box where it is stored, or at its layout path if new.
+
+        The expected_revision is checked under the lock of the box.
+
+        Returns:
+            list: the manifest tag of the box written.
+
+        """
+        if self.hashed_layout:
+            self._make_room(namespace, box.box_id)
+        with self.locks.acquire(f'{namespace}/{box.box_id}'):
+            path = self._find_box(namespace, box.box_id)
+            if expected_revision is not None:
+                check_revision(self._revision(path), expected_revision)
+            path = path or self._get_box_path(namespace, box.box_id)
+            _create_dirs(path.parent)
+            self._write_box(path, box)
+            return self._box_tag(path)
+
+    def _delete_box(self, namespace, box_id):
+        """Delete a box file and its journal, returning True if it existed."""
+        with self.locks.acquire(f'{namespace}/{box_id}'):
+            path = self._find_box(namespace, box_id)
+            if path is None:
+                return False
+            path.unlink()
+            self._delete_journal(path)
+            self._mark_unsynced(path.parent)
+            return True
+
+    def _migrate_box(self, namespace, box_id, depth=0):
+        """Move a box from the flat to the hashed layout."""
+        self._make_room(namespace, box_id, depth)
+        with self.locks.acquire(f'{namespace}/{box_id}'):
+            source = self._get_destination(namespace).joinpath(box_id)
+            if not source.is_file():
                 return False
+            target = self._get_hashed_path(namespace, box_id)
+            _create_dirs(target.parent)
+            os.replace(source, target)
+            self._mark_unsynced(source.parent, target.parent)
+            return True
 
-    @staticmethod
-    def _delete_file(path):
-        if path.exists():
-            return path.unlink()
+    def migrate(self, namespace=None):
+        """Move the boxes of flat namespaces to the hashed layout.
 
-        return False
+        Boxes stay readable while they are moved, and the PATCH journals of
+        the moved boxes remain valid.
 
-    def _list_namespace(self, namespace):
-        path = self._get_destination(namespace)
-        if path.exists():
-            return [x.name for x in path.iterdir() if not x.is_dir()]
+        Returns:
+            int: number of boxes moved.
 
-        return []
+        """
+        namespaces = [namespace] if namespace else self.list_namespaces()
+        moved = 0
+        for name in namespaces:
+            try:
+                entries = os.scandir(self._get_destination(name))
+            except FileNotFoundError:
+                continue
+            with entries:
+                box_ids = [entry.name for entry in entries
+                           if entry.is_file() and
+                           not entry.name.startswith('.')]
+            for box_id in box_ids:
+                try:
+                    moved += self._migrate_box(name, box_id)
+                except OSError as exception:
+                    log.warning(f"Box {name}.{box_id} kept in the flat "
+                                f"layout: {exception}")
+            self.sync()
+        return moved
+
+    def _migrate_in_background(self):
+        try:
+            moved = self.migrate()
+        except OSError as exception:
+            log.error(f"Migration to the hashed layout failed: {exception}")
+            return
+        if moved:
+            log.info(f"Moved {moved} boxes to the hashed layout.")
+
+    def _iter_namespace(self, namespace):
+        """Yield the boxes of a namespace in both layouts, in no order.
+
+        The entries are read with scandir, which tells files from
+        directories without a stat per entry on most file systems. A box
+        being migrated may be yielded twice.
+        """
+        try:
+            entries = os.scandir(self._get_destination(namespace))
+        except FileNotFoundError:
+            return
+
+        hashed_dirs = []
+        with entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_file():
+                    yield entry.name
+                elif entry.is_dir():
+                    hashed_dirs.append(entry.path)
+        for first in hashed_dirs:
+            with os.scandir(first) as seconds:
+                second_dirs = [entry.path for entry in seconds
+                               if entry.is_dir()]
+            for second in second_dirs:
+                with os.scandir(second) as entries:
+                    yield from (entry.name for entry in entries
+                                if entry.is_file())
+
+    def _list_namespace(self, namespace):
+        """List the boxes of a namespace in both layouts."""
+        return list(dict.fromkeys(self._iter_namespace(namespace)))
 
     def create(self, box):
         """Create a new box."""
-        destination = self._get_destination(box.namespace)
-        _create_dirs(destination)
-        self._write_to_file(destination.joinpath(box.box_id), box)
+        tag = self._store(box.namespace, box)
+        self.manifests.get(box.namespace).add(tagged(metadata_from_box(box),
+                                                     tag))
         return box.box_id
 
+    def create_many(self, boxes):
+        """Create several boxes, updating each namespace manifest once."""
+        by_namespace = {}
+        for box in boxes:
+            by_namespace.setdefault(box.namespace, []).append(box)
+
+        for namespace, namespace_boxes in by_namespace.items():
+            tags = [self._store(namespace, box) for box in namespace_boxes]
+            self.manifests.get(namespace).add_many(
+                tagged(metadata_from_box(box), tag)
+                for box, tag in zip(namespace_boxes, tags))
+
     def retrieve(self, namespace, box_id):
         """Retrieve a box from a namespace."""
-        destination = self._get_destination(namespace).joinpath(box_id)
-        if not destination.is_file():
-            return False
+        for path in self._box_paths(namespace, box_id):
+            box = self._load_from_file(path)
+            if box:
+                return box
+        return False
+
+    def exists(self, namespace, box_id):
+        """Return True if a box exists, with a stat of its file."""
+        return self._find_box(namespace, box_id) is not None
 
-        return self._load_from_file(destination)
+    def head(self, namespace, box_id):
+        """Return the size of the box file and of its PATCH journal.
 
-    def update(self, namespace, box):
+        The revision is read from the box with its PATCHes applied.
+        """
+        path = self._find_box(namespace, box_id)
+        if path is None:
+            return None
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return None
+        try:
+            size += self._get_journal(path).stat().st_size
+        except FileNotFoundError:
+            pass
+        return {'size': size, 'revision': self._revision(path)}
+
+    def update(self, namespace, box, expected_revision=None):
         """Update a box from a namespace."""
-        destination = self._get_destination(namespace)
-        self._write_to_file(destination.joinpath(box.box_id), box)
+        tag = self._store(namespace, box, expected_revision)
+        self.manifests.get(namespace).add(tagged(metadata_from_box(box), tag))
         return box.box_id
 
+    def patch(self, namespace, box_id, data, expected_revision=None):
+        """Append data to the PATCH journal of a box.
+
+        The box is read under its lock to journal the revision and hash of
+        the merged box, which is returned. The journal is folded into the
+        box file once it is as large as the box, or on the next read once
+        it has more than PATCH_JOURNAL_MAX_ENTRIES entries.
+        """
+        with self.locks.acquire(f'{namespace}/{box_id}'):
+            filename = self._find_box(namespace, box_id)
+            if filename is None:
+                return False
+            stat = filename.stat()
+            box, _ = self._load_box(filename)
+            check_revision(box.revision, expected_revision)
+            box.data.update(data)
+            metadata = metadata_from_box(stamp(box))
+            record = self.serializer.dumps_data(namespace,
+                                                patch_record(data, metadata))
+            journal = self._get_journal(filename)
+            _create_dirs(journal.parent)
+            with open(journal, 'ab') as journal_file:
+                journal_file.write(JOURNAL_ENTRY.pack(*_file_tag(stat),
+                                                      len(record)) + record)
+                journal_size = journal_file.tell()
+            self._mark_unsynced(journal, journal.parent)
+            if journal_size >= stat.st_size:
+                self._write_box(filename, box)
+            tag = self._box_tag(filename)
+        self.manifests.get(namespace).add(tagged(metadata, tag))
+        return box
+
     def delete(self, namespace, box_id):
         """Delete a box from a namespace."""
-        destination = self._get_destination(namespace).joinpath(box_id)
-
-        return self._delete_file(destination) is None
+        deleted = self._delete_box(namespace, box_id)
+        if deleted:
+            self.manifests.get(namespace).remove(box_id)
+        return deleted
+
+    def delete_many(self, namespace, box_ids):
+        """Delete several boxes, updating the namespace manifest once."""
+        results = {box_id: self._delete_box(namespace, box_id)
+                   for box_id in box_ids}
+        deleted = [box_id for box_id, result in results.items() if result]
+        if deleted:
+            self.manifests.get(namespace).remove_many(deleted)
+        return results
 
     def list(self, namespace):
         """List all the boxes in a namespace."""
         return self._list_namespace(namespace)
 
+    def list_page(self, namespace, limit, after=None):
+        """Return up to limit box_ids of a namespace, in order.
+
+        File names are not sorted, so the directories are scanned, keeping
+        only the page in memory.
+        """
+        return first_box_ids(self._iter_namespace(namespace), limit, after)
+
     def list_namespaces(self):
         """List all the namespaces registered."""
         path = self._get_destination('.')
         if path.exists():
-            return [x.name for x in path.iterdir() if x.is_dir()]
+            return [x.name for x in path.iterdir()
+                    if x.is_dir() and not x.name.startswith('.')]
         return []
 
-    def backup(self, namespace, box_id=None):
-        """Make a dump of all boxes on a Namespace in a JSON format.
+    def list_metadata(self, namespace):
+        """Return the metadata of every box in a namespace.
 
-        If box_id is empty, then this method will return all boxes from the
-        namespace.
+        The metadata is read from the namespace manifest, whose entries are
+        checked against the inode, mtime and journal size of each box.
         """
-        if namespace not in self.list_namespaces():
-            raise NotFoundException("Namespace not found")
-
-        if box_id is None:
-            boxes = self.list(namespace)
-        else:
-            boxes = [box_id]
+        tags = {}
+        for box_id in self.list(namespace):
+            path = self._find_box(namespace, box_id)
+            if path is None:
+                continue
+            try:
+                tags[box_id] = self._box_tag(path)
+            except FileNotFoundError:
+                pass
+        return load_metadata(self.manifests.get(namespace), tags,
+                             lambda box_id: self.retrieve(namespace, box_id))
+
+    def _mark_unsynced(self, *paths):
+        """Remember paths changed since the last sync."""
+        with self._unsynced_lock:
+            self._unsynced.update(paths)
+            full = len(self._unsynced) >= MAX_UNSYNCED
+        if full:
+            self.sync()
+
+    def sync(self):
+        """Flush the boxes, directories and journals changed to the disk.
+
+        A directory changed by several writes is flushed once.
+        """
+        with self._unsynced_lock:
+            paths, self._unsynced = self._unsynced, set()
+        for path in paths:
+            try:
+                _fsync(path)
+            except FileNotFoundError:
+                pass
 
-        return {box: self.retrieve(namespace, box).to_json() for box in boxes}
+    def close(self):
+        """Close the shard lock files."""
+        self.locks.close()
@@ -0,0 +1,88 @@
+"""Locks ordering the writers of the file based backends.
+
+Keys are hashed to a fixed number of shards. Each shard has an in-process
+lock, for threads of the same process, and a one byte fcntl range lock in
+one of a few shard files, for other processes sharing the same directory.
+"""
+
+import fcntl
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+from napps.kytos.storehouse.profiling import phase
+
+
+class ShardedLock:
+    """Fixed set of locks shared by any number of keys.
+
+    Two keys may share a shard, so a thread must not acquire a key while it
+    holds another one.
+    """
+
+    def __init__(self, directory, shards=256, files=16):
+        self.directory = Path(directory)
+        self.shards = shards
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._locks = [threading.Lock() for _ in range(shards)]
+        # fcntl locks are released when any descriptor of the file is
+        # closed by the process, so the shard files stay open.
+        self._fds = [os.open(self.directory.joinpath(f'shard-{index}.lock'),
+                             os.O_RDWR | os.O_CREAT, 0o644)
+                     for index in range(min(files, shards))]
+
+    def shard(self, key):
+        """Return the shard of a key."""
+        return zlib.crc32(str(key).encode()) % self.shards
+
+    @contextmanager
+    def acquire(self, key):
+        """Hold the lock of the shard of key, in and across processes."""
+        shard = self.shard(key)
+        fd = self._fds[shard % len(self._fds)]
+        offset = shard // len(self._fds)
+        lock = self._locks[shard]
+        with phase('lock'):
+            lock.acquire()
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX, 1, offset)
+            except BaseException:
+                lock.release()
+                raise
+        try:
+            yield
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, offset)
+            lock.release()
+
+    def close(self):
+        """Close the shard files, releasing their locks."""
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
+
+
+def remove_stale_locks(directory, prefix):
+    """Remove the per-box lock files left by previous versions.
+
+    Returns:
+        int: number of files removed.
+
+    """
+    removed = 0
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return removed
+    with entries:
+        for entry in entries:
+            if (entry.name.startswith(prefix) and
+                    entry.name.endswith('.lock')):
+                try:
+                    os.unlink(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+    return removed
@@ -0,0 +1,559 @@
+"""Log-structured Backend for the Storehouse NApp.
+
+Append every box to a segment file and keep an in-memory offset index, so
+writes are sequential and no per-box file or lock file is needed.
+"""
+
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+
+from kytos.core import log
+from napps.kytos.storehouse import settings
+from napps.kytos.storehouse.backends import serializers
+from napps.kytos.storehouse.backends.base import (StoreBase, apply_patch,
+                                                  check_revision,
+                                                  first_box_ids,
+                                                  metadata_from_box,
+                                                  patch_record, stamp)
+from napps.kytos.storehouse.backends.manifest import (Manifests,
+                                                      load_metadata, tagged)
+from napps.kytos.storehouse.profiling import TimedLock
+
+# crc32, record type, namespace length, box_id length, payload length
+HEADER = struct.Struct('>IBHHI')
+
+PUT = 1
+DELETE = 2
+PATCH = 3
+
+SEGMENT_SUFFIX = '.seg'
+#: Directory, inside the destination path, holding the metadata manifests.
+MANIFEST_DIR = '.manifests'
+
+
+def _segment_name(segment_id):
+    """Return the file name of a segment given its id."""
+    return f'{segment_id:08d}{SEGMENT_SUFFIX}'
+
+
+def encode_record(record_type, namespace, box_id, payload=b''):
+    """Return the bytes of a record ready to be appended to a segment."""
+    namespace = namespace.encode()
+    box_id = box_id.encode()
+    body = HEADER.pack(0, record_type, len(namespace), len(box_id),
+                       len(payload))[4:] + namespace + box_id + payload
+    return struct.pack('>I', zlib.crc32(body)) + body
+
+
+def decode_record(buffer, offset=0):
+    """Decode the record starting at offset.
+
+    Returns:
+        tuple: (record_type, namespace, box_id, payload, size) or None if
+        the buffer does not hold a complete and valid record at offset.
+
+    """
+    if len(buffer) - offset < HEADER.size:
+        return None
+    crc, record_type, ns_len, id_len, payload_len = \
+        HEADER.unpack_from(buffer, offset)
+    size = HEADER.size + ns_len + id_len + payload_len
+    if len(buffer) - offset < size:
+        return None
+    body = bytes(buffer[offset + 4:offset + size])
+    if zlib.crc32(body) != crc:
+        return None
+    start = HEADER.size - 4
+    namespace = body[start:start + ns_len].decode()
+    box_id = body[start + ns_len:start + ns_len + id_len].decode()
+    payload = body[start + ns_len + id_len:]
+    return record_type, namespace, box_id, payload, size
+
+
+def iter_records(buffer, end):
+    """Yield the offset and the decoded record of the records of a buffer.
+
+    It stops at end or at the first record that cannot be decoded.
+    """
+    offset = 0
+    while offset < end:
+        record = decode_record(buffer, offset)
+        if record is None:
+            return
+        yield offset, record
+        offset += record[4]
+
+
+class LogStore(StoreBase):
+    """Backend class storing boxes in append-only segment files.
+
+    Every create, update and delete appends a record to the active segment.
+    The location of the latest record of each box is kept in memory and
+    rebuilt from the segments on startup. Sealed segments with too many dead
+    records are rewritten by a background compaction thread.
+
+    A PATCH appends a record with only the changed data, applied on top of
+    the latest whole box when it is read. The PATCH records of a box are
+    folded into a new whole box record once they are too many or as large
+    as the box, and when compaction rewrites any of them.
+    """
+
+    def __init__(self):
+        """Open the segment files and rebuild the index."""
+        self.destination_path = getattr(settings,
+                                        'CUSTOM_LOGSTORE_PATH',
+                                        '/var/tmp/kytos/storehouse-log')
+        self.segment_size = getattr(settings, 'LOGSTORE_SEGMENT_SIZE',
+                                    64 * 1024 * 1024)
+        self.compaction_ratio = getattr(settings,
+                                        'LOGSTORE_COMPACTION_RATIO', 0.5)
+        self.compaction_interval = getattr(settings,
+                                           'LOGSTORE_COMPACTION_INTERVAL', 60)
+        self._parse_settings()
+        self.manifests = Manifests(self.destination_path.joinpath(
+            MANIFEST_DIR))
+        self.serializer = serializers.from_settings()
+        self.journal_max_entries = getattr(settings,
+                                           'PATCH_JOURNAL_MAX_ENTRIES', 64)
+
+        self._lock = TimedLock(threading.RLock())
+        self._index = {}
+        self._patches = {}
+        self._readers = {}
+        self._sizes = {}
+        self._live = {}
+        self._active_id = None
+        self._active_file = None
+        self._load_segments()
+
+        self._stop = threading.Event()
+        self._compactor = threading.Thread(target=self._compaction_loop,
+                                           name='storehouse-compaction',
+                                           daemon=True)
+        self._compactor.start()
+
+    def _parse_settings(self):
+        """Parse settings.
+
+        If kytos is running in a virtualenv, the destination_path will be
+        joined to the root of virtualenv path.
+        """
+        base_env = os.environ.get('VIRTUAL_ENV', None) or '/'
+        destination = str(self.destination_path).lstrip(os.path.sep)
+        self.destination_path = Path(base_env).joinpath(destination)
+        self.destination_path.mkdir(parents=True, exist_ok=True)
+        log.debug(f"LogStore destination_path: {self.destination_path}")
+
+    def _segment_path(self, segment_id):
+        return self.destination_path.joinpath(_segment_name(segment_id))
+
+    def _segment_ids(self):
+        return sorted(int(path.name[:-len(SEGMENT_SUFFIX)])
+                      for path in self.destination_path.iterdir()
+                      if path.name.endswith(SEGMENT_SUFFIX))
+
+    def _load_segments(self):
+        """Replay every segment in order to rebuild the in-memory index."""
+        segment_ids = self._segment_ids()
+        for segment_id in segment_ids:
+            self._replay_segment(segment_id,
+                                 last=segment_id == segment_ids[-1])
+        self._open_active(segment_ids[-1] if segment_ids else 0)
+
+    def _replay_segment(self, segment_id, last=False):
+        path = self._segment_path(segment_id)
+        buffer = path.read_bytes()
+        offset = 0
+        self._readers[segment_id] = os.open(path, os.O_RDONLY)
+        self._sizes[segment_id] = 0
+        self._live[segment_id] = 0
+        while offset < len(buffer):
+            record = decode_record(buffer, offset)
+            if record is None:
+                break
+            record_type, namespace, box_id, _, size = record
+            self._apply(record_type, namespace, box_id,
+                        (segment_id, offset, size))
+            offset += size
+
+        if offset < len(buffer):
+            log.warning(f"LogStore: discarding {len(buffer) - offset} "
+                        f"corrupted bytes at the end of {path}")
+            if last:
+                os.truncate(path, offset)
+        self._sizes[segment_id] = offset
+
+    def _open_active(self, segment_id):
+        """Open segment_id as the segment that receives new records."""
+        if self._active_file is not None:
+            # The sealed segment may hold writes not synced yet.
+            os.fsync(self._active_file.fileno())
+            self._active_file.close()
+        path = self._segment_path(segment_id)
+        self._active_file = open(path, 'ab')
+        self._active_id = segment_id
+        if segment_id not in self._readers:
+            self._readers[segment_id] = os.open(path, os.O_RDONLY)
+            self._sizes[segment_id] = 0
+            self._live[segment_id] = 0
+
+    def _apply(self, record_type, namespace, box_id, location):
+        """Point the index to a new record, accounting the dead bytes.
+
+        Args:
+            location(tuple): (segment_id, offset, size) of the record.
+
+        """
+        segment_id, _, size = location
+        if record_type == PATCH:
+            if self._locate(namespace, box_id) is not None:
+                self._patches.setdefault(namespace, {}).setdefault(
+                    box_id, []).append(location)
+                self._live[segment_id] += size
+            return
+
+        boxes = self._index.setdefault(namespace, {})
+        previous = boxes.pop(box_id, None)
+        if previous is not None:
+            self._live[previous[0]] -= previous[2]
+        for patch in self._pop_patches(namespace, box_id):
+            self._live[patch[0]] -= patch[2]
+        if record_type == PUT:
+            boxes[box_id] = location
+            self._live[segment_id] += size
+        elif not boxes:
+            del self._index[namespace]
+
+    def _append(self, records):
+        """Append encoded records to the active segment.
+
+        Args:
+            records(list): list of (record_type, namespace, box_id, payload)
+
+        """
+        with self._lock:
+            if self._sizes[self._active_id] >= self.segment_size:
+                self._open_active(self._active_id + 1)
+            offset = self._sizes[self._active_id]
+            chunks = []
+            for record_type, namespace, box_id, payload in records:
+                raw = encode_record(record_type, namespace, box_id, payload)
+                self._apply(record_type, namespace, box_id,
+                            (self._active_id, offset, len(raw)))
+                chunks.append(raw)
+                offset += len(raw)
+            self._active_file.write(b''.join(chunks))
+            self._active_file.flush()
+            self._sizes[self._active_id] = offset
+
+    def _read(self, location):
+        segment_id, offset, size = location
+        buffer = os.pread(self._readers[segment_id], size, offset)
+        return decode_record(buffer)
+
+    def _locate(self, namespace, box_id):
+        return self._index.get(namespace, {}).get(box_id)
+
+    def _locate_patches(self, namespace, box_id):
+        return self._patches.get(namespace, {}).get(box_id, [])
+
+    def _tag(self, namespace, box_id):
+        """Return the manifest tag of a box: where its last record is."""
+        patches = self._locate_patches(namespace, box_id)
+        location = patches[-1] if patches else self._locate(namespace, box_id)
+        return None if location is None else list(location[:2])
+
+    def _pop_patches(self, namespace, box_id):
+        patches = self._patches.get(namespace)
+        if not patches:
+            return []
+        locations = patches.pop(box_id, [])
+        if not patches:
+            del self._patches[namespace]
+        return locations
+
+    def _read_box(self, namespace, box_id):
+        """Read the records of a box and return it with its PATCHes applied.
+
+        Returns False if the box does not exist and None if one of its
+        records is corrupted.
+        """
+        with self._lock:
+            location = self._locate(namespace, box_id)
+            if location is None:
+                return False
+            records = [self._read(location)]
+            records.extend(self._read(patch) for patch in
+                           self._locate_patches(namespace, box_id))
+
+        if None in records:
+            log.error(f"LogStore: corrupted record for {namespace}.{box_id}")
+            return None
+        box = self.serializer.loads(records[0][3])
+        for record in records[1:]:
+            apply_patch(box, self.serializer.loads_data(record[3]))
+        return box
+
+    def create(self, box):
+        """Create a new box."""
+        record = self.serializer.dumps(box)
+        with self._lock:
+            self._append([(PUT, box.namespace, box.box_id, record)])
+            tag = self._tag(box.namespace, box.box_id)
+        self.manifests.get(box.namespace).add(tagged(metadata_from_box(box),
+                                                     tag))
+        return box.box_id
+
+    def create_many(self, boxes):
+        """Create several boxes appending them in a single write."""
+        records = [(PUT, box.namespace, box.box_id,
+                    self.serializer.dumps(box)) for box in boxes]
+        with self._lock:
+            self._append(records)
+            tags = [self._tag(box.namespace, box.box_id) for box in boxes]
+        by_namespace = {}
+        for box, tag in zip(boxes, tags):
+            by_namespace.setdefault(box.namespace, []).append(
+                tagged(metadata_from_box(box), tag))
+        for namespace, metadatas in by_namespace.items():
+            self.manifests.get(namespace).add_many(metadatas)
+
+    def retrieve(self, namespace, box_id):
+        """Retrieve a box from a namespace."""
+        return self._read_box(namespace, box_id) or False
+
+    def exists(self, namespace, box_id):
+        """Return True if a box is in the index."""
+        with self._lock:
+            return self._locate(namespace, box_id) is not None
+
+    def head(self, namespace, box_id):
+        """Return the size of the records of a box, read from the index.
+
+        The revision is read from the box with its PATCHes applied.
+        """
+        with self._lock:
+            location = self._locate(namespace, box_id)
+            if location is None:
+                return None
+            size = location[2] + sum(patch[2] for patch in
+                                     self._locate_patches(namespace, box_id))
+        box = self._read_box(namespace, box_id)
+        return {'size': size, 'revision': box.revision if box else None}
+
+    def _check_revision(self, namespace, box_id, expected_revision):
+        """Check the revision of a box, holding the lock of the store."""
+        if expected_revision is not None:
+            box = self._read_box(namespace, box_id)
+            check_revision(box.revision if box else None, expected_revision)
+
+    def update(self, namespace, box, expected_revision=None):
+        """Update a box from a namespace.
+
+        The expected_revision is checked under the lock of the store.
+        """
+        record = self.serializer.dumps(box)
+        with self._lock:
+            self._check_revision(namespace, box.box_id, expected_revision)
+            self._append([(PUT, namespace, box.box_id, record)])
+            tag = self._tag(namespace, box.box_id)
+        self.manifests.get(namespace).add(tagged(metadata_from_box(box), tag))
+        return box.box_id
+
+    def patch(self, namespace, box_id, data, expected_revision=None):
+        """Append a record with the data to be merged into a box.
+
+        The box is read under the lock of the store to journal the revision
+        and hash of the merged box, which is returned.
+        """
+        with self._lock:
+            box = self._read_box(namespace, box_id)
+            if not box:
+                return False
+            check_revision(box.revision, expected_revision)
+            box.data.update(data)
+            metadata = metadata_from_box(stamp(box))
+            payload = self.serializer.dumps_data(namespace,
+                                                 patch_record(data, metadata))
+            self._append([(PATCH, namespace, box_id, payload)])
+            location = self._locate(namespace, box_id)
+            patches = self._locate_patches(namespace, box_id)
+            if (len(patches) > self.journal_max_entries or
+                    sum(patch[2] for patch in patches) >= location[2]):
+                self._append([(PUT, namespace, box_id,
+                               self.serializer.dumps(box))])
+            tag = self._tag(namespace, box_id)
+        self.manifests.get(namespace).add(tagged(metadata, tag))
+        return box
+
+    def _fold(self, namespace, box_id):
+        """Replace the records of a box by a single whole box record."""
+        box = self._read_box(namespace, box_id)
+        if box:
+            self._append([(PUT, namespace, box_id,
+                           self.serializer.dumps(box))])
+        return box
+
+    def delete(self, namespace, box_id):
+        """Delete a box from a namespace."""
+        with self._lock:
+            if self._locate(namespace, box_id) is None:
+                return False
+            self._append([(DELETE, namespace, box_id, b'')])
+        self.manifests.get(namespace).remove(box_id)
+        return True
+
+    def delete_many(self, namespace, box_ids):
+        """Delete several boxes appending their deletions in a single write."""
+        with self._lock:
+            results = {box_id: self._locate(namespace, box_id) is not None
+                       for box_id in box_ids}
+            deleted = [box_id for box_id, result in results.items() if result]
+            if deleted:
+                self._append([(DELETE, namespace, box_id, b'')
+                              for box_id in deleted])
+        if deleted:
+            self.manifests.get(namespace).remove_many(deleted)
+        return results
+
+    def list(self, namespace):
+        """List all the boxes in a namespace."""
+        with self._lock:
+            return list(self._index.get(namespace, {}))
+
+    def list_page(self, namespace, limit, after=None):
+        """Return up to limit box_ids of a namespace, in order."""
+        with self._lock:
+            return first_box_ids(self._index.get(namespace, {}), limit,
+                                 after)
+
+    def list_namespaces(self):
+        """List all the namespaces registered."""
+        with self._lock:
+            return list(self._index)
+
+    def list_metadata(self, namespace):
+        """Return the metadata of every box in a namespace.
+
+        The metadata is read from the namespace manifest, whose entries are
+        checked against the location of the last record of each box.
+        """
+        with self._lock:
+            tags = {box_id: self._tag(namespace, box_id)
+                    for box_id in self._index.get(namespace, {})}
+        return load_metadata(self.manifests.get(namespace), tags,
+                             lambda box_id: self.retrieve(namespace, box_id))
+
+    def _compaction_loop(self):
+        while not self._stop.wait(self.compaction_interval):
+            try:
+                self.compact()
+            except OSError as exception:
+                log.error(f"LogStore compaction failed: {exception}")
+
+    def _dead_ratio(self, segment_id):
+        size = self._sizes[segment_id]
+        if not size:
+            return 1.0
+        return 1 - self._live[segment_id] / size
+
+    def compact(self):
+        """Rewrite the live records of sealed segments with dead records.
+
+        Live records are appended again to the active segment and the old
+        segment file is removed. Deletions are carried over while an older
+        segment could still hold a record for the same box.
+        """
+        with self._lock:
+            candidates = [segment_id for segment_id in self._sizes
+                          if segment_id != self._active_id and
+                          self._dead_ratio(segment_id) >=
+                          self.compaction_ratio]
+
+        for segment_id in candidates:
+            self._compact_segment(segment_id)
+
+    def _live_records(self, segment_id, buffer):
+        """Split the records of a segment that are still live.
+
+        Returns:
+            tuple: the records to copy to the active segment, the payload
+                of the boxes with patches by (namespace, box_id), to be
+                folded, and the tag of the copied boxes by (namespace,
+                box_id).
+
+        """
+        records = []
+        folds = {}
+        moved = {}
+        for offset, (record_type, namespace, box_id, payload, size) in \
+                iter_records(buffer, self._sizes[segment_id]):
+            location = self._locate(namespace, box_id)
+            patches = self._locate_patches(namespace, box_id)
+            here = (segment_id, offset, size)
+            if patches and (location == here or here in patches):
+                folds[(namespace, box_id)] = (
+                    payload if location == here else
+                    folds.get((namespace, box_id)))
+            elif location == here:
+                records.append((PUT, namespace, box_id, payload))
+                moved[(namespace, box_id)] = [segment_id, offset]
+            elif (record_type == DELETE and location is None and
+                  min(self._sizes) < segment_id):
+                records.append((DELETE, namespace, box_id, b''))
+        return records, folds, moved
+
+    def _compact_segment(self, segment_id):
+        path = self._segment_path(segment_id)
+        buffer = path.read_bytes()
+        with self._lock:
+            records, folds, moved = self._live_records(segment_id, buffer)
+            if records:
+                self._append(records)
+            for (namespace, box_id), payload in folds.items():
+                moved[(namespace, box_id)] = self._tag(namespace, box_id)
+                if not self._fold(namespace, box_id) and payload:
+                    self._append([(PUT, namespace, box_id, payload)])
+            self._retag(moved)
+            os.fsync(self._active_file.fileno())
+            os.close(self._readers.pop(segment_id))
+            del self._sizes[segment_id]
+            del self._live[segment_id]
+            path.unlink()
+        log.debug(f"LogStore: compacted segment {path}")
+
+    def _retag(self, moved):
+        """Record in the manifests the boxes moved by a compaction.
+
+        Args:
+            moved(dict): tag before the compaction by (namespace, box_id).
+
+        """
+        by_namespace = {}
+        for (namespace, box_id), old in moved.items():
+            new = self._tag(namespace, box_id)
+            if new is not None and new != old:
+                by_namespace.setdefault(namespace, []).append((box_id, old,
+                                                               new))
+        for namespace, moves in by_namespace.items():
+            self.manifests.get(namespace).retag_many(moves)
+
+    def sync(self):
+        """Flush the records appended so far to the disk."""
+        with self._lock:
+            if self._active_file is not None:
+                os.fsync(self._active_file.fileno())
+
+    def close(self):
+        """Stop the compaction thread and close the segment files."""
+        self._stop.set()
+        with self._lock:
+            if self._active_file is not None:
+                self._active_file.close()
+                self._active_file = None
+            for reader in self._readers.values():
+                os.close(reader)
+            self._readers.clear()
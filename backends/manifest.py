@@ -0,0 +1,201 @@
+"""Metadata manifest shared by the file based backends.
+
+A manifest is a JSON lines journal with the metadata of the boxes of one
+namespace, so the NApp can build its metadata cache without unpickling every
+box at startup. Every entry is tagged with the version of the box it was
+written for, so the boxes written without their entry, e.g. because of a
+crash, are found and read again.
+"""
+
+import json
+import os
+from pathlib import Path
+from threading import Lock
+
+from kytos.core import log
+from napps.kytos.storehouse.backends.base import metadata_from_box
+
+
+class Manifest:
+    """Append-only journal of box metadata for a namespace.
+
+    The journal is rewritten with one entry per box once it has more than
+    twice as many lines as boxes, plus COMPACTION_SLACK, when it is loaded
+    or appended to.
+    """
+
+    #: Lines allowed on top of twice the number of boxes.
+    COMPACTION_SLACK = 64
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = Lock()
+        # Lines in the file and boxes they recorded when it was last read
+        # or written whole. Appends only add lines, so once there are too
+        # many the journal is replayed to count the boxes again.
+        self._lines = 0
+        self._boxes = 0
+
+    def _too_long(self):
+        return self._lines > 2 * self._boxes + self.COMPACTION_SLACK
+
+    def _append(self, entries):
+        lines = [json.dumps(entry, separators=(',', ':')) + '\n'
+                 for entry in entries]
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a') as manifest_file:
+                manifest_file.write(''.join(lines))
+            self._lines += len(lines)
+            if self._too_long():
+                records = self._replay()
+                if records is not None and self._too_long():
+                    self._write(records)
+
+    def add(self, metadata):
+        """Record the metadata of a created box."""
+        self.add_many([metadata])
+
+    def add_many(self, metadatas):
+        """Record the metadata of several created boxes in one write."""
+        self._append({'op': 'add', **metadata} for metadata in metadatas)
+
+    def retag_many(self, moves):
+        """Record boxes whose records were moved without being changed.
+
+        Args:
+            moves(iterable): (box_id, old_tag, new_tag) of each box. The tag
+                of an entry is only replaced if it still is old_tag.
+
+        """
+        self._append({'op': 'tag', 'box_id': box_id, 'from': list(old),
+                      'to': list(new)} for box_id, old, new in moves)
+
+    def remove(self, box_id):
+        """Record the deletion of a box."""
+        self.remove_many([box_id])
+
+    def remove_many(self, box_ids):
+        """Record the deletion of several boxes in one write."""
+        self._append({'op': 'remove', 'box_id': box_id} for box_id in box_ids)
+
+    def _replay(self):
+        """Read the journal, holding the lock of the manifest."""
+        records = {}
+        lines = 0
+        try:
+            with open(self.path) as manifest_file:
+                for line in manifest_file:
+                    entry = json.loads(line)
+                    operation = entry.pop('op')
+                    if operation == 'add':
+                        records[entry['box_id']] = entry
+                    elif operation == 'tag':
+                        record = records.get(entry['box_id'])
+                        if record and record.get('tag') == entry['from']:
+                            record['tag'] = entry['to']
+                    else:
+                        records.pop(entry['box_id'], None)
+                    lines += 1
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as exception:
+            log.warning(f"Discarding corrupted manifest {self.path}: "
+                        f"{exception}")
+            return None
+        self._lines, self._boxes = lines, len(records)
+        return records
+
+    def load(self):
+        """Replay the journal.
+
+        Returns:
+            dict: metadata by box_id, or None if the manifest is missing or
+            unreadable.
+
+        """
+        with self._lock:
+            records = self._replay()
+            if records is not None and self._too_long():
+                self._write(records)
+        return records
+
+    def _write(self, records):
+        """Replace the journal, holding the lock of the manifest."""
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(temp_path, 'w') as manifest_file:
+            for metadata in records.values():
+                manifest_file.write(json.dumps(
+                    {'op': 'add', **metadata}, separators=(',', ':')))
+                manifest_file.write('\n')
+        os.replace(temp_path, self.path)
+        self._lines = self._boxes = len(records)
+
+    def rewrite(self, records):
+        """Atomically replace the journal by one entry per box."""
+        with self._lock:
+            self._write(records)
+
+
+class Manifests:
+    """Manifests of every namespace, stored in a directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._manifests = {}
+        self._lock = Lock()
+
+    def get(self, namespace):
+        """Return the manifest of a namespace."""
+        with self._lock:
+            manifest = self._manifests.get(namespace)
+            if manifest is None:
+                path = Path(self.directory, f'{namespace}.jsonl')
+                manifest = self._manifests[namespace] = Manifest(path)
+            return manifest
+
+
+def tagged(metadata, tag):
+    """Return the manifest entry of the metadata of a box with its tag."""
+    return {**metadata, 'tag': list(tag)}
+
+
+def load_metadata(manifest, tags, retrieve):
+    """Return the metadata of the stored boxes from a manifest.
+
+    Entries are written after their box, so the manifest may miss the last
+    writes before a crash. An entry is only trusted if it was written with
+    the tag the box has now, e.g. the inode and mtime of its file. The other
+    boxes are read with retrieve and the manifest is rewritten. Boxes that
+    cannot be read, or were deleted meanwhile, are skipped.
+
+    Args:
+        manifest(Manifest): manifest of the namespace
+        tags(dict): tag of every box currently stored, by box_id. It is a
+            list of values that changes whenever the box is written.
+        retrieve(callable): function returning the box of a box_id, or a
+            false value if it cannot be read
+
+    """
+    records = manifest.load() or {}
+    stale = {box_id for box_id, tag in tags.items()
+             if records.get(box_id, {}).get('tag') != list(tag)}
+    if stale or len(records) != len(tags):
+        log.info(f"Reading {len(stale)} boxes missing from or out of date "
+                 f"in metadata manifest {manifest.path}")
+        rebuilt = {}
+        for box_id, tag in tags.items():
+            if box_id not in stale:
+                rebuilt[box_id] = records[box_id]
+                continue
+            box = retrieve(box_id)
+            if box:
+                rebuilt[box_id] = tagged(metadata_from_box(box), tag)
+            else:
+                log.warning(f"Skipping box {box_id} that could not be read "
+                            f"for metadata manifest {manifest.path}")
+        records = rebuilt
+        manifest.rewrite(records)
+    return [{key: value for key, value in record.items() if key != 'tag'}
+            for record in records.values()]
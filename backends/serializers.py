@@ -0,0 +1,228 @@
+"""Serialization of boxes for the storehouse backends.
+
+Every record starts with a small header naming the format of its payload, so
+the format can be changed in the settings while records written with the
+previous one, or by versions of the NApp without a header (plain pickle), are
+still readable.
+"""
+
+import json
+import lzma
+import pickle
+import struct
+import zlib
+
+from kytos.core import log
+from napps.kytos.storehouse import settings
+from napps.kytos.storehouse.box import Box
+from napps.kytos.storehouse.metrics import METRICS
+from napps.kytos.storehouse.profiling import add_payload, phase
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+#: Formats of the payload, as stored in the record header.
+PICKLE, JSON, MSGPACK = 0, 1, 2
+#: Format ids by the names accepted in the SERIALIZER setting.
+FORMATS = {'pickle': PICKLE, 'json': JSON, 'msgpack': MSGPACK}
+#: Record header: magic bytes, payload format and flags.
+HEADER = struct.Struct('>3sBB')
+#: Flags telling how the payload is compressed.
+ZLIB, LZMA = 0x01, 0x02
+#: (flag, compress, decompress) by the names accepted in the settings.
+CODECS = {'zlib': (ZLIB, zlib.compress, zlib.decompress),
+          'lzma': (LZMA, lzma.compress, lzma.decompress)}
+#: A pickle never starts with 0xFF, so legacy records can not be mistaken
+#: for a header.
+MAGIC = b'\xffKS'
+
+
+def box_from_dict(attributes):
+    """Create a box from the dictionary returned by Box.to_dict."""
+    box = Box(attributes['data'], attributes['namespace'],
+              box_id=attributes['id'])
+    box.owner = attributes['owner']
+    box.created_at = attributes['created_at']
+    box.revision = attributes.get('revision')
+    box.hash = attributes.get('hash')
+    return box
+
+
+def _check_lossless(payload_format, value):
+    """Raise TypeError if value would not be decoded as it is encoded.
+
+    Tuples are decoded as lists and, with JSON, dictionary keys as strings.
+    Other types the format does not support are rejected by the encoder.
+    """
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            if payload_format == JSON and not all(isinstance(key, str)
+                                                  for key in item):
+                raise TypeError("JSON object keys must be strings")
+            stack.extend(item)
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, tuple):
+            raise TypeError("tuples would be decoded as lists")
+
+
+def _encode(payload_format, value):
+    if payload_format in (JSON, MSGPACK):
+        _check_lossless(payload_format, value)
+    if payload_format == JSON:
+        return json.dumps(value, separators=(',', ':')).encode()
+    if payload_format == MSGPACK:
+        return msgpack.packb(value, use_bin_type=True)
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(payload_format, payload):
+    if payload_format == JSON:
+        return json.loads(payload)
+    if payload_format == MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack record found but msgpack is not "
+                             "installed")
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    if payload_format == PICKLE:
+        return pickle.loads(payload)
+    raise ValueError(f"Unknown record format {payload_format}")
+
+
+def _decompress(flags, payload):
+    for flag, _, decompress in CODECS.values():
+        if flags == flag:
+            return decompress(payload)
+    if flags:
+        raise ValueError(f"Unknown record flags {flags}")
+    return payload
+
+
+class Serializer:
+    """Encode boxes in the configured format and decode any known format.
+
+    The JSON and msgpack formats only store the box attributes, so reading
+    them never runs arbitrary code as unpickling does. Boxes that can not be
+    encoded in the format, or that would be read back different, such as
+    data with tuples or, with JSON, with dictionary keys that are not
+    strings, are stored with pickle.
+
+    Payloads of at least threshold bytes are compressed with the codec of
+    their namespace, if that makes them smaller. The codec of a namespace is
+    the one given for it, or for its closest parent, in namespaces, or the
+    default compression otherwise.
+    """
+
+    def __init__(self, name='pickle', compression=None, threshold=4096,
+                 namespaces=None):
+        if name not in FORMATS:
+            raise ValueError(f"Unknown serializer '{name}', expected one of "
+                             f"{', '.join(FORMATS)}")
+        namespaces = namespaces or {}
+        for codec in [compression, *namespaces.values()]:
+            if codec is not None and codec not in CODECS:
+                raise ValueError(f"Unknown compression '{codec}', expected "
+                                 f"one of {', '.join(CODECS)} or None")
+        if name == 'msgpack' and msgpack is None:
+            log.warning("msgpack is not installed, using the json "
+                        "serializer instead.")
+            name = 'json'
+        self.name = name
+        self.format = FORMATS[name]
+        self.compression = compression
+        self.threshold = threshold
+        self.namespaces = namespaces
+
+    def codec(self, namespace):
+        """Return the name of the compression codec of a namespace."""
+        parts = str(namespace).split('.')
+        for length in range(len(parts), 0, -1):
+            prefix = '.'.join(parts[:length])
+            if prefix in self.namespaces:
+                return self.namespaces[prefix]
+        return self.compression
+
+    def dumps(self, box):
+        """Return the record of a box, with its header."""
+        return self._dumps(box.namespace, box, box.to_dict())
+
+    def dumps_data(self, namespace, data):
+        """Return the record of the data of a PATCH to a box, with its header.
+
+        Such records are read back with loads_data.
+        """
+        return self._dumps(namespace, data, data)
+
+    @phase('serialize')
+    def _dumps(self, namespace, value, attributes):
+        """Encode attributes, or value if the format is pickle."""
+        payload_format = self.format
+        try:
+            payload = _encode(payload_format, value if payload_format ==
+                              PICKLE else attributes)
+        except (TypeError, ValueError, OverflowError) as exception:
+            log.debug(f"Record of {namespace} stored with pickle: "
+                      f"{exception}")
+            payload_format = PICKLE
+            payload = _encode(PICKLE, value)
+
+        flags = 0
+        codec = self.codec(namespace)
+        if codec is not None and len(payload) >= self.threshold:
+            flag, compress, _ = CODECS[codec]
+            compressed = compress(payload)
+            if len(compressed) < len(payload):
+                payload, flags = compressed, flag
+        record = HEADER.pack(MAGIC, payload_format, flags) + payload
+        METRICS.add_bytes('written', len(record))
+        add_payload(len(record))
+        return record
+
+    @staticmethod
+    @phase('deserialize')
+    def loads(record):
+        """Return the box of a record written in any known format.
+
+        Raises:
+            ValueError: if the record format is unknown or not readable.
+            pickle.UnpicklingError: if a pickle payload is corrupted.
+
+        """
+        if not record.startswith(MAGIC):
+            METRICS.add_bytes('read', len(record))
+            add_payload(len(record))
+            return pickle.loads(record)
+        payload_format, value = Serializer._loads(record)
+        return value if payload_format == PICKLE else box_from_dict(value)
+
+    @staticmethod
+    def loads_data(record):
+        """Return the data of a record written by dumps_data."""
+        return Serializer._loads(record)[1]
+
+    @staticmethod
+    @phase('deserialize')
+    def _loads(record):
+        """Return the format and the decoded payload of a record."""
+        METRICS.add_bytes('read', len(record))
+        add_payload(len(record))
+        _, payload_format, flags = HEADER.unpack_from(record)
+        try:
+            payload = _decompress(flags, record[HEADER.size:])
+        except (zlib.error, lzma.LZMAError) as exception:
+            raise ValueError(f"Corrupted compressed record: {exception}") \
+                from exception
+        return payload_format, _decode(payload_format, payload)
+
+
+def from_settings():
+    """Return a Serializer configured by the NApp settings."""
+    return Serializer(getattr(settings, 'SERIALIZER', 'pickle'),
+                      getattr(settings, 'COMPRESSION', None),
+                      getattr(settings, 'COMPRESSION_THRESHOLD', 4096),
+                      getattr(settings, 'COMPRESSION_NAMESPACES', {}))
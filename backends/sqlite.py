@@ -0,0 +1,389 @@
+"""SQLite Backend for the Storehouse NApp.
+
+Store every box as a row of a single table in WAL mode, so readers never
+block the writer and single node deployments get transactional storage
+without an external service.
+"""
+
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from itertools import chain
+from pathlib import Path
+
+from kytos.core import log
+from napps.kytos.storehouse import settings
+from napps.kytos.storehouse.backends import serializers
+from napps.kytos.storehouse.backends.base import (NotFoundException,
+                                                  StoreBase, check_revision,
+                                                  stamp)
+from napps.kytos.storehouse.profiling import phase
+from napps.kytos.storehouse.search import (INDEXED_FIELDS, SEARCH_MODES,
+                                           _compile)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS boxes ('
+    ' namespace TEXT NOT NULL,'
+    ' box_id TEXT NOT NULL,'
+    ' owner TEXT,'
+    ' created_at TEXT,'
+    ' revision INTEGER,'
+    ' hash TEXT,'
+    ' data BLOB NOT NULL,'
+    ' PRIMARY KEY (namespace, box_id)) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS boxes_owner ON boxes (namespace, owner)',
+    'CREATE INDEX IF NOT EXISTS boxes_created_at'
+    ' ON boxes (namespace, created_at)',
+)
+
+#: Columns added after the first version of the schema, with their type.
+ADDED_COLUMNS = (('revision', 'INTEGER'), ('hash', 'TEXT'))
+
+# The statements are constant strings, so each connection compiles them
+# once and reuses them from its statement cache.
+UPSERT = ('INSERT OR REPLACE INTO boxes (namespace, box_id, owner,'
+          ' created_at, revision, hash, data) VALUES (?, ?, ?, ?, ?, ?, ?)')
+SELECT_DATA = ('SELECT data, revision FROM boxes'
+               ' WHERE namespace = ? AND box_id = ?')
+SELECT_REVISION = ('SELECT revision FROM boxes'
+                   ' WHERE namespace = ? AND box_id = ?')
+SELECT_EXISTS = 'SELECT 1 FROM boxes WHERE namespace = ? AND box_id = ?'
+SELECT_SIZE = ('SELECT length(data), revision FROM boxes'
+               ' WHERE namespace = ? AND box_id = ?')
+UPDATE_DATA = ('UPDATE boxes SET data = ?, revision = ?, hash = ?'
+               ' WHERE namespace = ? AND box_id = ?')
+DELETE = 'DELETE FROM boxes WHERE namespace = ? AND box_id = ?'
+LIST = 'SELECT box_id FROM boxes WHERE namespace = ? ORDER BY box_id'
+LIST_PAGE = ('SELECT box_id FROM boxes WHERE namespace = ? AND box_id > ?'
+             ' ORDER BY box_id LIMIT ?')
+LIST_NAMESPACES = 'SELECT DISTINCT namespace FROM boxes ORDER BY namespace'
+METADATA_COLUMNS = ('box_id', 'owner', 'created_at', 'revision', 'hash')
+LIST_METADATA = (f'SELECT {", ".join(METADATA_COLUMNS)} FROM boxes'
+                 ' WHERE namespace = ? ORDER BY box_id')
+BACKUP = 'SELECT data FROM boxes WHERE namespace = ? ORDER BY box_id'
+
+#: Maximum number of box ids bound to a single statement, below the
+#: SQLITE_MAX_VARIABLE_NUMBER of older SQLite versions.
+MAX_VARIABLES = 500
+
+
+def _regexp(pattern, value):
+    """Implement the REGEXP operator of SQLite."""
+    return value is not None and _compile(pattern).search(value) is not None
+
+
+def _prefix_end(prefix):
+    """Return the smallest string greater than every string with prefix."""
+    last = ord(prefix[-1])
+    if last == 0x10FFFF:
+        return None
+    return prefix[:-1] + chr(last + 1)
+
+
+class _ThreadConnection:
+    """Connection of a thread, kept in a thread local storage."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, connection):
+        self.connection = connection
+
+
+class SQLite(StoreBase):
+    """Backend class storing boxes in a SQLite database.
+
+    Each thread uses its own connection, closed when the thread ends, so
+    reads run concurrently with a write. Writes of several boxes are done
+    in a single transaction, and the metadata of the boxes are indexed
+    columns, so listing and searching a namespace are index lookups.
+    """
+
+    def __init__(self):
+        """Open the database, creating its schema if needed."""
+        self.destination_path = getattr(settings, 'CUSTOM_SQLITE_PATH',
+                                        '/var/tmp/kytos/storehouse.sqlite3')
+        self.synchronous = getattr(settings, 'SQLITE_SYNCHRONOUS', 'NORMAL')
+        self.timeout = getattr(settings, 'SQLITE_BUSY_TIMEOUT', 5)
+        self._parse_settings()
+        self.serializer = serializers.from_settings()
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        with self._transaction() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            columns = {row[1] for row in
+                       connection.execute('PRAGMA table_info(boxes)')}
+            for column, column_type in ADDED_COLUMNS:
+                if column not in columns:
+                    connection.execute(f'ALTER TABLE boxes ADD COLUMN'
+                                       f' {column} {column_type}')
+
+    def _parse_settings(self):
+        """Parse settings.
+
+        If kytos is running in a virtualenv, the destination_path will be
+        joined to the root of virtualenv path.
+        """
+        base_env = os.environ.get('VIRTUAL_ENV', None) or '/'
+        destination = str(self.destination_path).lstrip(os.path.sep)
+        self.destination_path = Path(base_env).joinpath(destination)
+        self.destination_path.parent.mkdir(parents=True, exist_ok=True)
+        log.debug(f"SQLite destination_path: {self.destination_path}")
+
+    def _connection(self):
+        """Return the connection of the current thread.
+
+        The events are handled by short-lived threads, so the connection is
+        closed when the thread local storage of its thread is released.
+        """
+        local = getattr(self._local, 'connection', None)
+        if local is None:
+            # Transactions are started explicitly by _transaction.
+            connection = sqlite3.connect(str(self.destination_path),
+                                         timeout=self.timeout,
+                                         isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(f'PRAGMA synchronous={self.synchronous}')
+            connection.create_function('regexp', 2, _regexp)
+            local = _ThreadConnection(connection)
+            weakref.finalize(local, self._release, connection)
+            self._local.connection = local
+            with self._lock:
+                self._connections.append(connection)
+        return local.connection
+
+    def _release(self, connection):
+        """Close the connection of a thread that has ended."""
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in a write transaction, rolled back on errors.
+
+        The write lock is taken when the transaction starts, so a read
+        followed by a write never fails because of another writer.
+        """
+        connection = self._connection()
+        with phase('lock'):
+            connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _loads(self, record):
+        try:
+            return self.serializer.loads(record)
+        except (pickle.PickleError, ValueError) as exception:
+            log.error(f"Failed to load box record: {exception}")
+            return False
+
+    @staticmethod
+    def _row(box):
+        return (box.namespace, box.box_id, box.owner, box.created_at,
+                box.revision, box.hash)
+
+    def create(self, box):
+        """Create a new box."""
+        record = self.serializer.dumps(box)
+        with self._transaction() as connection:
+            connection.execute(UPSERT, (*self._row(box), record))
+        return box.box_id
+
+    def create_many(self, boxes):
+        """Create several boxes in a single transaction."""
+        rows = [(*self._row(box), self.serializer.dumps(box))
+                for box in boxes]
+        with self._transaction() as connection:
+            connection.executemany(UPSERT, rows)
+
+    def retrieve(self, namespace, box_id):
+        """Retrieve a box from a namespace."""
+        row = self._connection().execute(SELECT_DATA,
+                                         (namespace, box_id)).fetchone()
+        if row is None:
+            return False
+        return self._loads(row[0])
+
+    def exists(self, namespace, box_id):
+        """Return True if a box exists, looking up the primary key only."""
+        return self._connection().execute(
+            SELECT_EXISTS, (namespace, box_id)).fetchone() is not None
+
+    def head(self, namespace, box_id):
+        """Return the size of the record of a box."""
+        row = self._connection().execute(SELECT_SIZE,
+                                         (namespace, box_id)).fetchone()
+        if row is None:
+            return None
+        return {'size': row[0], 'revision': row[1]}
+
+    def retrieve_many(self, namespace, box_ids):
+        """Return a dict with the box, or False, of each box_id."""
+        box_ids = list(box_ids)
+        results = dict.fromkeys(box_ids, False)
+        connection = self._connection()
+        for start in range(0, len(box_ids), MAX_VARIABLES):
+            chunk = box_ids[start:start + MAX_VARIABLES]
+            query = ('SELECT box_id, data FROM boxes WHERE namespace = ?'
+                     f' AND box_id IN ({", ".join("?" * len(chunk))})')
+            for box_id, record in connection.execute(query,
+                                                     (namespace, *chunk)):
+                results[box_id] = self._loads(record)
+        return results
+
+    def update(self, namespace, box, expected_revision=None):
+        """Update a box from a namespace.
+
+        The expected_revision is checked in the write transaction.
+        """
+        record = self.serializer.dumps(box)
+        with self._transaction() as connection:
+            if expected_revision is not None:
+                row = connection.execute(SELECT_REVISION,
+                                         (namespace, box.box_id)).fetchone()
+                check_revision(row and row[0], expected_revision)
+            connection.execute(UPSERT, (namespace, box.box_id, box.owner,
+                                        box.created_at, box.revision,
+                                        box.hash, record))
+        return box.box_id
+
+    def patch(self, namespace, box_id, data, expected_revision=None):
+        """Merge data into the data of a box in a single transaction."""
+        with self._transaction() as connection:
+            row = connection.execute(SELECT_DATA,
+                                     (namespace, box_id)).fetchone()
+            if row is None:
+                return False
+            check_revision(row[1], expected_revision)
+            box = self.serializer.loads(row[0])
+            box.data.update(data)
+            stamp(box)
+            connection.execute(UPDATE_DATA, (self.serializer.dumps(box),
+                                             box.revision, box.hash,
+                                             namespace, box_id))
+        return box
+
+    def delete(self, namespace, box_id):
+        """Delete a box from a namespace."""
+        with self._transaction() as connection:
+            return connection.execute(DELETE,
+                                      (namespace, box_id)).rowcount > 0
+
+    def delete_many(self, namespace, box_ids):
+        """Delete several boxes in a single transaction."""
+        results = {}
+        with self._transaction() as connection:
+            for box_id in box_ids:
+                cursor = connection.execute(DELETE, (namespace, box_id))
+                results[box_id] = cursor.rowcount > 0
+        return results
+
+    def list(self, namespace):
+        """List all the boxes in a namespace."""
+        return [box_id for box_id, in
+                self._connection().execute(LIST, (namespace,))]
+
+    def list_page(self, namespace, limit, after=None):
+        """Return up to limit box_ids of a namespace, read from the index."""
+        return [box_id for box_id, in self._connection().execute(
+            LIST_PAGE, (namespace, '' if after is None else after, limit))]
+
+    def list_namespaces(self):
+        """List all the namespaces registered."""
+        return [namespace for namespace, in
+                self._connection().execute(LIST_NAMESPACES)]
+
+    def list_metadata(self, namespace):
+        """Return the metadata of every box in a namespace."""
+        return [dict(zip(METADATA_COLUMNS, row)) for row in
+                self._connection().execute(LIST_METADATA, (namespace,))]
+
+    def search_metadata(self, namespace, field, query, mode='contains'):
+        """Return the metadata of the boxes matching query.
+
+        The exact and prefix modes are answered from the index of field.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Invalid search mode '{mode}'")
+        if field not in INDEXED_FIELDS:
+            return []
+
+        conditions, parameters = [f'{field} IS NOT NULL'], [namespace]
+        if mode == 'exact':
+            conditions.append(f'{field} = ?')
+            parameters.append(query)
+        elif mode == 'prefix' and query:
+            conditions.append(f'{field} >= ?')
+            parameters.append(query)
+            end = _prefix_end(query)
+            if end is not None:
+                conditions.append(f'{field} < ?')
+                parameters.append(end)
+        elif mode == 'contains':
+            conditions.append(f'instr({field}, ?) > 0')
+            parameters.append(query)
+        elif mode == 'regex':
+            try:
+                _compile(query)
+            except re.error as exception:
+                raise ValueError(f"Invalid regex '{query}': {exception}") \
+                    from exception
+            conditions.append(f'{field} REGEXP ?')
+            parameters.append(query)
+
+        statement = (f'SELECT {", ".join(METADATA_COLUMNS)} FROM boxes'
+                     f' WHERE namespace = ? AND {" AND ".join(conditions)}'
+                     ' ORDER BY box_id')
+        return [dict(zip(METADATA_COLUMNS, row)) for row in
+                self._connection().execute(statement, parameters)]
+
+    def backup(self, namespace, box_id=None):
+        """Return an iterator over the boxes of a namespace.
+
+        The boxes of a namespace are read by a single query, loading them
+        one at a time while iterating.
+        """
+        if box_id is not None:
+            return super().backup(namespace, box_id)
+
+        records = self._connection().execute(BACKUP, (namespace,))
+        first = records.fetchone()
+        if first is None:
+            raise NotFoundException("Namespace not found")
+        boxes = (self._loads(record) for record, in chain([first], records))
+        return (box for box in boxes if box)
+
+    def sync(self):
+        """Flush the committed transactions to the disk.
+
+        They are all in the write-ahead log, which is replayed when the
+        database is opened, so syncing that file is enough.
+        """
+        try:
+            fd = os.open(f'{self.destination_path}-wal', os.O_RDONLY)
+        except FileNotFoundError:
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """Close the connections of every thread."""
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
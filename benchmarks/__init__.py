@@ -0,0 +1,10 @@
+"""Benchmarks of the Storehouse NApp backends and handlers.
+
+Run the default workloads on every backend and save the results::
+
+    python -m napps.kytos.storehouse.benchmarks run --output results.json
+
+Then compare a later run with them, failing on regressions::
+
+    python -m napps.kytos.storehouse.benchmarks compare results.json new.json
+"""
@@ -0,0 +1,95 @@
+"""Command line of the storehouse benchmarks."""
+
+import argparse
+import ast
+import sys
+
+from napps.kytos.storehouse.benchmarks import report, runner
+from napps.kytos.storehouse.benchmarks.workloads import WORKLOADS
+
+
+def _setting(text):
+    """Parse a NAME=VALUE setting, VALUE being a Python literal or text."""
+    name, separator, value = text.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Expected NAME=VALUE, got {text}")
+    try:
+        return name, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return name, value
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m napps.kytos.storehouse.benchmarks',
+        description='Benchmark the storehouse backends and handlers.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run = commands.add_parser('run', help='run workloads')
+    run.add_argument('--workloads', nargs='+', choices=sorted(WORKLOADS),
+                     default=sorted(WORKLOADS))
+    run.add_argument('--targets', nargs='+', choices=sorted(runner.TARGETS),
+                     default=['backend'])
+    run.add_argument('--backends', nargs='+', choices=runner.BACKENDS,
+                     default=list(runner.BACKENDS))
+    run.add_argument('--box-size', type=int)
+    run.add_argument('--namespaces', type=int)
+    run.add_argument('--boxes', type=int)
+    run.add_argument('--operations', type=int)
+    run.add_argument('--concurrency', type=int)
+    run.add_argument('--seed', type=int)
+    run.add_argument('--setting', type=_setting, action='append',
+                     default=[], metavar='NAME=VALUE',
+                     help='override a NApp setting, e.g. '
+                          'WRITE_DURABILITY=group')
+    run.add_argument('--directory',
+                     help='where the boxes are stored during the runs')
+    run.add_argument('--etcd', metavar='HOST:PORT',
+                     help='etcd server to use instead of an in-memory one')
+    run.add_argument('--output', help='save the results to this JSON file')
+
+    compare = commands.add_parser('compare',
+                                  help='compare two saved results')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.1,
+                         help='tolerated change, as a fraction '
+                              '(default: 0.1)')
+    return parser
+
+
+def main(argv=None):
+    """Run the command line, returning its exit status."""
+    args = _parser().parse_args(argv)
+
+    if args.command == 'compare':
+        regressions = report.compare(report.load(args.baseline),
+                                     report.load(args.current),
+                                     args.threshold)
+        for regression in regressions:
+            print(regression)
+        return 1 if regressions else 0
+
+    runs = []
+    for name in args.workloads:
+        workload = WORKLOADS[name].replace(
+            box_size=args.box_size, namespaces=args.namespaces,
+            boxes=args.boxes, operations=args.operations,
+            concurrency=args.concurrency, seed=args.seed)
+        for target in args.targets:
+            for backend in args.backends:
+                print(f"Running {name} on {target}/{backend}...",
+                      file=sys.stderr)
+                runs.append(runner.run(workload, target, backend,
+                                       args.directory, args.etcd,
+                                       dict(args.setting)))
+    results = report.new_report(runs)
+    print(report.format_report(results))
+    if args.output:
+        report.save(results, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""In-memory stand-in for the etcd3 client.
+
+It implements the part of the etcd3 client API used by the etcd backend,
+so the backend can be benchmarked without an etcd server. It keeps the
+revision counters of etcd, but reads always see the latest state: a range
+request pinned to an older revision is answered with the current keys.
+"""
+
+import threading
+from bisect import bisect_left, insort
+from types import SimpleNamespace
+
+
+def _to_bytes(value):
+    return value.encode() if isinstance(value, str) else value
+
+
+class _Compare:
+    """Comparison of an attribute of a key, built like etcd3 ones.
+
+    For instance ``client.transactions.mod(key) == 5``.
+    """
+
+    def __init__(self, key, attribute):
+        self.key = _to_bytes(key)
+        self.attribute = attribute
+        self.operator = None
+        self.value = None
+
+    def _set(self, operator, value):
+        self.operator = operator
+        self.value = _to_bytes(value)
+        return self
+
+    def __eq__(self, value):
+        return self._set('==', value)
+
+    def __ne__(self, value):
+        return self._set('!=', value)
+
+    def __lt__(self, value):
+        return self._set('<', value)
+
+    def __gt__(self, value):
+        return self._set('>', value)
+
+    __hash__ = None
+
+
+class _Operations:
+    """Builders of the compares and operations of a transaction."""
+
+    @staticmethod
+    def value(key):
+        """Return a compare of the value of key."""
+        return _Compare(key, 'value')
+
+    @staticmethod
+    def version(key):
+        """Return a compare of the version of key."""
+        return _Compare(key, 'version')
+
+    @staticmethod
+    def create(key):
+        """Return a compare of the create revision of key."""
+        return _Compare(key, 'create_revision')
+
+    @staticmethod
+    def mod(key):
+        """Return a compare of the mod revision of key."""
+        return _Compare(key, 'mod_revision')
+
+    @staticmethod
+    def put(key, value):
+        """Return a put operation."""
+        return ('put', _to_bytes(key), _to_bytes(value))
+
+    @staticmethod
+    def get(key):
+        """Return a get operation."""
+        return ('get', _to_bytes(key), None)
+
+    @staticmethod
+    def delete(key):
+        """Return a delete operation."""
+        return ('delete', _to_bytes(key), None)
+
+
+class _KVStub:
+    """Stand-in for the gRPC KV stub, answering raw RangeRequests."""
+
+    def __init__(self, etcd):
+        self._etcd = etcd
+
+    def Range(self, request, timeout=None, **_):
+        """Return the keys in [request.key, request.range_end)."""
+        # pylint: disable=invalid-name, unused-argument
+        return self._etcd._range(request)  # pylint: disable=protected-access
+
+
+class FakeEtcd:
+    """Thread safe in-memory key-value store with an etcd3 like API."""
+
+    transactions = _Operations()
+
+    def __init__(self):
+        self.revision = 1
+        self._values = {}
+        self._keys = []
+        self._lock = threading.RLock()
+        self.kvstub = _KVStub(self)
+        self.timeout = None
+        self.call_credentials = None
+        self.metadata = None
+
+    def _metadata(self, key):
+        value, create_revision, mod_revision, version = self._values[key]
+        return SimpleNamespace(key=key, value=value,
+                               create_revision=create_revision,
+                               mod_revision=mod_revision, version=version)
+
+    def _put(self, key, value):
+        previous = self._values.get(key)
+        if previous is None:
+            insort(self._keys, key)
+            self._values[key] = (value, self.revision, self.revision, 1)
+        else:
+            self._values[key] = (value, previous[1], self.revision,
+                                 previous[3] + 1)
+
+    def _delete(self, key):
+        if self._values.pop(key, None) is None:
+            return 0
+        del self._keys[bisect_left(self._keys, key)]
+        return 1
+
+    def get(self, key):
+        """Return the (value, metadata) of a key, or (None, None)."""
+        key = _to_bytes(key)
+        with self._lock:
+            if key not in self._values:
+                return None, None
+            return self._values[key][0], self._metadata(key)
+
+    def put(self, key, value):
+        """Set the value of a key."""
+        with self._lock:
+            self.revision += 1
+            self._put(_to_bytes(key), _to_bytes(value))
+
+    def delete(self, key):
+        """Delete a key, returning True if it existed."""
+        with self._lock:
+            self.revision += 1
+            return bool(self._delete(_to_bytes(key)))
+
+    def _range(self, request):
+        """Return the keys of a RangeRequest like etcd does."""
+        with self._lock:
+            start = bisect_left(self._keys, request.key)
+            if request.range_end == b'\0':
+                end = len(self._keys)
+            else:
+                end = bisect_left(self._keys, request.range_end)
+            keys = self._keys[start:end]
+            more = bool(request.limit) and len(keys) > request.limit
+            if request.limit:
+                keys = keys[:request.limit]
+            kvs = []
+            for key in keys:
+                metadata = self._metadata(key)
+                if request.keys_only:
+                    metadata.value = b''
+                kvs.append(metadata)
+            return SimpleNamespace(
+                header=SimpleNamespace(revision=self.revision), kvs=kvs,
+                more=more, count=end - start)
+
+    def transaction(self, compare, success, failure):
+        """Run the success or failure operations atomically.
+
+        Returns:
+            tuple: (succeeded, responses), responses as the etcd3 client
+            returns them.
+
+        """
+        with self._lock:
+            succeeded = all(self._compare(item) for item in compare)
+            operations = success if succeeded else failure
+            if any(operation != 'get' for operation, _, _ in operations):
+                self.revision += 1
+            responses = []
+            for operation, key, value in operations:
+                if operation == 'put':
+                    self._put(key, value)
+                    responses.append(SimpleNamespace(response_put=None))
+                elif operation == 'delete':
+                    deleted = self._delete(key)
+                    responses.append(SimpleNamespace(
+                        response_delete_range=SimpleNamespace(
+                            deleted=deleted)))
+                elif key in self._values:
+                    responses.append([(self._values[key][0],
+                                       self._metadata(key))])
+                else:
+                    responses.append([])
+            return succeeded, responses
+
+    def _compare(self, compare):
+        if compare.key in self._values:
+            current = getattr(self._metadata(compare.key), compare.attribute)
+        else:
+            current = None if compare.attribute == 'value' else 0
+        if compare.operator == '==':
+            return current == compare.value
+        if compare.operator == '!=':
+            return current != compare.value
+        if compare.operator == '<':
+            return current < compare.value
+        return current > compare.value
+
+    def close(self):
+        """Do nothing, there is no connection to close."""
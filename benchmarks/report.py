@@ -0,0 +1,116 @@
+"""Results of the storehouse benchmarks: summaries, files and comparisons."""
+
+import json
+import math
+import platform
+import sys
+from datetime import datetime
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of a sorted list of values."""
+    if not values:
+        return 0.0
+    return values[max(1, math.ceil(len(values) * fraction)) - 1]
+
+
+def summarize(timings, errors, elapsed):
+    """Summarize the latencies, in seconds, of the operations of a run.
+
+    Returns:
+        dict: total throughput and, for each operation, its count, errors,
+        throughput and mean, p50, p95 and p99 latency in milliseconds.
+
+    """
+    operations = {}
+    for operation, values in timings.items():
+        values = sorted(values)
+        count = len(values)
+        operations[operation] = {
+            'count': count,
+            'errors': errors.get(operation, 0),
+            'throughput': count / elapsed if elapsed else 0.0,
+            'mean_ms': sum(values) / count * 1000 if count else 0.0,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+        }
+    total = sum(summary['count'] for summary in operations.values())
+    return {'elapsed': elapsed,
+            'throughput': total / elapsed if elapsed else 0.0,
+            'operations': operations}
+
+
+def new_report(runs):
+    """Return a report of runs with the environment they ran in."""
+    return {'created_at': datetime.utcnow().isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'runs': runs}
+
+
+def save(report, path):
+    """Write a report as JSON."""
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+
+
+def load(path):
+    """Read a report written by save."""
+    with open(path) as report_file:
+        return json.load(report_file)
+
+
+def _key(run):
+    return (run['workload']['name'], run['target'], run['backend'])
+
+
+def compare(baseline, current, threshold=0.1):
+    """Return the regressions of current over baseline.
+
+    A regression is a run whose throughput dropped, or an operation whose
+    p95 latency grew, by more than threshold (a fraction). Runs missing
+    from either report are ignored.
+
+    Returns:
+        list: a message describing each regression.
+
+    """
+    baseline_runs = {_key(run): run for run in baseline['runs']}
+    regressions = []
+    for run in current['runs']:
+        base = baseline_runs.get(_key(run))
+        if base is None:
+            continue
+        name = '/'.join(_key(run))
+        if run['throughput'] < base['throughput'] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {run['throughput']:.1f} ops/s, was "
+                f"{base['throughput']:.1f} ops/s")
+        for operation, summary in run['operations'].items():
+            before = base['operations'].get(operation)
+            if before and summary['p95_ms'] > before['p95_ms'] * \
+                    (1 + threshold):
+                regressions.append(
+                    f"{name}: {operation} p95 {summary['p95_ms']:.3f} ms, "
+                    f"was {before['p95_ms']:.3f} ms")
+    return regressions
+
+
+def format_report(report):
+    """Return the runs of a report as a text table."""
+    lines = [f"{'workload':<16} {'target':<7} {'backend':<10} "
+             f"{'operation':<9} {'count':>7} {'errors':>6} {'ops/s':>10} "
+             f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for run in report['runs']:
+        for operation, summary in sorted(run['operations'].items()):
+            lines.append(
+                f"{run['workload']['name']:<16} {run['target']:<7} "
+                f"{run['backend']:<10} {operation:<9} "
+                f"{summary['count']:>7} {summary['errors']:>6} "
+                f"{summary['throughput']:>10.1f} {summary['p50_ms']:>9.3f} "
+                f"{summary['p95_ms']:>9.3f} {summary['p99_ms']:>9.3f}")
+        lines.append(f"{run['workload']['name']:<16} {run['target']:<7} "
+                     f"{run['backend']:<10} {'total':<9} {'':>7} {'':>6} "
+                     f"{run['throughput']:>10.1f}")
+    return '\n'.join(lines)
@@ -0,0 +1,364 @@
+"""Run workloads against the backends and the NApp handlers.
+
+A run stores the boxes of the workload, then replays its operations from
+several threads, timing each of them. The operations go through one of
+these targets:
+
+- ``backend``: the StoreBase methods of the backend, directly.
+- ``rest``: the REST endpoints of the NApp, with a Flask test client.
+- ``events``: the event handlers of the NApp, timed until their callback.
+
+The filesystem, logstore and sqlite backends write to a temporary
+directory. The etcd backend uses an in-memory FakeEtcd unless the address
+of a real server is given.
+"""
+
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from unittest.mock import patch
+
+import etcd3
+
+from napps.kytos.storehouse import settings
+from napps.kytos.storehouse.benchmarks.fake_etcd import FakeEtcd
+from napps.kytos.storehouse.benchmarks.report import summarize
+from napps.kytos.storehouse.benchmarks.workloads import box_data
+from napps.kytos.storehouse.box import Box
+
+BACKENDS = ('filesystem', 'logstore', 'sqlite', 'etcd')
+API_URL = '/api/kytos/storehouse'
+
+
+def _settings_for(backend, directory):
+    """Return the settings storing the boxes of backend under directory."""
+    return {'BACKEND': backend,
+            'CUSTOM_DESTINATION_PATH': str(Path(directory, 'filesystem')),
+            'CUSTOM_LOCK_PATH': str(Path(directory, 'lock')),
+            'CUSTOM_LOGSTORE_PATH': str(Path(directory, 'logstore')),
+            'CUSTOM_SQLITE_PATH': str(Path(directory, 'storehouse.sqlite3'))}
+
+
+@contextmanager
+def configured(overrides):
+    """Replace NApp settings while the context is active."""
+    missing = object()
+    previous = {name: getattr(settings, name, missing) for name in overrides}
+    # Paths are relative to the virtualenv, if any.
+    virtual_env = os.environ.pop('VIRTUAL_ENV', None)
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is missing:
+                delattr(settings, name)
+            else:
+                setattr(settings, name, value)
+        if virtual_env is not None:
+            os.environ['VIRTUAL_ENV'] = virtual_env
+
+
+def etcd_client(address=None):
+    """Return a FakeEtcd, or a client of the etcd server at host:port."""
+    if address is None:
+        return FakeEtcd()
+    host, _, port = address.partition(':')
+    return etcd3.client(host, int(port or 2379))
+
+
+def open_backend(name, etcd=None):
+    """Open the backend configured in the settings."""
+    # pylint: disable=import-outside-toplevel
+    if name == 'etcd':
+        from napps.kytos.storehouse.backends.etcd import Etcd
+        return Etcd(etcd)
+    if name == 'logstore':
+        from napps.kytos.storehouse.backends.logstore import LogStore
+        return LogStore()
+    if name == 'sqlite':
+        from napps.kytos.storehouse.backends.sqlite import SQLite
+        return SQLite()
+    from napps.kytos.storehouse.backends.fs import FileSystem
+    return FileSystem()
+
+
+class BackendTarget:
+    """Run the operations with the backend methods."""
+
+    def __init__(self, backend, etcd=None):
+        self.backend = open_backend(backend, etcd)
+
+    @staticmethod
+    def _box(namespace, box_id, data):
+        return Box(data, namespace, box_id=box_id)
+
+    def preload(self, namespace, items):
+        """Store the (box_id, data) items before the run."""
+        self.backend.create_many([self._box(namespace, box_id, data)
+                                  for box_id, data in items])
+
+    def create(self, namespace, box_id, data):
+        """Create a box."""
+        self.backend.create(self._box(namespace, box_id, data))
+
+    def retrieve(self, namespace, box_id):
+        """Retrieve a box."""
+        self.backend.retrieve(namespace, box_id)
+
+    def update(self, namespace, box_id, data):
+        """Replace the data of a box."""
+        self.backend.update(namespace, self._box(namespace, box_id, data))
+
+    def patch(self, namespace, box_id, data):
+        """Merge data into a box."""
+        self.backend.patch(namespace, box_id, data)
+
+    def delete(self, namespace, box_id):
+        """Delete a box."""
+        self.backend.delete(namespace, box_id)
+
+    def list(self, namespace):
+        """List the boxes of a namespace."""
+        list(self.backend.list(namespace))
+
+    def search(self, namespace, query):
+        """Search the boxes of a namespace by box_id prefix."""
+        self.backend.search_metadata(namespace, 'box_id', query, 'prefix')
+
+    def close(self):
+        """Close the backend."""
+        self.backend.close()
+
+
+class NAppTarget(BackendTarget):
+    """Base of the targets running the operations through the NApp."""
+
+    def __init__(self, backend, etcd=None):
+        # pylint: disable=import-outside-toplevel,super-init-not-called
+        from kytos.lib.helpers import get_controller_mock
+        from napps.kytos.storehouse.main import Main
+        client = etcd if etcd is not None else FakeEtcd()
+        with patch.object(etcd3, 'client', lambda *args, **kwargs: client):
+            self.napp = Main(get_controller_mock())
+        self.backend = self.napp.backend
+
+    def preload(self, namespace, items):
+        """Store the (box_id, data) items and cache their metadata."""
+        self.napp.create_boxes([self._box(namespace, box_id, data)
+                                for box_id, data in items])
+
+    def search(self, namespace, query):
+        """Search the boxes of a namespace by box_id prefix."""
+        self.napp.search_metadata_by(namespace, 'box_id', query, 'prefix')
+
+    def close(self):
+        """Shut the NApp down."""
+        self.napp.shutdown()
+
+
+class RestTarget(NAppTarget):
+    """Run the operations with requests to the REST endpoints."""
+
+    def __init__(self, backend, etcd=None):
+        # pylint: disable=import-outside-toplevel
+        from kytos.lib.helpers import get_test_client
+        super().__init__(backend, etcd)
+        self.api = get_test_client(self.napp.controller, self.napp)
+
+    @staticmethod
+    def _check(response):
+        if response.status_code >= 500:
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+    def create(self, namespace, box_id, data):
+        """Create a box."""
+        self._check(self.api.post(f'{API_URL}/v2/{namespace}/{box_id}',
+                                  json=data))
+
+    def retrieve(self, namespace, box_id):
+        """Retrieve a box."""
+        self._check(self.api.get(f'{API_URL}/v1/{namespace}/{box_id}'))
+
+    def update(self, namespace, box_id, data):
+        """Replace the data of a box."""
+        self._check(self.api.put(f'{API_URL}/v1/{namespace}/{box_id}',
+                                 json=data))
+
+    def patch(self, namespace, box_id, data):
+        """Merge data into a box."""
+        self._check(self.api.patch(f'{API_URL}/v1/{namespace}/{box_id}',
+                                   json=data))
+
+    def delete(self, namespace, box_id):
+        """Delete a box."""
+        self._check(self.api.delete(f'{API_URL}/v1/{namespace}/{box_id}'))
+
+    def list(self, namespace):
+        """List the boxes of a namespace."""
+        self._check(self.api.get(f'{API_URL}/v1/{namespace}'))
+
+    def search(self, namespace, query):
+        """Search the boxes of a namespace by box_id prefix."""
+        self._check(self.api.get(f'{API_URL}/v1/{namespace}/search_by/'
+                                 f'box_id/{query}?mode=prefix'))
+
+
+class EventTarget(NAppTarget):
+    """Run the operations with events, waiting for their callback."""
+
+    def _send(self, handler, **content):
+        # pylint: disable=import-outside-toplevel
+        from kytos.core.events import KytosEvent
+        done = threading.Event()
+        errors = []
+
+        def callback(_event, _data, error):
+            if error:
+                errors.append(error)
+            done.set()
+
+        event = KytosEvent(content={**content, 'callback': callback})
+        getattr(self.napp, handler)(event)
+        done.wait()
+        if errors and not isinstance(errors[0], KeyError):
+            raise errors[0]
+
+    def create(self, namespace, box_id, data):
+        """Create a box."""
+        self._send('event_create', namespace=namespace, box_id=box_id,
+                   data=data)
+
+    def retrieve(self, namespace, box_id):
+        """Retrieve a box."""
+        self._send('event_retrieve', namespace=namespace, box_id=box_id)
+
+    def update(self, namespace, box_id, data):
+        """Replace the data of a box."""
+        self._send('event_update', namespace=namespace, box_id=box_id,
+                   data=data, method='PUT')
+
+    def patch(self, namespace, box_id, data):
+        """Merge data into a box."""
+        self._send('event_update', namespace=namespace, box_id=box_id,
+                   data=data, method='PATCH')
+
+    def delete(self, namespace, box_id):
+        """Delete a box."""
+        self._send('event_delete', namespace=namespace, box_id=box_id)
+
+    def list(self, namespace):
+        """List the boxes of a namespace."""
+        self._send('event_list', namespace=namespace)
+
+
+TARGETS = {'backend': BackendTarget, 'rest': RestTarget,
+           'events': EventTarget}
+
+
+def _worker(target, workload, worker, timings, errors, lock):
+    """Run the operations scheduled for one worker thread."""
+    # The results are merged under the lock once the worker is done.
+    # pylint: disable=too-many-arguments, too-many-locals
+    rng = random.Random(f'{workload.seed}-{worker}-ids')
+    names = workload.namespace_names()
+    data = box_data(workload.box_size, workload.seed)
+    created = {}
+    local_timings = {operation: [] for operation in workload.mix}
+    local_errors = Counter()
+
+    for sequence, (operation, index) in enumerate(workload.schedule(worker)):
+        namespace = names[index]
+        box_id = f'box{rng.randrange(workload.boxes)}'
+        if operation == 'create':
+            box_id = f'w{worker}-{sequence}'
+            created.setdefault(namespace, []).append(box_id)
+        elif operation == 'delete' and created.get(namespace):
+            box_id = created[namespace].pop()
+
+        if operation in ('create', 'update'):
+            args = (namespace, box_id, data)
+        elif operation == 'patch':
+            args = (namespace, box_id, {'counter': sequence})
+        elif operation == 'list':
+            args = (namespace,)
+        elif operation == 'search':
+            args = (namespace, box_id[:-1] or box_id)
+        else:
+            args = (namespace, box_id)
+
+        start = time.perf_counter()
+        try:
+            getattr(target, operation)(*args)
+        except Exception:  # pylint: disable=broad-except
+            local_errors[operation] += 1
+        local_timings[operation].append(time.perf_counter() - start)
+
+    with lock:
+        for operation, values in local_timings.items():
+            timings[operation].extend(values)
+        errors.update(local_errors)
+
+
+def run(workload, target='backend', backend='filesystem', directory=None,
+        etcd=None, overrides=None):
+    """Run a workload and return its results.
+
+    Args:
+        workload(Workload): the workload to run.
+        target(str): 'backend', 'rest' or 'events'.
+        backend(str): name of the backend, as in the BACKEND setting.
+        directory(str): where the temporary directory of the run is made.
+        etcd(str): host:port of an etcd server, instead of a FakeEtcd.
+        overrides(dict): other settings of the run, e.g. WRITE_DURABILITY.
+
+    Returns:
+        dict: the workload, target, backend and summary of the run.
+
+    """
+    # The options of a run are given by keyword, as on the command line.
+    # pylint: disable=too-many-arguments, too-many-locals
+    if target not in TARGETS:
+        raise ValueError(f"Unknown target '{target}'")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'")
+
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=directory) as tmp_dir, \
+            configured({**_settings_for(backend, tmp_dir),
+                        **(overrides or {})}):
+        runner = TARGETS[target](
+            backend, etcd_client(etcd) if backend == 'etcd' else None)
+        try:
+            data = box_data(workload.box_size, workload.seed)
+            for namespace in workload.namespace_names():
+                runner.preload(namespace, [(f'box{index}', data)
+                                           for index in
+                                           range(workload.boxes)])
+
+            timings = {operation: [] for operation in workload.mix}
+            errors = Counter()
+            lock = threading.Lock()
+            threads = [threading.Thread(target=_worker,
+                                        args=(runner, workload, worker,
+                                              timings, errors, lock))
+                       for worker in range(workload.concurrency)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            runner.close()
+
+    return {'workload': workload.to_dict(), 'target': target,
+            'backend': backend, 'settings': dict(overrides or {}),
+            **summarize(timings, errors, elapsed)}
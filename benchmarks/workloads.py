@@ -0,0 +1,103 @@
+"""Synthetic workloads of the storehouse benchmarks."""
+
+import random
+
+#: Operations a workload can mix.
+OPERATIONS = ('create', 'retrieve', 'update', 'patch', 'delete', 'list',
+              'search')
+
+
+class Workload:
+    """Parameters of a benchmark run.
+
+    Args:
+        name(str): name of the workload in the reports.
+        mix(dict): relative weight of each operation.
+        box_size(int): approximate size in bytes of the data of each box.
+        namespaces(int): number of namespaces the boxes are spread over.
+        boxes(int): number of boxes stored in each namespace before the run.
+        operations(int): number of operations of the run.
+        concurrency(int): number of threads running the operations.
+        seed(int): seed of the random choices, so runs are reproducible.
+
+    """
+
+    def __init__(self, name, mix, box_size=256, namespaces=4, boxes=100,
+                 operations=1000, concurrency=1, seed=0):
+        # Every parameter of a workload but its name and mix has a default.
+        # pylint: disable=too-many-arguments
+        unknown = set(mix) - set(OPERATIONS)
+        if unknown:
+            raise ValueError(f"Unknown operations {', '.join(unknown)}")
+        self.name = name
+        self.mix = mix
+        self.box_size = box_size
+        self.namespaces = namespaces
+        self.boxes = boxes
+        self.operations = operations
+        self.concurrency = concurrency
+        self.seed = seed
+
+    def replace(self, **params):
+        """Return a copy of the workload with some parameters replaced."""
+        values = self.to_dict()
+        values.update({key: value for key, value in params.items()
+                       if value is not None})
+        return Workload(**values)
+
+    def to_dict(self):
+        """Return the parameters as a dictionary."""
+        return {'name': self.name, 'mix': dict(self.mix),
+                'box_size': self.box_size, 'namespaces': self.namespaces,
+                'boxes': self.boxes, 'operations': self.operations,
+                'concurrency': self.concurrency, 'seed': self.seed}
+
+    def namespace_names(self):
+        """Return the names of the namespaces of the workload."""
+        return [f'bench.{self.name}.ns{index}'
+                for index in range(self.namespaces)]
+
+    def schedule(self, worker):
+        """Return the (operation, namespace index) run by a worker thread."""
+        rng = random.Random(f'{self.seed}-{worker}')
+        count = self.operations // self.concurrency
+        if worker < self.operations % self.concurrency:
+            count += 1
+        operations = rng.choices(list(self.mix), list(self.mix.values()),
+                                 k=count)
+        return [(operation, rng.randrange(self.namespaces))
+                for operation in operations]
+
+
+def box_data(size, seed=0):
+    """Return a JSON friendly dict of roughly size bytes once serialized."""
+    rng = random.Random(seed)
+    fields = max(1, size // 64)
+    chunk = max(1, size // fields - 16)
+    return {f'field{index}': ''.join(rng.choices('abcdefghijklmnop',
+                                                 k=chunk))
+            for index in range(fields)}
+
+
+#: Workloads run by default, named after the traffic they stand for.
+WORKLOADS = {
+    workload.name: workload for workload in (
+        Workload('read_heavy', {'retrieve': 90, 'update': 5, 'list': 3,
+                                'search': 2},
+                 box_size=1024, namespaces=8, boxes=200, operations=5000,
+                 concurrency=4),
+        Workload('write_burst', {'create': 70, 'update': 20, 'patch': 10},
+                 box_size=512, namespaces=4, boxes=50, operations=2000,
+                 concurrency=8),
+        Workload('mixed', {'create': 20, 'retrieve': 50, 'patch': 10,
+                           'delete': 10, 'list': 5, 'search': 5},
+                 box_size=512, namespaces=4, boxes=100, operations=2000,
+                 concurrency=4),
+        Workload('large_boxes', {'retrieve': 50, 'update': 50},
+                 box_size=256 * 1024, namespaces=1, boxes=20,
+                 operations=200, concurrency=2),
+        Workload('wide_namespaces', {'list': 50, 'retrieve': 50},
+                 box_size=128, namespaces=200, boxes=10, operations=2000,
+                 concurrency=4),
+    )
+}
@@ -0,0 +1,57 @@
+"""Box of the Storehouse NApp, holding the data stored by the NApps."""
+
+import json
+from datetime import datetime
+from uuid import uuid4
+
+
+class Box:
+    """Store data with the necessary metadata."""
+
+    # Boxes pickled by previous versions have no revision nor hash.
+    revision = None
+    hash = None
+
+    def __init__(self, data, namespace, box_id=None):
+        """Create a new Box instance.
+
+        Args:
+            data: Data to be stored in the box.
+            namespace: Namespace where the box belongs.
+
+        """
+        self.data = data
+        self.namespace = namespace
+        if box_id is None:
+            box_id = uuid4().hex
+        self.box_id = box_id
+        self.created_at = str(datetime.utcnow())
+        self.owner = None
+        self.revision = None
+        self.hash = None
+
+    def __str__(self):
+        return '%s.%s' % (self.namespace, self.box_id)
+
+    @classmethod
+    def from_json(cls, json_data):
+        """Create a new Box instance from JSON input."""
+        raw = json.loads(json_data)
+        data = raw.get('data')
+        namespace = raw.get('namespace')
+        return cls(data, namespace)
+
+    def to_dict(self):
+        """Return the instance as a python dictionary."""
+        return {'data': self.data,
+                'namespace': self.namespace,
+                'owner': self.owner,
+                'created_at': self.created_at,
+                'id': self.box_id,
+                'revision': self.revision,
+                'hash': self.hash
+                }
+
+    def to_json(self):
+        """Return the instance as a JSON string."""
+        return json.dumps(self.to_dict(), indent=4)
@@ -0,0 +1,99 @@
+"""Read cache of Box objects for the Storehouse NApp."""
+
+import pickle
+from collections import OrderedDict
+from threading import Lock
+
+from napps.kytos.storehouse.profiling import phase
+
+
+class BoxCache:
+    """Bounded LRU cache of boxes keyed by (namespace, box_id).
+
+    The boxes are kept pickled, so get returns a new Box every time and
+    changing it, or a box after it was put, never changes the cache.
+
+    The cache can be limited by number of entries, by the pickled size of
+    the boxes or by both. A limit of 0 means no limit on that dimension
+    and both set to 0 disables the cache.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._boxes = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def enabled(self):
+        """Return True if the cache holds any box at all."""
+        return bool(self.max_entries or self.max_bytes)
+
+    @phase('cache')
+    def get(self, namespace, box_id):
+        """Return the cached box or None, updating the hit/miss counters."""
+        key = (namespace, box_id)
+        with self._lock:
+            entry = self._boxes.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._boxes.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(entry[0])
+
+    @phase('cache')
+    def put(self, box):
+        """Store a box, evicting the least recently used ones if needed."""
+        if not self.enabled:
+            return
+        try:
+            record = pickle.dumps(box, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            self.invalidate(box.namespace, box.box_id)
+            return
+        size = len(record) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            self.invalidate(box.namespace, box.box_id)
+            return
+
+        key = (box.namespace, box.box_id)
+        with self._lock:
+            previous = self._boxes.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._boxes[key] = (record, size)
+            self._size += size
+            while ((self.max_entries and
+                    len(self._boxes) > self.max_entries) or
+                   (self.max_bytes and self._size > self.max_bytes)):
+                _, (_, evicted_size) = self._boxes.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    @phase('cache')
+    def invalidate(self, namespace, box_id):
+        """Remove a box from the cache, if present."""
+        with self._lock:
+            entry = self._boxes.pop((namespace, box_id), None)
+            if entry is not None:
+                self._size -= entry[1]
+
+    def clear(self):
+        """Remove every box from the cache."""
+        with self._lock:
+            self._boxes.clear()
+            self._size = 0
+
+    def stats(self):
+        """Return the counters and the current usage of the cache."""
+        with self._lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "entries": len(self._boxes),
+                    "bytes": self._size}
@@ -0,0 +1,135 @@
+"""Helpers of the REST endpoints and events of the Storehouse NApp."""
+
+import base64
+
+from napps.kytos.storehouse import settings
+
+
+def encode_cursor(box_id):
+    """Return the cursor of the page starting after box_id."""
+    return base64.urlsafe_b64encode(box_id.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the box_id after which the page of a cursor starts.
+
+    Raises:
+        ValueError: if the cursor is not valid.
+
+    """
+    try:
+        return base64.b64decode(cursor.encode(), altchars=b'-_',
+                                validate=True).decode()
+    except ValueError as exception:
+        raise ValueError(f"Invalid cursor '{cursor}'") from exception
+
+
+def page_limit(limit=None):
+    """Return the number of items of a page, at most LIST_PAGE_MAX.
+
+    Raises:
+        ValueError: if limit is not a positive integer.
+
+    """
+    if limit is None:
+        limit = getattr(settings, 'LIST_PAGE_SIZE', 100)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = 0
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, getattr(settings, 'LIST_PAGE_MAX', 1000))
+
+
+def metadata_page(results, limit=None, cursor=None):
+    """Return a page of the metadata found by a search.
+
+    Returns:
+        dict: the 'results' of the page, sorted by box_id, and the
+            'next_cursor' to get the next one, None on the last page.
+
+    Raises:
+        ValueError: if limit or cursor are not valid.
+
+    """
+    limit = page_limit(limit)
+    after = decode_cursor(cursor) if cursor else None
+    if after is not None:
+        results = [metadata for metadata in results
+                   if metadata["box_id"] > after]
+    return {"results": results[:limit],
+            "next_cursor": (encode_cursor(results[limit - 1]["box_id"])
+                            if len(results) > limit else None)}
+
+
+def if_match_revision(if_match):
+    """Return the revision expected by an If-Match header, or None.
+
+    None is returned if the header is missing or is '*'.
+
+    Raises:
+        ValueError: if the header does not hold a single revision.
+
+    """
+    if not if_match or if_match.star_tag:
+        return None
+    etags = if_match.as_set()
+    if len(etags) != 1:
+        raise ValueError("If-Match must hold a single revision")
+    try:
+        return int(etags.pop())
+    except ValueError:
+        raise ValueError("If-Match must hold a revision") from None
+
+
+def since_revision(since):
+    """Return the revision given as 'since_revision' of an event, or None.
+
+    The revision may be given as an int or, like in an ETag, as a string.
+
+    Raises:
+        ValueError: if it is not a revision.
+
+    """
+    if since is None:
+        return None
+    if isinstance(since, str) and since.isdigit():
+        return int(since)
+    if isinstance(since, bool) or not isinstance(since, int):
+        raise ValueError("since_revision must be a revision")
+    return since
+
+
+def box_revision(backend, metadata_cache, warmup, namespace, box_id):
+    """Return the revision of a box, or None if it is not known.
+
+    The metadata cache is used once the namespace is loaded, so the box
+    is not read.
+    """
+    if warmup.is_loaded(namespace):
+        record = metadata_cache.get(namespace, {}).get(box_id)
+        return None if record is None else record.revision
+    head = backend.head(namespace, box_id)
+    return None if head is None else head['revision']
+
+
+def check_box_ids(box_ids):
+    """Check the box ids given to a bulk endpoint.
+
+    The ids must be distinct strings naming a single file in the namespace
+    of the filesystem backends: not empty, not '.' or '..' and without '/'
+    or NUL characters.
+
+    Raises:
+        ValueError: if a box id is not valid or is repeated.
+
+    """
+    seen = set()
+    for box_id in box_ids:
+        if (not isinstance(box_id, str) or box_id in ('', '.', '..') or
+                '/' in box_id or '\0' in box_id):
+            raise ValueError(f"Invalid box id '{box_id}'")
+        if box_id in seen:
+            raise ValueError(f"Box id '{box_id}' is repeated")
+        seen.add(box_id)
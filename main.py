@@ -4,66 +4,43 @@ Persistence NApp with support for multiple backends.
 """
 
 import json
-import re
-from datetime import datetime
-from uuid import uuid4
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import jsonify, request
+from flask import Response, jsonify, request
 
 from kytos.core import KytosNApp, log, rest
 from kytos.core.helpers import listen_to
 from napps.kytos.storehouse import settings  # pylint: disable=unused-import
-
-
-def metadata_from_box(box):
-    """Return a metadata from box."""
-    return {"box_id": box.box_id,
-            "owner": box.owner,
-            "created_at": box.created_at}
-
-
-class Box:
-    """Store data with the necessary metadata."""
-
-    def __init__(self, data, namespace, box_id=None):
-        """Create a new Box instance.
-
-        Args:
-            data: Data to be stored in the box.
-            namespace: Namespace where the box belongs.
-
-        """
-        self.data = data
-        self.namespace = namespace
-        if box_id is None:
-            box_id = uuid4().hex
-        self.box_id = box_id
-        self.created_at = str(datetime.utcnow())
-        self.owner = None
-
-    def __str__(self):
-        return '%s.%s' % (self.namespace, self.box_id)
-
-    @classmethod
-    def from_json(cls, json_data):
-        """Create a new Box instance from JSON input."""
-        raw = json.loads(json_data)
-        data = raw.get('data')
-        namespace = raw.get('namespace')
-        return cls(data, namespace)
-
-    def to_dict(self):
-        """Return the instance as a python dictionary."""
-        return {'data': self.data,
-                'namespace': self.namespace,
-                'owner': self.owner,
-                'created_at': self.created_at,
-                'id': self.box_id
-                }
-
-    def to_json(self):
-        """Return the instance as a JSON string."""
-        return json.dumps(self.to_dict(), indent=4)
+from napps.kytos.storehouse.backends.base import (RevisionConflict,
+                                                  check_revision,
+                                                  metadata_from_box, stamp)
+from napps.kytos.storehouse.box import Box
+from napps.kytos.storehouse.cache import BoxCache
+from napps.kytos.storehouse.helpers import (box_revision, check_box_ids,
+                                            decode_cursor, encode_cursor,
+                                            if_match_revision, metadata_page,
+                                            page_limit, since_revision)
+from napps.kytos.storehouse.metrics import (METRICS, InstrumentedBackend,
+                                            enabled, timed_handler)
+from napps.kytos.storehouse.pipeline import WritePipeline
+from napps.kytos.storehouse.profiling import PROFILER, phase
+from napps.kytos.storehouse.search import MetadataIndex
+from napps.kytos.storehouse.warmup import Warmup
+
+#: Box given to the callback of kytos.storehouse.retrieve when the box has
+#: not changed since the requested revision.
+UNCHANGED = 'unchanged'
+
+
+def gzip_stream(chunks):
+    """Compress an iterable of strings as a gzip stream."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
 
 
 class Main(KytosNApp):
@@ -73,6 +50,7 @@ class Main(KytosNApp):
     """
 
     metadata_cache = {}
+    _warmup_executor = None
 
     def setup(self):
         """Replace the '__init__' method for the KytosNApp subclass.
@@ -84,13 +62,37 @@ class Main(KytosNApp):
             from napps.kytos.storehouse.backends.etcd import Etcd
             log.info("Loading 'etcd' backend...")
             self.backend = Etcd()
+        elif settings.BACKEND == "logstore":
+            from napps.kytos.storehouse.backends.logstore import LogStore
+            log.info("Loading 'logstore' backend...")
+            self.backend = LogStore()
+        elif settings.BACKEND == "sqlite":
+            from napps.kytos.storehouse.backends.sqlite import SQLite
+            log.info("Loading 'sqlite' backend...")
+            self.backend = SQLite()
         else:
             from napps.kytos.storehouse.backends.fs import FileSystem
             log.info("Loading 'filesystem' backend...")
             self.backend = FileSystem()
-
-        self.metadata_cache = {}
-        self.create_cache()
+        if enabled():
+            self.backend = InstrumentedBackend(self.backend)
+
+        self.writes = WritePipeline(
+            self.backend, getattr(settings, 'WRITE_DURABILITY', 'none'),
+            interval=getattr(settings, 'WRITE_GROUP_INTERVAL', 5) / 1000,
+            max_batch=getattr(settings, 'WRITE_GROUP_SIZE', 128))
+        self.box_cache = BoxCache(
+            max_entries=getattr(settings, 'BOX_CACHE_MAX_ENTRIES', 1024),
+            max_bytes=getattr(settings, 'BOX_CACHE_MAX_BYTES', 0))
+        self.metadata_index = MetadataIndex()
+        self.metadata_cache = self.metadata_index.records
+        self.warmup = Warmup()
+        METRICS.namespace_exists = self.namespace_exists
+        self._warmup_executor = None
+        if getattr(settings, 'CACHE_WARMUP_BACKGROUND', False):
+            self.start_cache_warmup()
+        else:
+            self.create_cache()
         log.info("Storehouse NApp started.")
 
     def execute(self):
@@ -99,16 +101,48 @@ class Main(KytosNApp):
     def create_cache(self):
         """Create a cache from all namespaces when the napp setup."""
         log.debug('Creating storehouse cache...')
-        for namespace in self.backend.list_namespaces():
-            if namespace not in self.metadata_cache:
-                self.metadata_cache[namespace] = []
+        namespaces = list(self.backend.list_namespaces())
+        self.warmup.start(namespaces)
+        for namespace in namespaces:
+            self.load_namespace_cache(namespace)
 
-            for box_id in self.backend.list(namespace):
-                box = self.backend.retrieve(namespace, box_id)
-                log.debug("Loading box '%s'...", box)
-                cache = metadata_from_box(box)
-                self.metadata_cache[namespace].append(cache)
+    def start_cache_warmup(self):
+        """Create the cache in background threads.
 
+        Requests are served right away: namespaces not loaded yet are
+        searched directly in the backend.
+        """
+        namespaces = list(self.backend.list_namespaces())
+        self.warmup.start(namespaces)
+        log.info(f'Warming up storehouse cache of {len(namespaces)} '
+                 'namespaces in background...')
+        self._warmup_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'CACHE_WARMUP_WORKERS', 4),
+            thread_name_prefix='storehouse_warmup')
+        for namespace in namespaces:
+            self._warmup_executor.submit(self.load_namespace_cache, namespace)
+        self._warmup_executor.shutdown(wait=False)
+
+    def load_namespace_cache(self, namespace):
+        """Load the metadata of every box of a namespace into the cache.
+
+        If the metadata cannot be read, the namespace is left pending, so
+        its boxes are still looked up in the backend.
+        """
+        try:
+            metadata = self.backend.list_metadata(namespace)
+        except Exception as exception:  # pylint: disable=broad-except
+            log.error(f"Failed to load cache of '{namespace}': {exception}")
+            self.warmup.namespace_failed(namespace)
+            return
+
+        self.metadata_index.add_namespace(namespace)
+        self.warmup.add_unchanged(
+            namespace, metadata,
+            lambda cache: self.metadata_index.add(namespace, cache))
+        self.warmup.namespace_loaded(namespace, len(metadata))
+
+    @phase('cache')
     def delete_metadata_from_cache(self, namespace, box_id=None):
         """Delete a metadata from cache.
 
@@ -117,37 +151,178 @@ class Main(KytosNApp):
             box_id(str): Box identifier
 
         """
-        for cache in self.metadata_cache.get(namespace, []):
-            if (box_id and box_id in cache["box_id"]):
-                self.metadata_cache.get(namespace, []).remove(cache)
+        if box_id:
+            self.warmup.box_changed(namespace, box_id)
+            self.metadata_index.remove(namespace, box_id)
 
+    @phase('cache')
     def add_metadata_to_cache(self, box):
-        """Add a box cache into the namespace cache."""
-        cache = metadata_from_box(box)
-        if box.namespace not in self.metadata_cache:
-            self.metadata_cache[box.namespace] = []
-        self.metadata_cache[box.namespace].append(cache)
+        """Add a box cache into the namespace cache, replacing its entry."""
+        self.warmup.box_changed(box.namespace, box.box_id)
+        self.metadata_index.add(box.namespace, metadata_from_box(box))
 
-    def search_metadata_by(self, namespace, filter_option="box_id", query=""):
+    def namespace_exists(self, namespace):
+        """Return True if a namespace has boxes or is being loaded."""
+        return (namespace in self.metadata_index.records or
+                not self.warmup.is_loaded(namespace))
+
+    def box_exists(self, namespace, box_id):
+        """Return True if a box_id is in use in a namespace.
+
+        The metadata cache is used once the namespace is loaded.
+        """
+        if self.warmup.is_loaded(namespace):
+            return self.metadata_index.exists(namespace, box_id)
+        return self.backend.exists(namespace, box_id)
+
+    def search_metadata_by(self, namespace, filter_option="box_id", query="",
+                           mode="contains"):
         """Search for all metadata with specific pattern.
 
         Args:
             namespace(str): namespace where the box is stored
             filter_option(str): metadata option
             query(str): query to be searched
+            mode(str): 'exact', 'prefix', 'contains' or 'regex'
 
         Returns:
             list: list of metadata box filtered
 
+        Raises:
+            ValueError: if mode is unknown or the regex is invalid.
+
+        """
+        if not self.warmup.is_loaded(namespace):
+            return self.backend.search_metadata(namespace, filter_option,
+                                                query, mode)
+
+        return self.metadata_index.search(namespace, filter_option, query,
+                                          mode)
+
+    def list_boxes(self, namespace, limit=None, cursor=None):
+        """Return a page of the box_ids of a namespace, in order.
+
+        Only the page is read from the backend, so namespaces of any size
+        are listed at constant memory.
+
+        Returns:
+            dict: the 'boxes' of the page and the 'next_cursor' to get the
+                next one, None on the last page.
+
+        Raises:
+            ValueError: if limit or cursor are not valid.
+
+        """
+        limit = page_limit(limit)
+        after = decode_cursor(cursor) if cursor else None
+        box_ids = self.backend.list_page(namespace, limit + 1, after)
+        return {"boxes": box_ids[:limit],
+                "next_cursor": (encode_cursor(box_ids[limit - 1])
+                                if len(box_ids) > limit else None)}
+
+    def retrieve_box(self, namespace, box_id):
+        """Retrieve a box, using the box cache before the backend."""
+        box = self.box_cache.get(namespace, box_id)
+        if box is None:
+            box = self.backend.retrieve(namespace, box_id)
+            if box:
+                self.box_cache.put(box)
+        return box
+
+    def patch_box(self, namespace, box_id, data, expected_revision=None):
+        """Merge data into the data of a box.
+
+        The box is merged by the backend, which returns the box it stored.
+        If expected_revision is given, the box is only written if it still
+        has that revision, checked atomically by the backend.
+
+        Returns:
+            Box: the updated box, or a false value if it does not exist.
+
+        Raises:
+            RevisionConflict: if the box does not have expected_revision.
+
         """
-        namespace_cache = self.metadata_cache.get(namespace, [])
-        results = []
+        box = self.writes.submit('patch', namespace, box_id, data,
+                                 expected_revision)
+        self._box_updated(namespace, box_id, box)
+        return box
+
+    def put_box(self, namespace, box_id, data, expected_revision=None):
+        """Replace the data of a box.
+
+        If expected_revision is given, the box is only written if it still
+        has that revision, checked atomically by the backend.
+
+        Returns:
+            Box: the updated box, or a false value if it does not exist.
 
-        for metadata in namespace_cache:
-            field_value = metadata.get(filter_option, "")
-            if re.match(f".*{query}.*", field_value):
-                results.append(metadata)
+        Raises:
+            RevisionConflict: if the box does not have expected_revision.
+
+        """
+        box = self.retrieve_box(namespace, box_id)
+        if not box:
+            return box
+        check_revision(box.revision, expected_revision)
+        box.data = data
+        self.writes.submit('update', namespace, stamp(box), expected_revision)
+        self._box_updated(namespace, box_id, box)
+        return box
+
+    def _box_updated(self, namespace, box_id, box):
+        """Refresh the caches after a box was written.
+
+        The box cache is invalidated instead of written through: a box put
+        after the write could be older than a concurrent write or delete.
+        """
+        self.box_cache.invalidate(namespace, box_id)
+        if box:
+            self.add_metadata_to_cache(box)
 
+    def create_boxes(self, boxes):
+        """Create several boxes with a single backend batch."""
+        for box in boxes:
+            stamp(box)
+        self.writes.submit('create_many', boxes)
+        for box in boxes:
+            self.box_cache.put(box)
+            self.add_metadata_to_cache(box)
+
+    def retrieve_boxes(self, namespace, box_ids):
+        """Retrieve several boxes, reading the missing ones in one batch.
+
+        Returns:
+            dict: the box, or a false value if not found, of each box_id.
+
+        """
+        results = {}
+        missing = []
+        for box_id in box_ids:
+            results[box_id] = self.box_cache.get(namespace, box_id)
+            if results[box_id] is None:
+                missing.append(box_id)
+
+        if missing:
+            for box_id, box in self.backend.retrieve_many(namespace,
+                                                          missing).items():
+                if box:
+                    self.box_cache.put(box)
+                results[box_id] = box
+        return results
+
+    def delete_boxes(self, namespace, box_ids):
+        """Delete several boxes with a single backend batch.
+
+        Returns:
+            dict: whether each box_id was deleted.
+
+        """
+        results = self.writes.submit('delete_many', namespace, box_ids)
+        for box_id, deleted in results.items():
+            self.box_cache.invalidate(namespace, box_id)
+            if deleted:
+                self.delete_metadata_from_cache(namespace, box_id)
         return results
 
     @staticmethod
@@ -162,6 +337,7 @@ class Main(KytosNApp):
             log.error(exception)
 
     @rest('v1/<namespace>', methods=['POST'])
+    @timed_handler
     def rest_create(self, namespace):
         """Create a box in a namespace based on JSON input."""
         data = request.get_json(silent=True)
@@ -169,8 +345,9 @@ class Main(KytosNApp):
         if not data:
             return jsonify({"response": "Invalid Request"}), 400
 
-        box = Box(data, namespace)
-        self.backend.create(box)
+        box = stamp(Box(data, namespace))
+        self.writes.submit('create', box)
+        self.box_cache.put(box)
         self.add_metadata_to_cache(box)
 
         result = {"response": "Box created.", "id": box.box_id}
@@ -179,6 +356,7 @@ class Main(KytosNApp):
 
     @rest('v2/<namespace>', methods=['POST'])
     @rest('v2/<namespace>/<box_id>', methods=['POST'])
+    @timed_handler
     def rest_create_v2(self, namespace, box_id=None):
         """Create a box in a namespace based on JSON input."""
         data = request.get_json(silent=True)
@@ -186,56 +364,190 @@ class Main(KytosNApp):
         if not data:
             return jsonify({"response": "Invalid Request"}), 400
 
-        box = Box(data, namespace, box_id=box_id)
-        self.backend.create(box)
+        box = stamp(Box(data, namespace, box_id=box_id))
+        self.writes.submit('create', box)
+        self.box_cache.put(box)
         self.add_metadata_to_cache(box)
 
         result = {"response": "Box created.", "id": box.box_id}
 
         return jsonify(result), 201
 
+    @rest('v2/<namespace>/bulk', methods=['POST'])
+    @timed_handler
+    def rest_bulk_create(self, namespace):
+        """Create several boxes in a namespace based on JSON input.
+
+        The input is a list of objects with the 'data' to be stored and an
+        optional 'id' for each box.
+        """
+        items = request.get_json(silent=True)
+
+        if (not items or not isinstance(items, list) or
+                not all(isinstance(item, dict) and item.get('data')
+                        for item in items)):
+            return jsonify({"response": "Invalid Request"}), 400
+
+        try:
+            check_box_ids(item['id'] for item in items
+                          if item.get('id') is not None)
+        except ValueError as exception:
+            return jsonify({"response": str(exception)}), 400
+
+        boxes = [Box(item['data'], namespace, box_id=item.get('id'))
+                 for item in items]
+        self.create_boxes(boxes)
+
+        result = [{"id": box.box_id, "status": 201} for box in boxes]
+        return jsonify(result), 201
+
+    @rest('v2/<namespace>/bulk', methods=['GET'])
+    @timed_handler
+    def rest_bulk_retrieve(self, namespace):
+        """Retrieve the boxes given by the 'id' query string arguments."""
+        box_ids = request.args.getlist('id')
+
+        if not box_ids:
+            return jsonify({"response": "Invalid Request"}), 400
+
+        try:
+            check_box_ids(box_ids)
+        except ValueError as exception:
+            return jsonify({"response": str(exception)}), 400
+
+        result = []
+        for box_id, box in self.retrieve_boxes(namespace, box_ids).items():
+            if box:
+                result.append({"id": box_id, "status": 200,
+                               "data": box.data})
+            else:
+                result.append({"id": box_id, "status": 404})
+        return jsonify(result), 200
+
+    @rest('v2/<namespace>/bulk', methods=['DELETE'])
+    @timed_handler
+    def rest_bulk_delete(self, namespace):
+        """Delete the boxes whose ids are given as a JSON list."""
+        box_ids = request.get_json(silent=True)
+
+        if not box_ids or not isinstance(box_ids, list):
+            return jsonify({"response": "Invalid Request"}), 400
+
+        try:
+            check_box_ids(box_ids)
+        except ValueError as exception:
+            return jsonify({"response": str(exception)}), 400
+
+        result = [{"id": box_id, "status": 200 if deleted else 404}
+                  for box_id, deleted in
+                  self.delete_boxes(namespace, box_ids).items()]
+        return jsonify(result), 200
+
     @rest('v1/<namespace>', methods=['GET'])
+    @timed_handler
     def rest_list(self, namespace):
-        """List all boxes in a namespace."""
-        result = self.backend.list(namespace)
-        return jsonify(result), 200
+        """List the boxes in a namespace.
+
+        With the 'limit' or 'cursor' query string arguments, one page of
+        box_ids is returned with the cursor of the next one.
+        """
+        if 'limit' not in request.args and 'cursor' not in request.args:
+            result = list(self.backend.list(namespace))
+            return jsonify(result), 200
+
+        try:
+            page = self.list_boxes(namespace, request.args.get('limit'),
+                                   request.args.get('cursor'))
+        except ValueError as exception:
+            return jsonify({"response": str(exception)}), 400
+        return jsonify(page), 200
 
     @rest('v1/<namespace>/<box_id>', methods=['PUT', 'PATCH'])
+    @timed_handler
     def rest_update(self, namespace, box_id):
-        """Update a box_id from namespace."""
+        """Update a box_id from namespace.
+
+        With an If-Match header holding the revision of the box, as sent in
+        its ETag, the box is only updated if it still has that revision.
+        Otherwise 412 is returned.
+        """
         data = request.get_json(silent=True)
 
         if not data:
             return jsonify({"response": "Invalid request: empty data"}), 400
 
-        box = self.backend.retrieve(namespace, box_id)
+        try:
+            expected_revision = if_match_revision(request.if_match)
+            update = (self.put_box if request.method == 'PUT' else
+                      self.patch_box)
+            box = update(namespace, box_id, data, expected_revision)
+        except RevisionConflict as exception:
+            return jsonify({"response": str(exception)}), 412
+        except ValueError as exception:
+            return jsonify({"response": str(exception)}), 400
 
         if not box:
             return jsonify({"response": "Not Found"}), 404
 
-        if request.method == "PUT":
-            box.data = data
-        else:
-            box.data.update(data)
-
-        self.backend.update(namespace, box)
-
-        return jsonify(box.data), 200
+        response = jsonify(box.data)
+        response.set_etag(str(box.revision))
+        return response, 200
 
     @rest('v1/<namespace>/<box_id>', methods=['GET'])
+    @timed_handler
     def rest_retrieve(self, namespace, box_id):
-        """Retrieve and return a box from a namespace."""
-        box = self.backend.retrieve(namespace, box_id)
+        """Retrieve and return a box from a namespace.
+
+        The ETag of the box is its revision. If the If-None-Match header
+        matches it, 304 is returned without reading the box. HEAD requests
+        only tell whether the box exists, with the size and revision it has
+        in the backend, without reading the box.
+        """
+        if request.method == 'HEAD':
+            return self._head_box(namespace, box_id)
+
+        if request.if_none_match:
+            revision = box_revision(self.backend, self.metadata_cache,
+                                    self.warmup, namespace, box_id)
+            if (revision is not None and
+                    request.if_none_match.contains(str(revision))):
+                response = Response(status=304)
+                response.set_etag(str(revision))
+                return response
+
+        box = self.retrieve_box(namespace, box_id)
 
         if not box:
             return jsonify({"response": "Not Found"}), 404
 
-        return jsonify(box.data), 200
+        response = jsonify(box.data)
+        if box.revision is not None:
+            response.set_etag(str(box.revision))
+        return response, 200
+
+    def _head_box(self, namespace, box_id):
+        """Answer a HEAD request for a box."""
+        head = self.backend.head(namespace, box_id)
+        if head is None:
+            return Response(status=404)
+        revision = head['revision']
+        if revision is None:
+            record = self.metadata_cache.get(namespace, {}).get(box_id)
+            revision = None if record is None else record.revision
+        response = Response(status=200)
+        if head['size'] is not None:
+            response.headers['X-Box-Size'] = str(head['size'])
+        if revision is not None:
+            response.headers['X-Box-Revision'] = str(revision)
+            response.set_etag(str(revision))
+        return response
 
     @rest('v1/<namespace>/<box_id>', methods=['DELETE'])
+    @timed_handler
     def rest_delete(self, namespace, box_id):
         """Delete a box from a namespace."""
-        result = self.backend.delete(namespace, box_id)
+        result = self.writes.submit('delete', namespace, box_id)
+        self.box_cache.invalidate(namespace, box_id)
 
         if result:
             self.delete_metadata_from_cache(namespace, box_id)
@@ -245,9 +557,15 @@ class Main(KytosNApp):
         return jsonify({"response": "Box not found"}), 404
 
     @rest("v1/<namespace>/search_by/<filter_option>/<query>", methods=['GET'])
+    @timed_handler
     def rest_search_by(self, namespace, filter_option="name", query=""):
         """Filter the boxes with specific pattern.
 
+        The 'mode' query string argument selects how the query is matched:
+        'exact', 'prefix', 'contains' (default) or 'regex'. With the 'limit'
+        or 'cursor' arguments, one page of results is returned with the
+        cursor of the next one.
+
         Args:
             namespace(str): namespace where the box is stored
             filter_option(str): metadata option
@@ -257,7 +575,22 @@ class Main(KytosNApp):
             list: list of metadata box filtered
 
         """
-        results = self.search_metadata_by(namespace, filter_option, query)
+        mode = request.args.get('mode', 'contains')
+        paged = 'limit' in request.args or 'cursor' in request.args
+        try:
+            results = self.search_metadata_by(namespace, filter_option, query,
+                                              mode)
+            if paged:
+                page = metadata_page(results, request.args.get('limit'),
+                                     request.args.get('cursor'))
+        except ValueError as exception:
+            return jsonify({"response": str(exception)}), 400
+
+        if paged:
+            if not page["results"] and 'cursor' not in request.args:
+                return jsonify({"response": f"{filter_option} not found"}), \
+                    404
+            return jsonify(page), 200
 
         if not results:
             return jsonify({"response": f"{filter_option} not found"}), 404
@@ -265,6 +598,7 @@ class Main(KytosNApp):
         return jsonify(results), 200
 
     @listen_to('kytos.storehouse.create')
+    @timed_handler
     def event_create(self, event):
         """Create a box in a namespace based on an event."""
         error = None
@@ -274,34 +608,104 @@ class Main(KytosNApp):
             data = event.content['data']
             namespace = event.content['namespace']
 
-            if self.search_metadata_by(namespace, query=box_id):
+            if box_id is not None and self.box_exists(namespace, box_id):
                 raise KeyError("Box id already exists.")
 
         except KeyError as exc:
             box = None
             error = exc
         else:
-            box = Box(data, namespace, box_id=box_id)
-            self.backend.create(box)
+            box = stamp(Box(data, namespace, box_id=box_id))
+            self.writes.submit('create', box)
+            self.box_cache.put(box)
             self.add_metadata_to_cache(box)
 
         self._execute_callback(event, box, error)
 
+    @listen_to('kytos.storehouse.create_many')
+    @timed_handler
+    def event_create_many(self, event):
+        """Create several boxes in a namespace based on an event.
+
+        The callback receives a dict with the created Box, or None, of each
+        box_id and a dict with the error of each box that was not created.
+        """
+        errors = {}
+        seen = set()
+
+        try:
+            namespace = event.content['namespace']
+            items = event.content['boxes']
+            boxes = []
+            for item in items:
+                box = Box(item['data'], namespace, box_id=item.get('box_id'))
+                if (box.box_id in seen or box.box_id in errors or
+                        self.box_exists(namespace, box.box_id)):
+                    errors[box.box_id] = KeyError("Box id already exists.")
+                else:
+                    seen.add(box.box_id)
+                    boxes.append(box)
+        except KeyError as exc:
+            result = None
+            error = exc
+        else:
+            self.create_boxes(boxes)
+            result = dict.fromkeys(errors)
+            result.update((box.box_id, box) for box in boxes)
+            error = errors or None
+
+        self._execute_callback(event, result, error)
+
     @listen_to('kytos.storehouse.retrieve')
+    @timed_handler
     def event_retrieve(self, event):
-        """Retrieve a box from a namespace based on an event."""
+        """Retrieve a box from a namespace based on an event.
+
+        If the event has a 'since_revision' and the box has not changed
+        since that revision, the callback receives UNCHANGED instead of the
+        box, which is not read. A since_revision that is not a revision is
+        returned to the callback as a ValueError.
+        """
         error = None
 
         try:
-            box = self.backend.retrieve(event.content['namespace'],
-                                        event.content['box_id'])
-        except KeyError as exc:
+            namespace = event.content['namespace']
+            box_id = event.content['box_id']
+            since = since_revision(event.content.get('since_revision'))
+            revision = (None if since is None else
+                        box_revision(self.backend, self.metadata_cache,
+                                     self.warmup, namespace, box_id))
+            if revision is not None and revision <= since:
+                box = UNCHANGED
+            else:
+                box = self.retrieve_box(namespace, box_id)
+        except (KeyError, ValueError) as exc:
             box = None
             error = exc
 
         self._execute_callback(event, box, error)
 
+    @listen_to('kytos.storehouse.retrieve_many')
+    @timed_handler
+    def event_retrieve_many(self, event):
+        """Retrieve several boxes from a namespace based on an event.
+
+        The callback receives a dict with the Box, or a false value if not
+        found, of each box_id.
+        """
+        error = None
+
+        try:
+            result = self.retrieve_boxes(event.content['namespace'],
+                                         event.content['box_ids'])
+        except KeyError as exc:
+            result = None
+            error = exc
+
+        self._execute_callback(event, result, error)
+
     @listen_to('kytos.storehouse.update')
+    @timed_handler
     def event_update(self, event):
         """Update a box_id from namespace.
 
@@ -311,33 +715,35 @@ class Main(KytosNApp):
         box_id: the box identify
         method: 'PUT' or 'PATCH', the default update method is 'PATCH'
         data: a python dict with the data
+        expected_revision: optional, the box is only updated if it still has
+            this revision, otherwise the error is a RevisionConflict
         """
         error = False
 
         try:
             namespace = event.content['namespace']
             box_id = event.content['box_id']
-            box = self.backend.retrieve(namespace, box_id)
-            if not box:
-                raise KeyError("Box id does not exist.")
-
-        except KeyError as exc:
-            box = None
-            error = exc
-        else:
             method = event.content.get('method', 'PATCH')
             data = event.content.get('data', {})
-
+            expected_revision = event.content.get('expected_revision')
             if method == 'PUT':
-                box.data = data
+                box = self.put_box(namespace, box_id, data, expected_revision)
             elif method == 'PATCH':
-                box.data.update(data)
+                box = self.patch_box(namespace, box_id, data,
+                                     expected_revision)
+            else:
+                box = self.retrieve_box(namespace, box_id)
+            if not box:
+                raise KeyError("Box id does not exist.")
 
-            self.backend.update(namespace, box)
+        except (KeyError, RevisionConflict) as exc:
+            box = None
+            error = exc
 
         self._execute_callback(event, box, error)
 
     @listen_to('kytos.storehouse.delete')
+    @timed_handler
     def event_delete(self, event):
         """Delete a box from a namespace based on an event."""
         error = None
@@ -349,34 +755,181 @@ class Main(KytosNApp):
             result = None
             error = exc
         else:
-            result = self.backend.delete(namespace, box_id)
+            result = self.writes.submit('delete', namespace, box_id)
+            self.box_cache.invalidate(namespace, box_id)
             self.delete_metadata_from_cache(namespace, box_id)
 
         self._execute_callback(event, result, error)
 
+    @listen_to('kytos.storehouse.delete_many')
+    @timed_handler
+    def event_delete_many(self, event):
+        """Delete several boxes from a namespace based on an event.
+
+        The callback receives a dict telling whether each box_id was deleted.
+        """
+        error = None
+
+        try:
+            namespace = event.content['namespace']
+            box_ids = event.content['box_ids']
+        except KeyError as exc:
+            result = None
+            error = exc
+        else:
+            result = self.delete_boxes(namespace, box_ids)
+
+        self._execute_callback(event, result, error)
+
     @listen_to('kytos.storehouse.list')
+    @timed_handler
     def event_list(self, event):
-        """List all boxes in a namespace based on an event."""
+        """List the boxes in a namespace based on an event.
+
+        If the event has a 'limit' or a 'cursor', the callback receives one
+        page, as returned by list_boxes, instead of the list of every box.
+        """
         error = None
 
         try:
-            result = self.backend.list(event.content['namespace'])
-
-        except KeyError as exc:
+            namespace = event.content['namespace']
+            if 'limit' in event.content or 'cursor' in event.content:
+                result = self.list_boxes(namespace,
+                                         event.content.get('limit'),
+                                         event.content.get('cursor'))
+            else:
+                result = list(self.backend.list(namespace))
+
+        except (KeyError, ValueError) as exc:
             result = None
             error = exc
 
         self._execute_callback(event, result, error)
 
+    @rest('v1/cache/stats', methods=['GET'])
+    @timed_handler
+    def rest_cache_stats(self):
+        """Return the hit/miss counters and usage of the box cache."""
+        return jsonify(self.box_cache.stats()), 200
+
+    @rest('v1/cache/warmup', methods=['GET'])
+    @timed_handler
+    def rest_warmup_status(self):
+        """Return the progress of the metadata cache warmup."""
+        return jsonify(self.warmup.status()), 200
+
+    @rest('v1/metrics', methods=['GET'])
+    def rest_metrics(self):
+        """Return the operation metrics in the Prometheus text format."""
+        return Response(METRICS.render(cache=self.box_cache.stats(),
+                                       writes=self.writes),
+                        mimetype='text/plain; version=0.0.4'), 200
+
+    @rest('v1/profile', methods=['POST'])
+    def rest_profile_start(self):
+        """Profile the operations for a time window.
+
+        The JSON input gives the 'mode', 'cpu' (default) for cProfile or
+        'memory' for tracemalloc, and the 'seconds' of the window.
+        """
+        options = request.get_json(silent=True) or {}
+        try:
+            status = PROFILER.start(options.get('mode', 'cpu'),
+                                    options.get('seconds', 30))
+        except ValueError as exception:
+            return jsonify({"response": str(exception)}), 400
+        except RuntimeError as exception:
+            return jsonify({"response": str(exception)}), 409
+        return jsonify(status), 202
+
+    @rest('v1/profile', methods=['GET'])
+    def rest_profile_status(self):
+        """Return the state of the last profile."""
+        return jsonify(PROFILER.status()), 200
+
+    @rest('v1/profile', methods=['DELETE'])
+    def rest_profile_stop(self):
+        """Stop the running profile before the end of its window."""
+        if not PROFILER.stop():
+            return jsonify({"response": "No profile running"}), 404
+        return jsonify(PROFILER.status()), 200
+
+    @rest('v1/profile/result', methods=['GET'])
+    def rest_profile_result(self):
+        """Download the result of the last profile.
+
+        The 'format' query string argument is 'text' (default) or, for a
+        cpu profile, 'pstats' for a dump readable by pstats.
+        """
+        if PROFILER.status()['state'] == 'running':
+            return jsonify({"response": "Profile still running"}), 409
+        try:
+            result = PROFILER.result(request.args.get('format', 'text'))
+        except ValueError as exception:
+            return jsonify({"response": str(exception)}), 400
+        if result is None:
+            return jsonify({"response": "No profile done"}), 404
+
+        content, mimetype, filename = result
+        headers = {'Content-Disposition': f'attachment; filename={filename}'}
+        return Response(content, status=200, headers=headers,
+                        mimetype=mimetype)
+
     @rest("v1/backup/<namespace>/", methods=['GET'])
     @rest("v1/backup/<namespace>/<box_id>", methods=['GET'])
+    @timed_handler
     def rest_backup(self, namespace, box_id=None):
         """Backup an entire namespace or an object based on its id."""
         try:
-            return jsonify(self.backend.backup(namespace, box_id)), 200
+            boxes = self.backend.backup(namespace, box_id)
+            return jsonify({box.box_id: box.to_json() for box in boxes}), 200
         except ValueError:
             return jsonify({"response": "Not Found"}), 404
 
+    @rest("v2/backup/<namespace>/", methods=['GET'])
+    @rest("v2/backup/<namespace>/<box_id>", methods=['GET'])
+    @timed_handler
+    def rest_backup_stream(self, namespace, box_id=None):
+        """Stream a backup of a namespace or a box as JSON lines.
+
+        One box is read and serialized at a time, so the size of the backup
+        is not limited by the memory available. The response is gzipped if
+        the client accepts it.
+        """
+        try:
+            boxes = self.backend.backup(namespace, box_id)
+        except ValueError:
+            return jsonify({"response": "Not Found"}), 404
+
+        lines = self._backup_lines(namespace, boxes)
+        headers = {}
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            lines = gzip_stream(lines)
+            headers['Content-Encoding'] = 'gzip'
+        return Response(lines, status=200, headers=headers,
+                        mimetype='application/x-ndjson')
+
+    @staticmethod
+    def _backup_lines(namespace, boxes):
+        """Yield every box as a line of JSON.
+
+        If reading a box fails, the stream ends with an error record, so
+        an interrupted backup is not taken for a complete one.
+        """
+        try:
+            for box in boxes:
+                yield json.dumps(box.to_dict(), separators=(',', ':')) + '\n'
+        except Exception as exception:  # pylint: disable=broad-except
+            log.error(f"Backup of namespace {namespace} interrupted: "
+                      f"{exception}")
+            error = {"error": f"Backup interrupted: {exception}"}
+            yield json.dumps(error, separators=(',', ':')) + '\n'
+
     def shutdown(self):
         """Execute before the NApp is unloaded."""
         log.info("Storehouse NApp is shutting down.")
+        if self._warmup_executor is not None:
+            self._warmup_executor.shutdown(wait=False)
+        PROFILER.stop()
+        self.writes.close()
+        self.backend.close()
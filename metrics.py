@@ -0,0 +1,298 @@
+"""Operation metrics of the Storehouse NApp.
+
+Latency histograms and error counters of the backend calls and of the REST
+and event handlers, labeled by operation and namespace, plus the bytes
+read and written by the serializers. They are rendered in the Prometheus
+text format on ``v1/metrics``. Namespaces that do not exist share a single
+label, so requests naming arbitrary namespaces do not add series.
+"""
+
+import functools
+from bisect import bisect_left
+from threading import Lock
+from time import perf_counter
+
+from napps.kytos.storehouse import settings
+from napps.kytos.storehouse.profiling import phase, track
+
+#: Upper bounds in seconds of the latency histogram buckets.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0)
+
+#: Namespace label of the operations on namespaces that do not exist.
+OTHER_NAMESPACE = '_other'
+
+#: Help of the histograms, by kind of operation.
+KINDS = {'backend': 'Latency of the backend calls.',
+         'handler': 'Latency of the REST and event handlers.'}
+
+
+def enabled():
+    """Return True if the operations are timed."""
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{_escape(value)}"'
+                    for name, value in labels.items())
+
+
+class Histogram:
+    """Latency histogram and error count of one operation."""
+
+    __slots__ = ('buckets', 'total', 'count', 'errors')
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        """Count an operation that took seconds."""
+        index = bisect_left(BUCKETS, seconds)
+        if index < len(BUCKETS):
+            self.buckets[index] += 1
+        self.total += seconds
+        self.count += 1
+        if error:
+            self.errors += 1
+
+
+class Metrics:
+    """Registry of the metrics of the NApp."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._bytes = {'read': 0, 'written': 0}
+        self._lock = Lock()
+        #: Function returning True if a namespace exists, or None to label
+        #: every namespace.
+        self.namespace_exists = None
+
+    def observe(self, operation, seconds, error=False):
+        """Count an operation.
+
+        Args:
+            operation(tuple): kind ('backend' or 'handler'), name and
+                namespace of the operation.
+
+        """
+        kind, operation, namespace = operation
+        if (namespace and self.namespace_exists is not None and
+                not self.namespace_exists(namespace)):
+            namespace = OTHER_NAMESPACE
+        key = (kind, operation, namespace or '')
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds, error)
+
+    def add_bytes(self, direction, size):
+        """Count bytes 'read' or 'written' by the serializers."""
+        with self._lock:
+            self._bytes[direction] += size
+
+    def clear(self):
+        """Reset every metric."""
+        with self._lock:
+            self._histograms.clear()
+            self._bytes = dict.fromkeys(self._bytes, 0)
+
+    def render(self, cache=None, writes=None):
+        """Return the metrics in the Prometheus text format.
+
+        Args:
+            cache(dict): the stats of the box cache, if any.
+            writes(WritePipeline): the write pipeline, if any.
+
+        """
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counts = {key: (list(histogram.buckets), histogram.total,
+                            histogram.count, histogram.errors)
+                      for key, histogram in histograms}
+            read_bytes = self._bytes['read']
+            written_bytes = self._bytes['written']
+
+        lines = []
+        for kind, help_text in KINDS.items():
+            lines += _histogram_lines(kind, help_text, counts)
+
+        lines += ['# HELP storehouse_read_bytes_total Bytes of the records '
+                  'read from the backend.',
+                  '# TYPE storehouse_read_bytes_total counter',
+                  f'storehouse_read_bytes_total {read_bytes}',
+                  '# HELP storehouse_written_bytes_total Bytes of the records '
+                  'written to the backend.',
+                  '# TYPE storehouse_written_bytes_total counter',
+                  f'storehouse_written_bytes_total {written_bytes}']
+
+        if cache is not None:
+            lines += _cache_lines(cache)
+
+        if writes is not None:
+            lines += ['# HELP storehouse_write_groups_total Groups of writes '
+                      'committed together.',
+                      '# TYPE storehouse_write_groups_total counter',
+                      f'storehouse_write_groups_total {writes.groups}',
+                      '# HELP storehouse_grouped_writes_total Writes '
+                      'committed in groups.',
+                      '# TYPE storehouse_grouped_writes_total counter',
+                      f'storehouse_grouped_writes_total {writes.writes}']
+        return '\n'.join(lines) + '\n'
+
+
+def _bucket_lines(name, labels, buckets):
+    """Return the cumulative counts of the buckets of a histogram."""
+    lines = []
+    cumulative = 0
+    for bound, bucket in zip(BUCKETS, buckets):
+        cumulative += bucket
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    return lines
+
+
+def _histogram_lines(kind, help_text, counts):
+    """Return the lines of the histograms and errors of a kind."""
+    label = 'operation' if kind == 'backend' else 'handler'
+    name = f'storehouse_{kind}_seconds'
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    errors = []
+    for key, (buckets, total, count, error_count) in counts.items():
+        if key[0] != kind:
+            continue
+        labels = _labels(**{label: key[1], 'namespace': key[2]})
+        lines += _bucket_lines(name, labels, buckets)
+        lines += [f'{name}_bucket{{{labels},le="+Inf"}} {count}',
+                  f'{name}_sum{{{labels}}} {total}',
+                  f'{name}_count{{{labels}}} {count}']
+        errors.append(f'storehouse_{kind}_errors_total{{{labels}}} '
+                      f'{error_count}')
+    return lines + [f'# HELP storehouse_{kind}_errors_total Number of '
+                    f'failed {kind} operations.',
+                    f'# TYPE storehouse_{kind}_errors_total counter',
+                    *errors]
+
+
+def _cache_lines(cache):
+    """Return the lines of the stats of the box cache."""
+    lines = []
+    for name in ('hits', 'misses', 'evictions'):
+        lines += [f'# HELP storehouse_cache_{name}_total Box cache {name}.',
+                  f'# TYPE storehouse_cache_{name}_total counter',
+                  f'storehouse_cache_{name}_total {cache[name]}']
+    lookups = cache['hits'] + cache['misses']
+    ratio = cache['hits'] / lookups if lookups else 0.0
+    return lines + ['# HELP storehouse_cache_entries Boxes in the cache.',
+                    '# TYPE storehouse_cache_entries gauge',
+                    f'storehouse_cache_entries {cache["entries"]}',
+                    '# HELP storehouse_cache_hit_ratio Fraction of the '
+                    'lookups served by the box cache.',
+                    '# TYPE storehouse_cache_hit_ratio gauge',
+                    f'storehouse_cache_hit_ratio {ratio}']
+
+
+#: Metrics of the NApp, shared by its handlers, backend and serializers.
+METRICS = Metrics()
+
+
+def _namespace(args):
+    """Return the namespace of the arguments of a backend method."""
+    if not args:
+        return ''
+    first = args[0]
+    if isinstance(first, str):
+        return first
+    if isinstance(first, (list, tuple)):
+        first = first[0] if first else None
+    return getattr(first, 'namespace', '')
+
+
+def _box_id(args):
+    """Return the box_id of the arguments of a backend method, if any."""
+    for arg in args[:2]:
+        if hasattr(arg, 'box_id'):
+            return arg.box_id
+    if len(args) > 1 and isinstance(args[1], str):
+        return args[1]
+    return None
+
+
+class InstrumentedBackend:
+    """Proxy of a backend timing the calls to its public methods.
+
+    Methods returning iterators, such as list and backup, are timed until
+    they return, not until the iterator is consumed. The calls are tracked
+    operations, their time outside other phases being 'io'.
+    """
+
+    def __init__(self, backend, metrics=METRICS):
+        self.backend = backend
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        attribute = getattr(self.backend, name)
+        if name.startswith('_') or not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            failed = True
+            namespace = _namespace(args)
+            try:
+                with track(name, namespace, _box_id(args)), phase('io'):
+                    result = attribute(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self.metrics.observe(('backend', name, namespace),
+                                     perf_counter() - start, failed)
+
+        # Later calls find the wrapper without going through __getattr__.
+        setattr(self, name, timed)
+        return timed
+
+
+def _status(result):
+    """Return the HTTP status of the value returned by a REST handler."""
+    if isinstance(result, tuple) and len(result) > 1:
+        return result[1]
+    return getattr(result, 'status_code', 200)
+
+
+def timed_handler(handler):
+    """Time a REST or event handler method of the NApp.
+
+    REST handlers fail if they raise or answer with a 5xx status and event
+    handlers if they raise. The calls are tracked operations.
+    """
+    @functools.wraps(handler)
+    def timed(napp, *args, **kwargs):
+        if not enabled():
+            return handler(napp, *args, **kwargs)
+        event = args[0] if args else None
+        namespace = kwargs.get('namespace')
+        box_id = kwargs.get('box_id')
+        if hasattr(event, 'content'):
+            namespace = event.content.get('namespace')
+            box_id = event.content.get('box_id')
+        start = perf_counter()
+        failed = True
+        try:
+            with track(handler.__name__, namespace, box_id):
+                result = handler(napp, *args, **kwargs)
+            failed = (not hasattr(event, 'content') and
+                      _status(result) >= 500)
+            return result
+        finally:
+            METRICS.observe(('handler', handler.__name__, namespace),
+                            perf_counter() - start, failed)
+    return timed
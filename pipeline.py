@@ -0,0 +1,172 @@
+"""Write pipeline of the Storehouse NApp.
+
+Apply the writes to the backend according to a durability policy, telling
+when a write is acknowledged:
+
+- ``none``: once the backend returns, without syncing it.
+- ``write``: once the backend is synced after the write.
+- ``group``: once the backend is synced after the group of writes the
+  write was committed with. Writes queued by concurrent callers are
+  applied by a single thread, with runs of creates in one backend batch,
+  and synced together every ``interval`` seconds or ``max_batch`` writes.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from kytos.core import log
+from napps.kytos.storehouse.profiling import phase
+
+#: Durability policies accepted by the WRITE_DURABILITY setting.
+POLICIES = ('none', 'write', 'group')
+
+
+class WritePipeline:
+    """Apply the writes of the NApp to the backend."""
+
+    def __init__(self, backend, durability='none', interval=0.005,
+                 max_batch=128):
+        if durability not in POLICIES:
+            raise ValueError(f"Unknown durability '{durability}', expected "
+                             f"one of {', '.join(POLICIES)}")
+        self.backend = backend
+        self.durability = durability
+        self.interval = interval
+        self.max_batch = max_batch
+        #: Number of groups and writes committed in group mode.
+        self.groups = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._committer = None
+        if durability == 'group':
+            self._committer = threading.Thread(target=self._commit_loop,
+                                               name='storehouse-writes',
+                                               daemon=True)
+            self._committer.start()
+
+    def submit(self, operation, *args):
+        """Run a backend write method, returning once it is acknowledged.
+
+        Args:
+            operation(str): name of the backend method, e.g. 'create'.
+            args: arguments of the backend method.
+
+        Returns:
+            The value returned by the backend method.
+
+        Raises:
+            Any exception raised by the backend method or by its sync.
+
+        """
+        if self.durability == 'group':
+            future = Future()
+            self._queue.put((operation, args, future))
+            with phase('write_wait'):
+                return future.result()
+
+        result = getattr(self.backend, operation)(*args)
+        if self.durability == 'write':
+            self.backend.sync()
+        return result
+
+    def _next_group(self):
+        """Wait for the writes of the next group.
+
+        Returns:
+            list: (operation, args, future) of each write, or None once
+            the pipeline is closed.
+
+        """
+        write = self._queue.get()
+        if write is None:
+            return None
+        group = [write]
+        deadline = time.monotonic() + self.interval
+        while len(group) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                write = (self._queue.get(timeout=timeout) if timeout > 0
+                         else self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if write is None:
+                self._queue.put(None)
+                break
+            group.append(write)
+        return group
+
+    def _commit_loop(self):
+        while True:
+            group = self._next_group()
+            if group is None:
+                return
+            self._commit(group)
+
+    def _commit(self, group):
+        """Apply a group of writes in order and sync the backend once."""
+        results = []
+        index = 0
+        while index < len(group):
+            end = index
+            while end < len(group) and group[end][0] == 'create':
+                end += 1
+            if end - index > 1:
+                results.extend(self._create_many(group[index:end]))
+                index = end
+                continue
+            operation, args, _ = group[index]
+            results.append(self._apply(operation, args))
+            index += 1
+
+        try:
+            self.backend.sync()
+        except Exception as exception:  # pylint: disable=broad-except
+            log.error(f"Failed to sync {len(group)} writes: {exception}")
+            results = [(None, exception)] * len(group)
+        self.groups += 1
+        self.writes += len(group)
+
+        for (_, _, future), (result, exception) in zip(group, results):
+            if exception is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exception)
+
+    def _apply(self, operation, args):
+        """Return the (result, exception) of a backend write."""
+        try:
+            return getattr(self.backend, operation)(*args), None
+        except Exception as exception:  # pylint: disable=broad-except
+            return None, exception
+
+    def _create_many(self, writes):
+        """Create the boxes of consecutive creates in a single batch.
+
+        If the batch fails, the boxes are created one at a time so only
+        the failing writes get the error.
+        """
+        boxes = [args[0] for _, args, _ in writes]
+        if self._apply('create_many', (boxes,))[1] is None:
+            return [(box.box_id, None) for box in boxes]
+        return [self._apply('create', args) for _, args, _ in writes]
+
+    def close(self):
+        """Commit the queued writes and stop the committer thread.
+
+        Writes submitted afterwards are synced one at a time.
+        """
+        if self._committer is None:
+            return
+        self.durability = 'write'
+        self._queue.put(None)
+        self._committer.join()
+        self._committer = None
+        late = []
+        while not self._queue.empty():
+            write = self._queue.get_nowait()
+            if write is not None:
+                late.append(write)
+        if late:
+            self._commit(late)
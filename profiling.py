@@ -0,0 +1,304 @@
+"""Slow operation log and on-demand profiling of the Storehouse NApp.
+
+The handlers and backend methods timed by the metrics run as tracked
+operations. While an operation runs on a thread, the time spent in its
+phases (waiting for locks, backend I/O, (de)serialization, cache updates,
+waiting for a group commit) is accumulated, a nested phase pausing the one
+around it. Operations slower than SLOW_OPERATION_THRESHOLD are logged with
+that breakdown.
+
+The Profiler runs cProfile over every tracked operation, or tracemalloc over
+the whole process, for a time window requested on ``v1/profile``.
+"""
+
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+
+from kytos.core import log
+from napps.kytos.storehouse import settings
+
+#: Phases of the operations, in the order they are logged.
+PHASES = ('lock', 'io', 'serialize', 'deserialize', 'cache', 'write_wait')
+
+_local = threading.local()
+
+
+class Operation:
+    """Timings of the operation running on a thread."""
+
+    __slots__ = ('name', 'namespace', 'box_id', 'size', 'phases', 'start',
+                 '_phase', '_since')
+
+    def __init__(self, name, namespace=None, box_id=None):
+        self.name = name
+        self.namespace = namespace
+        self.box_id = box_id
+        self.size = 0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.start = self._since = perf_counter()
+        self._phase = None
+
+    def switch(self, name):
+        """Start accounting time to a phase, returning the previous one."""
+        now = perf_counter()
+        if self._phase is not None:
+            self.phases[self._phase] += now - self._since
+        self._since = now
+        previous, self._phase = self._phase, name
+        return previous
+
+    def report(self, elapsed):
+        """Return the log message of the operation."""
+        where = ''
+        if self.namespace:
+            where += f" on namespace '{self.namespace}'"
+        if self.box_id is not None:
+            where += f", box '{self.box_id}'"
+        phases = [f'{name} {seconds * 1000:.1f} ms'
+                  for name, seconds in self.phases.items() if seconds]
+        other = elapsed - sum(self.phases.values())
+        phases.append(f'other {max(other, 0) * 1000:.1f} ms')
+        return (f"Slow operation {self.name}{where}: {elapsed * 1000:.1f} "
+                f"ms, {self.size} bytes ({', '.join(phases)})")
+
+
+def current():
+    """Return the operation running on this thread, if any."""
+    return getattr(_local, 'operation', None)
+
+
+@contextmanager
+def phase(name):
+    """Account the time spent in the context to a phase of the operation.
+
+    It can also decorate a function. Nothing is done if no operation runs
+    on the thread.
+    """
+    operation = current()
+    if operation is None:
+        yield
+        return
+    outer = operation.switch(name)
+    try:
+        yield
+    finally:
+        operation.switch(outer)
+
+
+def add_payload(size):
+    """Count bytes read or written by the operation running on the thread."""
+    operation = current()
+    if operation is not None:
+        operation.size += size
+
+
+@contextmanager
+def track(name, namespace=None, box_id=None):
+    """Track an operation, unless one already runs on the thread.
+
+    The operation is logged if it takes SLOW_OPERATION_THRESHOLD
+    milliseconds or more, and profiled if a CPU profile is running.
+    """
+    if current() is not None:
+        yield
+        return
+    threshold = getattr(settings, 'SLOW_OPERATION_THRESHOLD', 1000)
+    profile = PROFILER.operation_profile()
+    if not threshold and profile is None:
+        yield
+        return
+
+    operation = _local.operation = Operation(name, namespace, box_id)
+    if profile is not None:
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active on the thread.
+            profile = None
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+            PROFILER.add(profile)
+        _local.operation = None
+        operation.switch(None)
+        elapsed = perf_counter() - operation.start
+        if threshold and elapsed * 1000 >= threshold:
+            log.warning(operation.report(elapsed))
+
+
+class TimedLock:
+    """Lock whose waits are accounted to the 'lock' phase."""
+
+    def __init__(self, lock):
+        self._lock = lock
+
+    def __enter__(self):
+        with phase('lock'):
+            self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+class Profiler:
+    """Run cProfile or tracemalloc over a time window.
+
+    A 'cpu' profile runs cProfile over every tracked operation that starts
+    during the window. A 'memory' profile reports the allocations made
+    during the window, by line, with tracemalloc. Only one profile runs at
+    a time and the result of the last one is kept until the next starts.
+    """
+
+    MODES = ('cpu', 'memory')
+
+    def __init__(self):
+        self.state = 'idle'
+        self.mode = None
+        self.seconds = 0
+        self.started_at = None
+        self.operations = 0
+        self._stats = None
+        self._memory = None
+        self._baseline = None
+        self._started_tracing = False
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def start(self, mode='cpu', seconds=30):
+        """Start a profile that stops by itself after seconds.
+
+        Raises:
+            ValueError: if mode or seconds are invalid.
+            RuntimeError: if a profile is already running.
+
+        """
+        max_seconds = getattr(settings, 'PROFILE_MAX_SECONDS', 300)
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profile mode '{mode}', expected one "
+                             f"of {', '.join(self.MODES)}")
+        if (not isinstance(seconds, (int, float)) or
+                isinstance(seconds, bool) or
+                not 0 < seconds <= max_seconds):
+            raise ValueError(f"seconds must be a number between 0 and "
+                             f"{max_seconds}")
+
+        with self._lock:
+            if self.state == 'running':
+                raise RuntimeError("A profile is already running")
+            self.mode = mode
+            self.seconds = seconds
+            self.started_at = str(datetime.utcnow())
+            self.operations = 0
+            self._stats = self._memory = None
+            if mode == 'memory':
+                self._started_tracing = not tracemalloc.is_tracing()
+                if self._started_tracing:
+                    tracemalloc.start()
+                self._baseline = tracemalloc.take_snapshot()
+            self._timer = threading.Timer(seconds, self.stop)
+            self._timer.daemon = True
+            self._timer.start()
+            self.state = 'running'
+        log.info(f"Started a {mode} profile of {seconds} seconds.")
+        return self.status()
+
+    def operation_profile(self):
+        """Return a cProfile.Profile for an operation, if profiling CPU."""
+        if self.state == 'running' and self.mode == 'cpu':
+            return cProfile.Profile()
+        return None
+
+    def add(self, profile):
+        """Merge the profile of an operation into the running profile."""
+        with self._lock:
+            if self.state != 'running' or self.mode != 'cpu':
+                return
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.operations += 1
+
+    def stop(self):
+        """Stop the running profile, if any, keeping its result.
+
+        Returns:
+            bool: True if a profile was running.
+
+        """
+        with self._lock:
+            if self.state != 'running':
+                return False
+            self._timer.cancel()
+            if self.mode == 'memory':
+                snapshot = tracemalloc.take_snapshot()
+                if self._started_tracing:
+                    tracemalloc.stop()
+                self._memory = snapshot.compare_to(self._baseline, 'lineno')
+                self._baseline = None
+            self.state = 'done'
+        log.info(f"Finished the {self.mode} profile.")
+        return True
+
+    def status(self):
+        """Return the state of the last profile."""
+        with self._lock:
+            return {'state': self.state, 'mode': self.mode,
+                    'seconds': self.seconds, 'started_at': self.started_at,
+                    'operations': self.operations}
+
+    def result(self, output_format='text'):
+        """Return the result of the last profile.
+
+        Args:
+            output_format(str): 'text', or 'pstats' for the binary dump of
+                a cpu profile, as written by pstats.Stats.dump_stats.
+
+        Returns:
+            tuple: the content, its mimetype and a file name, or None if
+                no profile is done.
+
+        Raises:
+            ValueError: if the format is unknown for the profile.
+
+        """
+        with self._lock:
+            if self.state != 'done':
+                return None
+            if output_format not in ('text', 'pstats') or (
+                    output_format == 'pstats' and self.mode != 'cpu'):
+                raise ValueError(f"Unknown format '{output_format}' for a "
+                                 f"{self.mode} profile")
+            if self.mode == 'memory':
+                lines = [str(statistic) for statistic in self._memory[:
+                         getattr(settings, 'PROFILE_TOP', 50)]]
+                return ('\n'.join(lines) + '\n', 'text/plain',
+                        'storehouse-memory.txt')
+            if output_format == 'pstats':
+                content = marshal.dumps(self._stats.stats if self._stats
+                                        else {})
+            elif self._stats is None:
+                content = 'No operation was profiled.\n'
+            else:
+                stream = io.StringIO()
+                self._stats.stream = stream
+                self._stats.sort_stats('cumulative').print_stats(
+                    getattr(settings, 'PROFILE_TOP', 50))
+                content = stream.getvalue()
+        if output_format == 'pstats':
+            return content, 'application/octet-stream', 'storehouse.prof'
+        return content, 'text/plain', 'storehouse-cpu.txt'
+
+
+#: Profiler of the NApp, driven by the v1/profile endpoints.
+PROFILER = Profiler()
@@ -0,0 +1,219 @@
+"""Metadata search index for the Storehouse NApp."""
+
+import re
+from bisect import bisect_left, insort
+from collections import namedtuple
+from functools import lru_cache
+from itertools import islice
+from threading import Lock
+
+#: Metadata fields indexed for every box.
+INDEXED_FIELDS = ('box_id', 'owner', 'created_at')
+#: Query modes accepted by :meth:`MetadataIndex.search`.
+SEARCH_MODES = ('exact', 'prefix', 'contains', 'regex')
+#: Length of the substrings kept by the n-gram index.
+NGRAM_SIZE = 3
+
+
+def ngrams(value, size=NGRAM_SIZE):
+    """Return the set of substrings of a given size in value."""
+    return {value[i:i + size] for i in range(len(value) - size + 1)}
+
+
+class MetadataRecord(namedtuple('MetadataRecord', ('owner', 'created_at',
+                                                   'revision', 'hash'))):
+    """Metadata of a box, kept under its box_id.
+
+    A tuple takes a fraction of the memory of the metadata dictionary.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, metadata):
+        """Create a record from the metadata of a box."""
+        return cls(metadata.get('owner'), metadata.get('created_at'),
+                   metadata.get('revision'), metadata.get('hash'))
+
+    def to_dict(self, box_id):
+        """Return the metadata of the box_id of the record."""
+        return {'box_id': box_id, 'owner': self.owner,
+                'created_at': self.created_at, 'revision': self.revision,
+                'hash': self.hash}
+
+
+@lru_cache(maxsize=256)
+def _compile(pattern):
+    return re.compile(pattern)
+
+
+class FieldIndex:
+    """Index of the values of one metadata field in a namespace.
+
+    Keep a hash map from value to box ids for exact matches, the sorted
+    distinct values for prefix matches and an n-gram map for substring
+    matches.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.sorted_values = []
+        self.ngrams = {}
+
+    def add(self, value, box_id):
+        """Index box_id under value."""
+        box_ids = self.values.get(value)
+        if box_ids is None:
+            box_ids = self.values[value] = set()
+            insort(self.sorted_values, value)
+            for gram in ngrams(value):
+                self.ngrams.setdefault(gram, set()).add(value)
+        box_ids.add(box_id)
+
+    def remove(self, value, box_id):
+        """Remove box_id from the entries of value."""
+        box_ids = self.values.get(value)
+        if box_ids is None:
+            return
+        box_ids.discard(box_id)
+        if box_ids:
+            return
+        del self.values[value]
+        del self.sorted_values[bisect_left(self.sorted_values, value)]
+        for gram in ngrams(value):
+            values = self.ngrams[gram]
+            values.discard(value)
+            if not values:
+                del self.ngrams[gram]
+
+    def _box_ids(self, values):
+        result = set()
+        for value in values:
+            result.update(self.values[value])
+        return result
+
+    def exact(self, query):
+        """Return the box ids whose value is query."""
+        return set(self.values.get(query, ()))
+
+    def prefix(self, query):
+        """Return the box ids whose value starts with query."""
+        values = []
+        start = bisect_left(self.sorted_values, query)
+        for value in islice(self.sorted_values, start, None):
+            if not value.startswith(query):
+                break
+            values.append(value)
+        return self._box_ids(values)
+
+    def contains(self, query):
+        """Return the box ids whose value contains query."""
+        if len(query) < NGRAM_SIZE:
+            return self._box_ids(value for value in self.values
+                                 if query in value)
+
+        candidates = None
+        for gram in sorted(ngrams(query),
+                           key=lambda gram: len(self.ngrams.get(gram, ()))):
+            values = self.ngrams.get(gram)
+            if not values:
+                return set()
+            candidates = (set(values) if candidates is None
+                          else candidates & values)
+        return self._box_ids(value for value in candidates if query in value)
+
+    def regex(self, pattern):
+        """Return the box ids whose value matches the regular expression."""
+        regex = _compile(pattern)
+        return self._box_ids(value for value in self.values
+                             if regex.search(value))
+
+
+def _field_values(box_id, record):
+    """Return the (field, value) of the indexed fields of a record."""
+    return zip(INDEXED_FIELDS, (box_id, record.owner, record.created_at))
+
+
+class MetadataIndex:
+    """Search index over the metadata of the boxes of every namespace.
+
+    The records attribute maps each namespace to a dict of the
+    MetadataRecord of each box_id.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self._fields = {}
+        self._lock = Lock()
+
+    def add_namespace(self, namespace):
+        """Register a namespace, even if it has no box."""
+        with self._lock:
+            self.records.setdefault(namespace, {})
+
+    def add(self, namespace, metadata):
+        """Index the metadata of a box, replacing a previous entry."""
+        box_id = metadata['box_id']
+        record = MetadataRecord.from_dict(metadata)
+        with self._lock:
+            self._remove(namespace, box_id)
+            self.records.setdefault(namespace, {})[box_id] = record
+            fields = self._fields.setdefault(
+                namespace, {field: FieldIndex() for field in INDEXED_FIELDS})
+            for field, value in _field_values(box_id, record):
+                if value is not None:
+                    fields[field].add(str(value), box_id)
+
+    def remove(self, namespace, box_id):
+        """Remove a box from the index."""
+        with self._lock:
+            self._remove(namespace, box_id)
+
+    def _remove(self, namespace, box_id):
+        record = self.records.get(namespace, {}).pop(box_id, None)
+        if record is None:
+            return
+        fields = self._fields[namespace]
+        for field, value in _field_values(box_id, record):
+            if value is not None:
+                fields[field].remove(str(value), box_id)
+
+    def exists(self, namespace, box_id):
+        """Return True if a box is in the index."""
+        return box_id in self.records.get(namespace, ())
+
+    def get(self, namespace, box_id):
+        """Return the metadata of a box, or None if it is not indexed."""
+        record = self.records.get(namespace, {}).get(box_id)
+        return None if record is None else record.to_dict(box_id)
+
+    def search(self, namespace, field, query, mode='contains'):
+        """Return the metadata of the boxes matching query.
+
+        Args:
+            namespace(str): namespace where the boxes are stored
+            field(str): metadata field to be searched
+            query(str): value, prefix, substring or pattern to search for
+            mode(str): one of 'exact', 'prefix', 'contains' or 'regex'
+
+        Returns:
+            list: metadata of the matching boxes, sorted by box_id
+
+        Raises:
+            ValueError: if mode is unknown or the regex is invalid.
+
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Invalid search mode '{mode}'")
+        try:
+            with self._lock:
+                index = self._fields.get(namespace, {}).get(field)
+                if index is None:
+                    return []
+                box_ids = getattr(index, mode)(query)
+                records = self.records[namespace]
+                return [records[box_id].to_dict(box_id)
+                        for box_id in sorted(box_ids)]
+        except re.error as exception:
+            raise ValueError(f"Invalid regex '{query}': {exception}") \
+                from exception
@@ -1,9 +1,94 @@
 """Settings for the kytos/storehouse NApp."""
 
-# Where to store data: "filesystem" (default) or "etcd" (requires a
+# Where to store data: "filesystem" (default), "logstore" (append-only
+# segment files), "sqlite" (a single database file) or "etcd" (requires a
 # running server)
 BACKEND = "filesystem"
 # Path to serialize the objects, relative to a venv, if it exists.
 CUSTOM_DESTINATION_PATH = "/var/tmp/kytos/storehouse"
 # Path to store lock files, relative to a venv, if it exists.
 CUSTOM_LOCK_PATH = "/var/tmp/lock"
+# Number of locks shared by the boxes of the "filesystem" backend, and number
+# of lock files holding them for other processes.
+FS_LOCK_SHARDS = 256
+FS_LOCK_FILES = 16
+# Store the boxes of the "filesystem" backend in two levels of directories
+# named by a hash of the box id, e.g. <namespace>/ab/cd/<box_id>, keeping
+# directories small in large namespaces. Boxes of flat namespaces are moved
+# in the background on startup and stay readable meanwhile.
+FS_HASHED_LAYOUT = False
+# Format used to write boxes: "pickle" (default), "json" or "msgpack" (requires
+# the msgpack package). Records written in any format remain readable, and
+# boxes the chosen format can not represent are written with pickle.
+SERIALIZER = "pickle"
+# Compression of large boxes: None (default), "zlib" or "lzma". Boxes are only
+# stored compressed when that makes them smaller.
+COMPRESSION = None
+# Minimum serialized size in bytes of the boxes to be compressed.
+COMPRESSION_THRESHOLD = 4096
+# Compression by namespace, overriding COMPRESSION for a namespace and its
+# nested namespaces, e.g. {"kytos.topology": "zlib", "kytos.of_lldp": None}.
+COMPRESSION_NAMESPACES = {}
+# PATCH updates are journaled next to the box instead of rewriting it. The
+# journal is folded into the box once it has more entries than this, or once
+# it is as large as the box.
+PATCH_JOURNAL_MAX_ENTRIES = 64
+# Maximum number of boxes kept in the LRU read cache (0 for no limit).
+BOX_CACHE_MAX_ENTRIES = 1024
+# Maximum pickled size in bytes of the boxes kept in the read cache (0 for no
+# limit). The cache is disabled when both limits are 0.
+BOX_CACHE_MAX_BYTES = 0
+# When writes are acknowledged: "none" (default) once the backend returns,
+# "write" once the backend is synced to the disk after each write, or "group"
+# once the backend is synced after a group of writes, committed together
+# every WRITE_GROUP_INTERVAL milliseconds or WRITE_GROUP_SIZE writes.
+WRITE_DURABILITY = "none"
+WRITE_GROUP_INTERVAL = 5
+WRITE_GROUP_SIZE = 128
+# Time every backend call and REST/event handler, exposed on v1/metrics.
+METRICS_ENABLED = True
+# Log the handlers and backend calls taking at least this many milliseconds,
+# with the time spent waiting for locks, in I/O, (de)serializing, updating
+# the caches and waiting for a group commit. 0 disables the log. The
+# operations are only tracked if METRICS_ENABLED is True.
+SLOW_OPERATION_THRESHOLD = 1000
+# Longest window, in seconds, of a profile requested on v1/profile and number
+# of functions or lines in its text result.
+PROFILE_MAX_SECONDS = 300
+PROFILE_TOP = 50
+# Box_ids or search results in a page when a cursor is given without a limit,
+# and the largest page that can be requested.
+LIST_PAGE_SIZE = 100
+LIST_PAGE_MAX = 1000
+# Load the metadata cache in background threads instead of blocking the NApp
+# setup. Searches on namespaces not loaded yet are answered by the backend.
+CACHE_WARMUP_BACKGROUND = False
+# Number of threads loading namespaces during a background warmup.
+CACHE_WARMUP_WORKERS = 4
+
+# Path to the segment files of the "logstore" backend, relative to a venv,
+# if it exists.
+CUSTOM_LOGSTORE_PATH = "/var/tmp/kytos/storehouse-log"
+# Size in bytes after which the "logstore" backend starts a new segment.
+LOGSTORE_SEGMENT_SIZE = 64 * 1024 * 1024
+# Fraction of dead bytes that makes a sealed segment eligible for compaction.
+LOGSTORE_COMPACTION_RATIO = 0.5
+# Interval in seconds between two background compaction runs.
+LOGSTORE_COMPACTION_INTERVAL = 60
+
+# Path to the database of the "sqlite" backend, relative to a venv, if it
+# exists.
+CUSTOM_SQLITE_PATH = "/var/tmp/kytos/storehouse.sqlite3"
+# SQLite synchronous mode: "NORMAL" (default) may lose the last transactions
+# on a power loss but never corrupts the database in WAL mode, "FULL" syncs
+# every transaction.
+SQLITE_SYNCHRONOUS = "NORMAL"
+# Seconds a write waits for another process holding the database lock.
+SQLITE_BUSY_TIMEOUT = 5
+
+# Maximum number of operations in one etcd transaction, as configured by the
+# --max-txn-ops option of the etcd server.
+ETCD_MAX_TXN_OPS = 128
+# Maximum number of keys read by each range request when listing or backing
+# up an etcd namespace.
+ETCD_PAGE_SIZE = 1000
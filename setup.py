@@ -274,7 +274,7 @@ setup(name=f'kytos_{NAPP_NAME}',
       author='Kytos Team',
       author_email='of-ng-dev@ncc.unesp.br',
       license='MIT',
-      install_requires=['etcd3', 'filelock', 'flask', 'kytos'],
+      install_requires=['etcd3', 'flask', 'kytos'],
       setup_requires=['pytest-runner'],
       tests_require=['pytest'],
       extras_require={
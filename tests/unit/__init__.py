@@ -1 +1,6 @@
 """kytos/storehouse unit tests."""
+from unittest.mock import patch
+
+# Event handlers must run synchronously in the unit tests, so the thread
+# decorator used by listen_to is disabled before the NApp is imported.
+patch('kytos.core.helpers.run_on_thread', lambda x: x).start()
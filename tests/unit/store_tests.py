@@ -0,0 +1,85 @@
+"""Tests shared by the backends storing their files in a directory."""
+import os
+import tempfile
+from unittest.mock import patch
+
+from napps.kytos.storehouse.backends.base import (RevisionConflict,
+                                                  content_hash, stamp)
+from napps.kytos.storehouse.main import Box
+
+# StoreTests is mixed into TestCases, which provide the assert methods.
+# pylint: disable=invalid-name, no-member, not-callable
+
+
+class StoreTests:
+    """Mixin of the TestCases of a backend opened in a temporary directory.
+
+    Subclasses set store_class and return the settings of the backend in
+    that directory from store_settings.
+    """
+
+    store_class = None
+
+    def store_settings(self, directory):
+        """Return the settings of the backend storing its files there."""
+        raise NotImplementedError
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        settings_patch = patch.multiple(
+            'napps.kytos.storehouse.settings',
+            **self.store_settings(self.tmp_dir.name), create=True)
+        settings_patch.start()
+        self.addCleanup(settings_patch.stop)
+        patch.dict(os.environ, {'VIRTUAL_ENV': ''}).start()
+        self.addCleanup(patch.stopall)
+        self.store = self._open()
+
+    def _open(self):
+        store = self.store_class()
+        self.addCleanup(store.close)
+        return store
+
+    def test_create_and_retrieve(self):
+        """Test create and retrieve methods."""
+        box = Box({'a': 1}, 'namespace', box_id='123')
+        self.store.create(box)
+
+        retrieved = self.store.retrieve('namespace', '123')
+
+        self.assertEqual(retrieved.data, {'a': 1})
+        self.assertFalse(self.store.retrieve('namespace', '456'))
+        self.assertFalse(self.store.retrieve('other', '123'))
+
+    def test_expected_revision(self):
+        """Test update and patch methods checking the expected revision."""
+        box = stamp(Box({'a': 1}, 'namespace', box_id='123'))
+        self.store.create(box)
+        revision = box.revision
+
+        with self.assertRaises(RevisionConflict):
+            self.store.patch('namespace', '123', {'a': 2},
+                             expected_revision=revision - 1)
+        self.store.update('namespace', stamp(box), expected_revision=revision)
+        with self.assertRaises(RevisionConflict):
+            self.store.update('namespace', box, expected_revision=revision)
+        self.assertTrue(self.store.patch('namespace', '123', {'a': 2},
+                                         expected_revision=box.revision))
+        self.assertEqual(self.store.retrieve('namespace', '123').data,
+                         {'a': 2})
+
+    def test_head_revision(self):
+        """Test head method reading the revision of the patched box."""
+        box = stamp(Box({'a': 1}, 'namespace', box_id='123'))
+        self.store.create(box)
+        self.assertEqual(self.store.head('namespace', '123')['revision'],
+                         box.revision)
+
+        patched = self.store.patch('namespace', '123', {'b': 2})
+
+        self.assertGreater(patched.revision, box.revision)
+        self.assertEqual(patched.hash, content_hash({'a': 1, 'b': 2}))
+        self.assertEqual(self.store.head('namespace', '123')['revision'],
+                         patched.revision)
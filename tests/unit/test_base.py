@@ -0,0 +1,173 @@
+"""Test StoreBase methods."""
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from napps.kytos.storehouse.backends.base import (RevisionConflict,
+                                                  StoreBase, apply_patch,
+                                                  check_revision, content_hash,
+                                                  metadata_from_box,
+                                                  next_revision, patch_record,
+                                                  stamp)
+from napps.kytos.storehouse.main import Box
+
+
+class MockStore(StoreBase):
+    """StoreBase whose required methods are mocked by each test."""
+
+    create = retrieve = update = delete = list = list_namespaces = None
+
+
+class TestStoreBase(TestCase):
+    """Tests for the default methods of the StoreBase class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.backend = MockStore()
+        self.backend.create = MagicMock()
+        self.backend.retrieve = MagicMock()
+        self.backend.delete = MagicMock(side_effect=[True, False])
+        self.backend.list = MagicMock(return_value=['123'])
+
+    def test_required_methods(self):
+        """Test StoreBase requires the methods without a default."""
+        with self.assertRaises(TypeError):
+            StoreBase()  # pylint: disable=abstract-class-instantiated
+
+    def test_create_many(self):
+        """Test create_many method creating each box."""
+        boxes = [Box('any', 'namespace'), Box('any', 'namespace')]
+
+        self.backend.create_many(boxes)
+
+        self.assertEqual(self.backend.create.call_count, 2)
+
+    def test_retrieve_many(self):
+        """Test retrieve_many method retrieving each box."""
+        results = self.backend.retrieve_many('namespace', ['123'])
+
+        self.backend.retrieve.assert_called_with('namespace', '123')
+        self.assertEqual(results, {'123': self.backend.retrieve()})
+
+    def test_exists_and_head(self):
+        """Test exists and head methods retrieving the box."""
+        self.backend.retrieve.side_effect = [Box('any', 'namespace'), False]
+
+        self.assertEqual(self.backend.head('namespace', '123'),
+                         {'size': None, 'revision': None})
+        self.assertFalse(self.backend.exists('namespace', '456'))
+
+    def test_patch(self):
+        """Test patch method returning the box stamped after the merge."""
+        box = Box({'a': 1}, 'namespace', box_id='123')
+        self.backend.retrieve.side_effect = [box, False]
+        self.backend.update = MagicMock()
+
+        self.assertIs(self.backend.patch('namespace', '123', {'b': 2}), box)
+        self.assertFalse(self.backend.patch('namespace', '456', {'b': 2}))
+        self.backend.update.assert_called_once_with('namespace', box, None)
+        self.assertEqual((box.data, box.hash),
+                         ({'a': 1, 'b': 2}, content_hash({'a': 1, 'b': 2})))
+        self.assertIsNotNone(box.revision)
+
+    def test_patch_revision_conflict(self):
+        """Test patch method checking the expected revision."""
+        box = Box({'a': 1}, 'namespace', box_id='123')
+        box.revision = 5
+        self.backend.retrieve.return_value = box
+        self.backend.update = MagicMock()
+
+        with self.assertRaises(RevisionConflict):
+            self.backend.patch('namespace', '123', {'b': 2},
+                               expected_revision=4)
+        self.backend.update.assert_not_called()
+        self.assertTrue(self.backend.patch('namespace', '123', {'b': 2},
+                                           expected_revision=5))
+        self.backend.update.assert_called_once_with('namespace', box, 5)
+
+    def test_list_page(self):
+        """Test list_page method returning sorted distinct box_ids."""
+        self.backend.list.return_value = ['5', '1', '4', '2', '4', '3']
+
+        self.assertEqual(self.backend.list_page('namespace', 3),
+                         ['1', '2', '3'])
+        self.assertEqual(self.backend.list_page('namespace', 3, after='3'),
+                         ['4', '5'])
+        self.assertEqual(self.backend.list_page('namespace', 3, after='5'),
+                         [])
+
+    def test_delete_many(self):
+        """Test delete_many method deleting each box."""
+        results = self.backend.delete_many('namespace', ['123', '456'])
+
+        self.assertEqual(results, {'123': True, '456': False})
+
+    def test_list_metadata(self):
+        """Test list_metadata method retrieving every box."""
+        box = Box('any', 'namespace', box_id='123')
+        self.backend.retrieve.return_value = box
+
+        self.assertEqual(self.backend.list_metadata('namespace'),
+                         [metadata_from_box(box)])
+        self.backend.retrieve.return_value = False
+        self.assertEqual(self.backend.list_metadata('namespace'), [])
+
+    def test_search_metadata(self):
+        """Test search_metadata method indexing the listed metadata."""
+        self.backend.list = MagicMock(return_value=['123', '456'])
+        self.backend.retrieve.side_effect = [
+            Box('any', 'namespace', box_id='123'),
+            Box('any', 'namespace', box_id='456')]
+
+        results = self.backend.search_metadata('namespace', 'box_id', '45',
+                                               'prefix')
+
+        self.assertEqual([result['box_id'] for result in results], ['456'])
+
+
+class TestRevisions(TestCase):
+    """Tests for the revision and hash helpers."""
+
+    def test_next_revision(self):
+        """Test next_revision always increases."""
+        first = next_revision()
+        second = next_revision()
+        self.assertGreater(second, first)
+        self.assertEqual(next_revision(after=second + 10 ** 9),
+                         second + 10 ** 9 + 1)
+        self.assertLess(next_revision(), 2 ** 53)
+
+    def test_next_revision_clock(self):
+        """Test next_revision uses the time in microseconds."""
+        now = next_revision() / 10 ** 6 + 60
+        with patch('time.time', return_value=now):
+            self.assertEqual(next_revision(), int(now * 1e6))
+
+    def test_stamp(self):
+        """Test stamp function giving a box a new revision and hash."""
+        box = stamp(Box({'a': 1}, 'namespace'))
+        revision = box.revision
+
+        self.assertEqual(box.hash, content_hash({'a': 1}))
+        self.assertNotEqual(box.hash, content_hash({'a': 2}))
+        self.assertGreater(stamp(box).revision, revision)
+
+    def test_patch_record(self):
+        """Test apply_patch with new and legacy records."""
+        box = Box({'a': 1}, 'namespace')
+        metadata = {'revision': 7, 'hash': 'h'}
+
+        apply_patch(box, patch_record({'b': 2}, metadata))
+        self.assertEqual((box.data, box.revision, box.hash),
+                         ({'a': 1, 'b': 2}, 7, 'h'))
+        apply_patch(box, patch_record({'c': 3}))
+        self.assertEqual((box.data, box.revision),
+                         ({'a': 1, 'b': 2, 'c': 3}, 7))
+
+    def test_check_revision(self):
+        """Test check_revision function."""
+        check_revision(5, 5)
+        check_revision(5)
+        with self.assertRaises(RevisionConflict):
+            check_revision(5, 4)
+        with self.assertRaises(RevisionConflict):
+            check_revision(None, 4)
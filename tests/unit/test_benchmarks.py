@@ -0,0 +1,132 @@
+"""Test the benchmark harness."""
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from napps.kytos.storehouse.backends.etcd import Etcd
+from napps.kytos.storehouse.benchmarks import report, runner
+from napps.kytos.storehouse.benchmarks.__main__ import _parser
+from napps.kytos.storehouse.benchmarks.fake_etcd import FakeEtcd
+from napps.kytos.storehouse.benchmarks.workloads import Workload, box_data
+from napps.kytos.storehouse.main import Box
+
+
+class TestFakeEtcd(TestCase):
+    """Tests for the in-memory etcd stand-in."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.backend = Etcd(FakeEtcd())
+        self.backend.page_size = 2
+
+    def test_etcd_backend(self):
+        """Test the etcd backend runs on top of FakeEtcd."""
+        self.backend.create_many([Box('any', 'namespace', box_id=str(i))
+                                  for i in range(5)])
+        self.backend.create(Box('any', 'namespace.sub', box_id='9'))
+
+        self.assertEqual(self.backend.retrieve('namespace', '3').data, 'any')
+        self.assertEqual(sorted(self.backend.list('namespace')),
+                         ['0', '1', '2', '3', '4'])
+        self.assertEqual(len(self.backend.list_metadata('namespace')), 5)
+        self.assertTrue(self.backend.delete('namespace', '3'))
+        self.assertFalse(self.backend.delete('namespace', '3'))
+        self.assertEqual(self.backend.delete_many('namespace', ['1', '3']),
+                         {'1': True, '3': False})
+        self.assertEqual(len(list(self.backend.backup('namespace'))), 3)
+
+    def test_compare(self):
+        """Test transactions compare the revisions of the keys."""
+        client = FakeEtcd()
+        client.put('key', 'value')
+        _, metadata = client.get('key')
+
+        succeeded, _ = client.transaction(
+            compare=[client.transactions.mod('key') == metadata.mod_revision],
+            success=[client.transactions.put('key', 'new')], failure=[])
+        failed, _ = client.transaction(
+            compare=[client.transactions.mod('key') == metadata.mod_revision],
+            success=[client.transactions.put('key', 'newer')], failure=[])
+
+        self.assertTrue(succeeded)
+        self.assertFalse(failed)
+        self.assertEqual(client.get('key')[0], b'new')
+
+
+class TestReport(TestCase):
+    """Tests for the summaries and comparisons of the results."""
+
+    def test_percentile(self):
+        """Test the nearest-rank percentile."""
+        values = list(range(1, 101))
+
+        self.assertEqual(report.percentile(values, 0.5), 50)
+        self.assertEqual(report.percentile(values, 0.99), 99)
+        self.assertEqual(report.percentile([], 0.99), 0.0)
+
+    def test_compare(self):
+        """Test regressions of throughput and p95 latency are reported."""
+        def run(throughput, p95_ms):
+            return {'workload': {'name': 'mixed'}, 'target': 'backend',
+                    'backend': 'sqlite', 'throughput': throughput,
+                    'operations': {'retrieve': {'p95_ms': p95_ms}}}
+        baseline = report.new_report([run(1000, 1.0)])
+
+        same = report.compare(baseline, report.new_report([run(950, 1.05)]))
+        slower = report.compare(baseline, report.new_report([run(500, 2.0)]))
+
+        self.assertEqual(same, [])
+        self.assertEqual(len(slower), 2)
+
+
+class TestRunner(TestCase):
+    """Tests for the benchmark runs."""
+
+    def test_schedule(self):
+        """Test workloads are reproducible and split between workers."""
+        workload = Workload('test', {'retrieve': 1, 'create': 1},
+                            operations=11, concurrency=2)
+
+        self.assertEqual(workload.schedule(0), workload.schedule(0))
+        self.assertEqual(len(workload.schedule(0)) +
+                         len(workload.schedule(1)), 11)
+        with self.assertRaises(ValueError):
+            Workload('test', {'scan': 1})
+
+    def test_box_data(self):
+        """Test the data of the boxes has roughly the requested size."""
+        self.assertAlmostEqual(len(str(box_data(4096))), 4096, delta=1024)
+
+    def test_run(self):
+        """Test a run reports every operation of the workload."""
+        workload = Workload('test', {'create': 1, 'retrieve': 2, 'patch': 1,
+                                     'delete': 1, 'list': 1, 'search': 1},
+                            namespaces=2, boxes=5, operations=40,
+                            concurrency=2)
+
+        result = runner.run(workload, 'backend', 'sqlite')
+
+        self.assertEqual(sum(summary['count'] for summary in
+                             result['operations'].values()), 40)
+        self.assertEqual(sum(summary['errors'] for summary in
+                             result['operations'].values()), 0)
+        self.assertGreater(result['throughput'], 0)
+
+    def test_run_missing_directory(self):
+        """Test a run creates the directory it is given."""
+        workload = Workload('test', {'retrieve': 1}, namespaces=1, boxes=1,
+                            operations=2, concurrency=1)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir) / 'missing'
+            result = runner.run(workload, 'backend', 'sqlite',
+                                directory=str(directory))
+            self.assertTrue(directory.is_dir())
+
+        self.assertEqual(sum(summary['count'] for summary in
+                             result['operations'].values()), 2)
+
+    def test_parser_requires_command(self):
+        """Test the command line requires a command."""
+        with self.assertRaises(SystemExit):
+            _parser().parse_args([])
@@ -1,5 +1,6 @@
 """Test Main methods."""
 import json
+import pickle
 from unittest import TestCase
 
 from napps.kytos.storehouse.main import Box, metadata_from_box
@@ -31,7 +32,9 @@ class TestBox(TestCase):
             "namespace": self.box.namespace,
             "owner": self.box.owner,
             "created_at": self.box.created_at,
-            "id": self.box.box_id
+            "id": self.box.box_id,
+            "revision": None,
+            "hash": None
         }
         dict_data = self.box.to_dict()
         self.assertEqual(dict_data, expected_data)
@@ -43,7 +46,9 @@ class TestBox(TestCase):
             "namespace": self.box.namespace,
             "owner": self.box.owner,
             "created_at": self.box.created_at,
-            "id": self.box.box_id
+            "id": self.box.box_id,
+            "revision": None,
+            "hash": None
         }
         expected_data = json.dumps(data, indent=4)
         json_data = self.box.to_json()
@@ -53,6 +58,20 @@ class TestBox(TestCase):
         """Test metadata_from_box method."""
         expected_metadata = {"box_id": self.box.box_id,
                              "owner": self.box.owner,
-                             "created_at": self.box.created_at}
+                             "created_at": self.box.created_at,
+                             "revision": None,
+                             "hash": None}
         metadata = metadata_from_box(self.box)
         self.assertEqual(metadata, expected_metadata)
+
+    def test_unpickle_main_box(self):
+        """Test boxes pickled as main.Box by previous versions are loaded."""
+        raw = pickle.dumps(self.box, protocol=0).replace(
+            b'napps.kytos.storehouse.box\nBox',
+            b'napps.kytos.storehouse.main\nBox')
+        self.assertIn(b'napps.kytos.storehouse.main', raw)
+
+        box = pickle.loads(raw)
+
+        self.assertIsInstance(box, Box)
+        self.assertEqual(box.to_dict(), self.box.to_dict())
@@ -0,0 +1,90 @@
+"""Test BoxCache methods."""
+from unittest import TestCase
+
+from napps.kytos.storehouse.cache import BoxCache
+from napps.kytos.storehouse.main import Box
+
+
+class TestBoxCache(TestCase):
+    """Tests for the BoxCache class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.cache = BoxCache(max_entries=2)
+
+    def test_get_hit_and_miss(self):
+        """Test get method counting hits and misses."""
+        box = Box('any', 'namespace', box_id='123')
+        self.cache.put(box)
+
+        self.assertEqual(vars(self.cache.get('namespace', '123')), vars(box))
+        self.assertIsNone(self.cache.get('namespace', '456'))
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_get_returns_a_copy(self):
+        """Test changing a box does not change the cached one."""
+        box = Box({'key': 'old'}, 'namespace', box_id='123')
+        self.cache.put(box)
+        box.data['key'] = 'new'
+        self.cache.get('namespace', '123').data['key'] = 'new'
+
+        self.assertEqual(self.cache.get('namespace', '123').data,
+                         {'key': 'old'})
+
+    def test_put_evicts_least_recently_used(self):
+        """Test put method evicting by number of entries."""
+        for box_id in ['1', '2']:
+            self.cache.put(Box('any', 'namespace', box_id=box_id))
+        self.cache.get('namespace', '1')
+        self.cache.put(Box('any', 'namespace', box_id='3'))
+
+        self.assertIsNone(self.cache.get('namespace', '2'))
+        self.assertIsNotNone(self.cache.get('namespace', '1'))
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_put_evicts_by_bytes(self):
+        """Test put method evicting by size and skipping large boxes."""
+        cache = BoxCache(max_entries=0, max_bytes=1000)
+        cache.put(Box('x' * 400, 'namespace', box_id='1'))
+        cache.put(Box('x' * 400, 'namespace', box_id='2'))
+        cache.put(Box('x' * 2000, 'namespace', box_id='3'))
+
+        self.assertIsNone(cache.get('namespace', '1'))
+        self.assertIsNotNone(cache.get('namespace', '2'))
+        self.assertIsNone(cache.get('namespace', '3'))
+        self.assertLessEqual(cache.stats()['bytes'], 1000)
+
+    def test_put_overwrites(self):
+        """Test put method replacing a cached box."""
+        self.cache.put(Box('old', 'namespace', box_id='1'))
+        self.cache.put(Box('new', 'namespace', box_id='1'))
+
+        self.assertEqual(self.cache.get('namespace', '1').data, 'new')
+        self.assertEqual(self.cache.stats()['entries'], 1)
+
+    def test_disabled(self):
+        """Test a cache without limits does not keep boxes."""
+        cache = BoxCache(max_entries=0, max_bytes=0)
+        cache.put(Box('any', 'namespace', box_id='1'))
+
+        self.assertIsNone(cache.get('namespace', '1'))
+
+    def test_invalidate_and_clear(self):
+        """Test invalidate and clear methods."""
+        self.cache.put(Box('any', 'namespace', box_id='1'))
+        self.cache.put(Box('any', 'namespace', box_id='2'))
+
+        self.cache.invalidate('namespace', '1')
+        self.assertIsNone(self.cache.get('namespace', '1'))
+        self.cache.clear()
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_stats(self):
+        """Test stats method."""
+        self.cache.put(Box('any', 'namespace', box_id='1'))
+        self.cache.get('namespace', '1')
+
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 0,
+                                              'evictions': 0, 'entries': 1,
+                                              'bytes': 0})
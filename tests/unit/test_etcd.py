@@ -1,7 +1,12 @@
 """Test Main methods."""
+import json
+import pickle
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
+from napps.kytos.storehouse.backends.base import (NotFoundException,
+                                                  RevisionConflict,
+                                                  metadata_from_box)
 from napps.kytos.storehouse.backends.etcd import (Etcd, join_fullname,
                                                   split_fullname)
 from napps.kytos.storehouse.main import Box
@@ -18,27 +23,36 @@ class TestEtcd(TestCase):
         mock_client.return_value = MagicMock()
         self.base = Etcd()
 
-        # 'metadata' is the name of the one of objects obtained at tuple
-        # returned by the etcd get_all method.
-        self.metadata = MagicMock()
-        self.metadata.key = b'namespace.123'
-        self.base.etcd.get_all.return_value = [(b'', self.metadata)]
-
     def test_get_all_keys(self):
         """Test _get_all_keys method."""
+        self._mock_range({b'namespace.123': b'data'})
+
         all_keys = self.base._get_all_keys()
 
         self.assertEqual(b'namespace.123', next(all_keys))
 
-    @patch('pickle.dumps', return_value='raw_data')
+    def test_get_all_keys_skips_manifest(self):
+        """Test _get_all_keys method ignores the manifest keys."""
+        self._mock_range({b'__manifest__/namespace.123': b'{}',
+                          b'namespace.123': b'data'})
+
+        self.assertEqual(list(self.base._get_all_keys()), [b'namespace.123'])
+
+    @patch('napps.kytos.storehouse.backends.serializers.Serializer.dumps',
+           return_value=b'raw_data')
     def test_create(self, mock_dumps):
         """Test create method."""
         box = Box('any', 'namespace', box_id='123')
         self.base.create(box)
 
-        self.base.etcd.put.assert_called_with('namespace.123', 'raw_data')
+        put = self.base.etcd.transactions.put
+        put.assert_any_call('namespace.123', b'raw_data')
+        put.assert_any_call('__manifest__/namespace.123',
+                            json.dumps(metadata_from_box(box)))
+        self.base.etcd.transaction.assert_called_once()
 
-    @patch('pickle.loads', return_value='data')
+    @patch('napps.kytos.storehouse.backends.serializers.Serializer.loads',
+           return_value='data')
     def test_retrieve_success_case(self, mock_loads):
         """Test retrieve method to success case."""
         self.base.etcd.get.return_value = ('raw_data', '')
@@ -61,35 +75,223 @@ class TestEtcd(TestCase):
 
     def test_delete(self):
         """Test delete method."""
+        response = MagicMock()
+        response.response_delete_range.deleted = 1
+        self.base.etcd.transaction.return_value = (True, [response, response])
+
         box = Box('any', 'namespace', box_id='123')
-        self.base.delete(box.namespace, box.box_id)
+        result = self.base.delete(box.namespace, box.box_id)
+
+        delete = self.base.etcd.transactions.delete
+        delete.assert_any_call('namespace.123')
+        delete.assert_any_call('__manifest__/namespace.123')
+        self.assertTrue(result)
+
+    @patch('napps.kytos.storehouse.backends.serializers.Serializer.dumps',
+           return_value=b'raw_data')
+    def test_create_many(self, mock_dumps):
+        """Test create_many method splitting boxes in transactions."""
+        self.base.max_txn_ops = 4
+        boxes = [Box('any', 'namespace', box_id=str(i)) for i in range(3)]
+
+        self.base.create_many(boxes)
+
+        self.assertEqual(self.base.etcd.transaction.call_count, 2)
+        _, kwargs = self.base.etcd.transaction.call_args_list[0]
+        self.assertEqual(len(kwargs['success']), 4)
+
+    def test_retrieve_many(self):
+        """Test retrieve_many method."""
+        box = Box('any', 'namespace', box_id='1')
+        self.base.etcd.transaction.return_value = (
+            True, [[(pickle.dumps(box), MagicMock())], []])
+
+        results = self.base.retrieve_many('namespace', ['1', '2'])
 
-        self.base.etcd.delete.assert_called_with('namespace.123')
+        self.assertEqual(results['1'].data, 'any')
+        self.assertIsNone(results['2'])
+        self.base.etcd.transactions.get.assert_any_call('namespace.2')
+
+    def test_delete_many(self):
+        """Test delete_many method."""
+        deleted, missing = MagicMock(), MagicMock()
+        deleted.response_delete_range.deleted = 1
+        missing.response_delete_range.deleted = 0
+        self.base.etcd.transaction.return_value = (
+            True, [deleted, deleted, missing, missing])
+
+        results = self.base.delete_many('namespace', ['1', '2'])
+
+        self.assertEqual(results, {'1': True, '2': False})
+
+    def _mock_range(self, items):
+        """Serve the RangeRequests from a dict of keys to values."""
+        def range_(request, timeout, **kwargs):
+            keys = sorted(key for key in items if request.key <= key and
+                          (request.range_end == b'\0' or
+                           key < request.range_end))
+            page = keys[:request.limit] if request.limit else keys
+            return MagicMock(
+                header=MagicMock(revision=request.revision or 7),
+                more=len(page) < len(keys),
+                kvs=[MagicMock(key=key,
+                               value=None if request.keys_only
+                               else items[key])
+                     for key in page])
+
+        self.base.etcd.kvstub.Range.side_effect = range_
+
+    def test_exists(self):
+        """Test exists method reading only the key."""
+        self._mock_range({b'namespace.123': b'data'})
+
+        self.assertTrue(self.base.exists('namespace', '123'))
+        self.assertFalse(self.base.exists('namespace', '12'))
+
+    def test_head(self):
+        """Test head method reading the revision from the manifest."""
+        self.base.etcd.transaction.side_effect = [
+            (True, [[(b'data', MagicMock())],
+                    [(b'{"box_id": "123", "revision": 9}', MagicMock())]]),
+            (True, [[], []])]
+
+        self.assertEqual(self.base.head('namespace', '123'),
+                         {'size': 4, 'revision': 9})
+        self.assertIsNone(self.base.head('namespace', '456'))
+        self.base.etcd.transactions.get.assert_any_call(
+            '__manifest__/namespace.123')
+
+    @patch('napps.kytos.storehouse.backends.serializers.Serializer.dumps',
+           return_value=b'raw_data')
+    def test_update(self, mock_dumps):
+        """Test update method replacing the box and its manifest entry."""
+        box = Box('any', 'namespace', box_id='123')
+        box.revision = 7
+        self.base.etcd.transaction.return_value = (True, [])
+
+        self.assertEqual(self.base.update('namespace', box), '123')
+        self.base.etcd.transactions.put.assert_any_call(
+            '__manifest__/namespace.123', json.dumps(metadata_from_box(box)))
+        self.assertEqual(self.base.etcd.transaction.call_args[1]['compare'],
+                         [])
+
+    @patch('napps.kytos.storehouse.backends.serializers.Serializer.dumps',
+           return_value=b'raw_data')
+    def test_update_expected_revision(self, mock_dumps):
+        """Test update method comparing the mod_revision of the manifest."""
+        box = Box('any', 'namespace', box_id='123')
+        self.base.etcd.get.return_value = (b'{"revision": 5}',
+                                           MagicMock(mod_revision=42))
+        mod = self.base.etcd.transactions.mod
+        self.base.etcd.transaction.side_effect = [(True, []), (False, [])]
+
+        self.base.update('namespace', box, expected_revision=5)
+        mod.assert_called_with('__manifest__/namespace.123')
+        self.assertEqual(
+            len(self.base.etcd.transaction.call_args[1]['compare']), 1)
+        with self.assertRaises(RevisionConflict):
+            self.base.update('namespace', box, expected_revision=5)
+        with self.assertRaises(RevisionConflict):
+            self.base.update('namespace', box, expected_revision=4)
+        self.assertEqual(self.base.etcd.transaction.call_count, 2)
+
+    def test_list_page(self):
+        """Test list_page method reading the keys after the cursor."""
+        self.base.page_size = 2
+        self._mock_range({b'namespace.1': b'', b'namespace.2': b'',
+                          b'namespace.3': b'', b'namespace.sub.4': b'',
+                          b'namespace.5': b''})
+
+        self.assertEqual(self.base.list_page('namespace', 2), ['1', '2'])
+        self.assertEqual(self.base.list_page('namespace', 2, after='2'),
+                         ['3', '5'])
+        self.assertEqual(self.base.list_page('namespace', 2, after='5'), [])
+
+    def test_list_metadata(self):
+        """Test list_metadata method repairing the manifest."""
+        self._mock_range({b'__manifest__/namespace.1': b'{"box_id": "1"}',
+                          b'__manifest__/namespace.2': b'{"box_id": "2"}',
+                          b'namespace.1': b'', b'namespace.3': b'',
+                          b'namespace.sub.4': b''})
+        self.base.etcd.get.return_value = (
+            pickle.dumps(Box('any', 'namespace', box_id='3')), '')
+
+        metadata = self.base.list_metadata('namespace')
+
+        self.assertEqual(sorted(item['box_id'] for item in metadata),
+                         ['1', '3'])
+        self.base.etcd.put.assert_called_once()
+        self.base.etcd.delete.assert_called_once_with(
+            '__manifest__/namespace.2')
+
+    def test_list_metadata_unreadable_box(self):
+        """Test list_metadata method skipping a box deleted meanwhile."""
+        self._mock_range({b'__manifest__/namespace.1': b'{"box_id": "1"}',
+                          b'namespace.1': b'', b'namespace.3': b''})
+        self.base.etcd.get.return_value = (None, None)
+
+        metadata = self.base.list_metadata('namespace')
+
+        self.assertEqual(metadata, [{'box_id': '1'}])
+        self.base.etcd.put.assert_not_called()
 
     def test_list(self):
-        """Test list method."""
-        obj = MagicMock()
-        obj.key = b'namespace.123'
-        self.base.etcd.get_prefix.return_value = [('', obj)]
+        """Test list method scoped to the exact namespace."""
+        self._mock_range({b'namespace.123': b'', b'namespace.456': b'',
+                          b'namespace2.789': b'', b'namespace.sub.1': b''})
 
         list_return = self.base.list('namespace')
 
-        self.base.etcd.get_prefix.assert_called_with('namespace',
-                                                     keys_only=True)
-        self.assertEqual(next(list_return), b'123')
+        self.assertEqual(list(list_return), ['123', '456'])
+
+    def test_list_paginated(self):
+        """Test list method reading pages at the first revision."""
+        self.base.page_size = 2
+        self._mock_range({f'namespace.{i}'.encode(): b'' for i in range(5)})
+
+        self.assertEqual(list(self.base.list('namespace')),
+                         ['0', '1', '2', '3', '4'])
+
+        requests = [call[0][0]
+                    for call in self.base.etcd.kvstub.Range.call_args_list]
+        self.assertEqual(len(requests), 3)
+        self.assertEqual([request.limit for request in requests], [2, 2, 2])
+        self.assertEqual([request.revision for request in requests],
+                         [0, 7, 7])
+        self.assertEqual(requests[1].key, b'namespace.1\0')
+        self.assertEqual(requests[1].range_end, b'namespace/')
+
+    def test_exists_request(self):
+        """Test exists method sending a RangeRequest limited to one key."""
+        self._mock_range({b'namespace.123': b'data'})
+
+        self.base.exists('namespace', '123')
+
+        request = self.base.etcd.kvstub.Range.call_args[0][0]
+        self.assertEqual(request.key, b'namespace.123')
+        self.assertEqual(request.range_end, b'namespace.123\0')
+        self.assertEqual(request.limit, 1)
+        self.assertTrue(request.keys_only)
 
     def test_list_namespaces(self):
         """Test list_namespaces method."""
+        self._mock_range({b'namespace.123': b'data'})
+
         namespaces = self.base.list_namespaces()
 
-        self.assertEqual(namespaces, {b'namespace'})
+        self.assertEqual(namespaces, {'namespace'})
 
-    @patch('pickle.loads')
-    def test_backup(self, mock_loads):
+    def test_backup(self):
         """Test backup method."""
-        next(self.base.backup())
+        box = Box('any', 'namespace', box_id='123')
+        self._mock_range({b'namespace.123': pickle.dumps(box),
+                          b'namespace2.456': b'invalid'})
+
+        boxes = list(self.base.backup('namespace'))
 
-        mock_loads.assert_called_with((b'', self.metadata))
+        self.assertEqual([item.box_id for item in boxes], ['123'])
+        with self.assertRaises(NotFoundException):
+            self.base.backup('missing')
 
     def test_split_fullname(self):
         """Test split_fullname method."""
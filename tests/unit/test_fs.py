@@ -1,8 +1,15 @@
 """Test Main methods."""
+import tempfile
+from pathlib import Path
 from unittest import TestCase
 from unittest.mock import MagicMock, call, patch
 
+from napps.kytos.storehouse.backends.base import (RevisionConflict,
+                                                  content_hash,
+                                                  metadata_from_box, stamp)
 from napps.kytos.storehouse.backends.fs import FileSystem, _create_dirs
+from napps.kytos.storehouse.backends.locks import ShardedLock
+from napps.kytos.storehouse.backends.manifest import Manifests, tagged
 from napps.kytos.storehouse.main import Box
 
 
@@ -11,11 +18,15 @@ class TestFileSystem(TestCase):
     """Tests for the FileSystem class."""
 
     # pylint: disable=arguments-differ
+    @patch('napps.kytos.storehouse.backends.fs.remove_stale_locks')
+    @patch('napps.kytos.storehouse.backends.fs.ShardedLock')
     @patch('napps.kytos.storehouse.backends.fs.FileSystem._parse_settings')
-    def setUp(self, mock_parse_settings):
+    def setUp(self, *args):
         """Execute steps before each tests."""
+        (mock_parse_settings, _, _) = args
         mock_parse_settings.return_value = MagicMock()
         self.file_system = FileSystem()
+        self.file_system.manifests = MagicMock()
 
     @staticmethod
     @patch('napps.kytos.storehouse.backends.fs.Path')
@@ -47,159 +58,22 @@ class TestFileSystem(TestCase):
                                      'namespace')
         self.assertEqual(destination, mock_path.return_value)
 
-    @patch('pickle.dump')
-    @patch('builtins.open')
-    @patch('napps.kytos.storehouse.backends.fs.FileLock')
-    def test_write_to_file(self, *args):
-        """Test _write_to_file method."""
-        (_, mock_open, mock_dump) = args
-        save_file = MagicMock()
-        mock_open.return_value = save_file
+    def test_load_from_file(self):
+        """Test _load_from_file method reading without taking the lock."""
+        self._use_tmp_dir()
+        filename = Path(self.file_system.destination_path, 'filename')
+        filename.write_bytes(b'record')
+        self.file_system.serializer = MagicMock()
+        self.file_system.serializer.loads.return_value = MagicMock()
 
-        box = MagicMock()
-        self.file_system._write_to_file('filename', box)
-
-        mock_dump.assert_called_with(box, save_file.__enter__())
-
-    @patch('pickle.load')
-    @patch('builtins.open')
-    @patch('napps.kytos.storehouse.backends.fs.FileLock')
-    def test_load_from_file(self, *args):
-        """Test _load_from_file method."""
-        (_, mock_open, mock_load) = args
-        load_file = MagicMock()
-        mock_open.return_value = load_file
-        mock_load.return_value = 'data'
-
-        data = self.file_system._load_from_file('filename')
-
-        mock_load.assert_called_with(load_file.__enter__())
-        self.assertEqual(data, 'data')
-
-    def test_delete_file(self):
-        """Test _delete_file method to success and failure cases."""
-        path = MagicMock()
-        path.exists.side_effect = [True, False]
-        path.unlink.return_value = 'unlink'
-        return_1 = self.file_system._delete_file(path)
-        return_2 = self.file_system._delete_file(path)
-
-        self.assertTrue(return_1)
-        self.assertFalse(return_2)
-
-    @patch('napps.kytos.storehouse.backends.fs.Path')
-    def test_list_namespace_success_case(self, mock_path):
-        """Test _list_namespace method to success case."""
-        content = []
-        for is_dir in [False, False, True]:
-            obj = MagicMock()
-            obj.name = 'name'
-            obj.is_dir.return_value = is_dir
-            content.append(obj)
-
-        path = MagicMock()
-        path.exists.return_value = True
-        path.iterdir.return_value = content
-        mock_path.return_value = path
-        list_namespace = self.file_system._list_namespace('namespace')
-
-        self.assertEqual(list_namespace, [content[0].name, content[1].name])
-
-    @patch('napps.kytos.storehouse.backends.fs.Path')
-    def test_list_namespace_failure_case(self, mock_path):
-        """Test _list_namespace method to failure case."""
-        path = MagicMock()
-        path.exists.return_value = False
-        mock_path.return_value = path
-
-        list_namespace = self.file_system._list_namespace('namespace')
-
-        self.assertEqual(list_namespace, [])
-
-    @patch('napps.kytos.storehouse.backends.fs.Path')
-    @patch('napps.kytos.storehouse.backends.fs._create_dirs')
-    @patch('napps.kytos.storehouse.backends.fs.FileSystem._write_to_file')
-    def test_create(self, *args):
-        """Test create method."""
-        (mock_write_to_file, mock_create_dirs, mock_path) = args
-        destination = MagicMock()
-        mock_path.return_value = destination
+        with patch.object(self.file_system.locks, 'acquire') as mock_acquire:
+            data = self.file_system._load_from_file(filename)
 
-        box = Box('any', 'namespace', box_id='123')
-        self.file_system.create(box)
-
-        mock_path.assert_called_with(self.file_system.destination_path,
-                                     'namespace')
-        mock_create_dirs.assert_called_with(destination)
-        mock_write_to_file.assert_called_with(destination.joinpath('123'), box)
-
-    @patch('napps.kytos.storehouse.backends.fs.Path')
-    @patch('napps.kytos.storehouse.backends.fs.FileSystem._load_from_file',
-           return_value='data')
-    def test_retrieve_success_case(self, *args):
-        """Test retrieve method to success case."""
-        (mock_load_from_file, mock_path) = args
-        path = MagicMock()
-        destination = MagicMock()
-        destination.is_file.return_value = True
-        mock_path.return_value = path
-        path.joinpath.return_value = destination
-
-        box = Box('any', 'namespace', box_id='123')
-        retrieve = self.file_system.retrieve(box.namespace, box.box_id)
-
-        mock_path.assert_called_with(self.file_system.destination_path,
-                                     'namespace')
-        mock_load_from_file.assert_called_with(destination)
-        self.assertEqual(retrieve, 'data')
-
-    @patch('napps.kytos.storehouse.backends.fs.Path')
-    def test_retrieve_failure_case(self, mock_path):
-        """Test retrieve method to failure case."""
-        path = MagicMock()
-        destination = MagicMock()
-        destination.is_file.return_value = False
-        mock_path.return_value = path
-        path.joinpath.return_value = destination
-
-        box = Box('any', 'namespace', box_id='123')
-        retrieve = self.file_system.retrieve(box.namespace, box.box_id)
-
-        self.assertFalse(retrieve)
-
-    @patch('napps.kytos.storehouse.backends.fs.Path')
-    @patch('napps.kytos.storehouse.backends.fs.FileSystem._write_to_file')
-    def test_update(self, *args):
-        """Test update method."""
-        (mock_write, mock_path) = args
-        destination = MagicMock()
-        mock_path.return_value = destination
-
-        box = Box('any', 'namespace', box_id='123')
-        self.file_system.update(box.namespace, box)
-
-        mock_path.assert_called_with(self.file_system.destination_path,
-                                     'namespace')
-        destination.joinpath.assert_called_with('123')
-        mock_write.assert_called_with(destination.joinpath.return_value, box)
-
-    @patch('napps.kytos.storehouse.backends.fs.Path')
-    @patch('napps.kytos.storehouse.backends.fs.FileSystem._delete_file')
-    def test_delete(self, *args):
-        """Test delete method."""
-        (mock_delete_file, mock_path) = args
-        path = MagicMock()
-        destination = MagicMock()
-        mock_path.return_value = path
-        path.joinpath.return_value = destination
-
-        box = Box('any', 'namespace', box_id='123')
-        self.file_system.delete(box.namespace, box.box_id)
-
-        mock_path.assert_called_with(self.file_system.destination_path,
-                                     'namespace')
-        path.joinpath.assert_called_with('123')
-        mock_delete_file.assert_called_with(destination)
+        self.file_system.serializer.loads.assert_called_with(b'record')
+        self.assertEqual(data, self.file_system.serializer.loads.return_value)
+        mock_acquire.assert_not_called()
+        self.assertFalse(self.file_system._load_from_file(
+            Path(self.file_system.destination_path, 'missing')))
 
     @patch('napps.kytos.storehouse.backends.fs.FileSystem._list_namespace')
     def test_list(self, mock_list_namespace):
@@ -240,6 +114,54 @@ class TestFileSystem(TestCase):
         mock_path.assert_called_with(self.file_system.destination_path, '.')
         self.assertEqual(list_namespace, [])
 
+    @patch('napps.kytos.storehouse.backends.fs.load_metadata')
+    def test_list_metadata(self, mock_load_metadata):
+        """Test list_metadata method reading the namespace manifest."""
+        self._use_tmp_dir()
+        self.file_system.create(Box('any', 'namespace', box_id='123'))
+        filename = self.file_system._find_box('namespace', '123')
+
+        metadata = self.file_system.list_metadata('namespace')
+
+        self.file_system.manifests.get.assert_called_with('namespace')
+        (manifest, tags, _), _ = mock_load_metadata.call_args
+        self.assertEqual(manifest, self.file_system.manifests.get())
+        self.assertEqual(tags, {'123': self.file_system._box_tag(filename)})
+        self.assertEqual(metadata, mock_load_metadata.return_value)
+
+    def test_list_metadata_out_of_date(self):
+        """Test list_metadata method reading boxes the manifest missed."""
+        self._use_tmp_dir()
+        self.file_system.manifests = Manifests(
+            Path(self.file_system.destination_path, '.manifests'))
+        box = stamp(Box({'a': 1}, 'namespace', box_id='123'))
+        self.file_system.create(box)
+        self.file_system.create(Box('any', 'namespace', box_id='456'))
+        # A write whose manifest entry was lost in a crash.
+        self.file_system._store('namespace', stamp(box))
+
+        metadata = self.file_system.list_metadata('namespace')
+
+        self.assertEqual(sorted(metadata, key=lambda item: item['box_id']),
+                         [metadata_from_box(box),
+                          metadata_from_box(self.file_system.retrieve(
+                              'namespace', '456'))])
+
+    def test_list_metadata_corrupted_box(self):
+        """Test list_metadata method skipping a box it cannot read."""
+        self._use_tmp_dir()
+        self.file_system.manifests = Manifests(
+            Path(self.file_system.destination_path, '.manifests'))
+        box = Box('any', 'namespace', box_id='123')
+        self.file_system.create(box)
+        self.file_system.create(Box('any', 'namespace', box_id='456'))
+        filename = self.file_system._find_box('namespace', '456')
+        filename.write_bytes(b'corrupted')
+
+        metadata = self.file_system.list_metadata('namespace')
+
+        self.assertEqual(metadata, [metadata_from_box(box)])
+
     @patch('napps.kytos.storehouse.backends.fs.FileSystem.retrieve')
     @patch('napps.kytos.storehouse.backends.fs.FileSystem.list')
     @patch('napps.kytos.storehouse.backends.fs.FileSystem.list_namespaces',
@@ -250,13 +172,369 @@ class TestFileSystem(TestCase):
 
         mock_list.return_value = ['456']
 
-        retrieve = MagicMock()
-        retrieve.to_json.return_value = {}
-        mock_retrieve.return_value = retrieve
+        box = Box('any', 'namespace', box_id='123')
+        mock_retrieve.return_value = box
+
+        boxes_1 = self.file_system.backup(box.namespace, box.box_id)
+        boxes_2 = self.file_system.backup(box.namespace)
+
+        self.assertEqual(list(boxes_1), [box])
+        self.assertEqual(list(boxes_2), [box])
+        mock_retrieve.assert_called_with('namespace', '456')
+
+    def _use_tmp_dir(self):
+        """Store the boxes in a temporary directory."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.file_system.destination_path = Path(tmp_dir.name, 'boxes')
+        self.file_system.destination_path.mkdir()
+        self.file_system.lock_path = Path(tmp_dir.name, 'locks')
+        self.file_system.locks = ShardedLock(self.file_system.lock_path)
+        self.addCleanup(self.file_system.close)
+
+    def test_patch(self):
+        """Test patch method journaling the data and merging it on read."""
+        self._use_tmp_dir()
+        self.file_system.create(Box({'a': 1, 'b': 'x' * 1000}, 'namespace',
+                                    box_id='123'))
+
+        self.assertTrue(self.file_system.patch('namespace', '123', {'a': 2}))
+        self.assertTrue(self.file_system.patch('namespace', '123', {'c': 3}))
+        self.assertFalse(self.file_system.patch('namespace', '456', {}))
+
+        journal = self.file_system._get_journal(
+            self.file_system._get_destination('namespace').joinpath('123'))
+        self.assertTrue(journal.exists())
+        box = self.file_system.retrieve('namespace', '123')
+        self.assertEqual(box.data, {'a': 2, 'b': 'x' * 1000, 'c': 3})
+
+        self.file_system.update('namespace', box)
+        self.assertFalse(journal.exists())
+
+    def test_patch_revision(self):
+        """Test patch method journaling the revision of the merged box."""
+        self._use_tmp_dir()
+        box = stamp(Box({'a': 1, 'b': 'x' * 1000}, 'namespace',
+                        box_id='123'))
+        self.file_system.create(box)
+
+        patched = self.file_system.patch('namespace', '123', {'a': 2})
+        self.file_system.patch('namespace', '123', {'c': 3})
+
+        self.assertGreater(patched.revision, box.revision)
+        self.assertEqual(patched.hash,
+                         content_hash({'a': 2, 'b': 'x' * 1000}))
+        retrieved = self.file_system.retrieve('namespace', '123')
+        self.assertEqual(retrieved.data, {'a': 2, 'b': 'x' * 1000, 'c': 3})
+        self.assertEqual(retrieved.hash, content_hash(retrieved.data))
+        self.assertGreater(retrieved.revision, patched.revision)
+        filename = self.file_system._find_box('namespace', '123')
+        self.file_system.manifests.get.return_value.add.assert_called_with(
+            tagged(metadata_from_box(retrieved),
+                   self.file_system._box_tag(filename)))
+
+    def test_expected_revision(self):
+        """Test update and patch methods checking the expected revision."""
+        self._use_tmp_dir()
+        box = stamp(Box({'a': 1}, 'namespace', box_id='123'))
+        self.file_system.create(box)
+        revision = box.revision
+
+        with self.assertRaises(RevisionConflict):
+            self.file_system.patch('namespace', '123', {'a': 2},
+                                   expected_revision=revision - 1)
+        self.file_system.update('namespace', stamp(box),
+                                expected_revision=revision)
+        with self.assertRaises(RevisionConflict):
+            self.file_system.update('namespace', box,
+                                    expected_revision=revision)
+        self.assertTrue(self.file_system.patch(
+            'namespace', '123', {'a': 2}, expected_revision=box.revision))
+        self.assertEqual(self.file_system.retrieve('namespace', '123').data,
+                         {'a': 2})
+
+    def test_patch_folds_journal(self):
+        """Test the journal is folded when it has too many entries."""
+        self._use_tmp_dir()
+        self.file_system.journal_max_entries = 1
+        self.file_system.create(Box({'a': 1, 'b': 'x' * 1000}, 'namespace',
+                                    box_id='123'))
+        self.file_system.patch('namespace', '123', {'a': 2})
+        self.file_system.patch('namespace', '123', {'a': 3})
+        filename = self.file_system._get_destination('namespace').joinpath(
+            '123')
+
+        self.assertEqual(self.file_system.retrieve('namespace', '123').data,
+                         {'a': 3, 'b': 'x' * 1000})
+        self.assertFalse(self.file_system._get_journal(filename).exists())
+        self.assertEqual(self.file_system._load_box(filename)[1], 0)
+
+    def test_patch_superseded_by_update(self):
+        """Test journaled patches are ignored once the box is replaced."""
+        self._use_tmp_dir()
+        self.file_system.create(Box({'a': 1, 'b': 'x' * 1000}, 'namespace',
+                                    box_id='123'))
+        self.file_system.patch('namespace', '123', {'a': 2})
+        filename = self.file_system._get_destination('namespace').joinpath(
+            '123')
+        journal = self.file_system._get_journal(filename).read_bytes()
+
+        self.file_system.update('namespace', Box({'c': 3}, 'namespace',
+                                                 box_id='123'))
+        self.file_system._get_journal(filename).write_bytes(journal)
+
+        self.assertEqual(self.file_system.retrieve('namespace', '123').data,
+                         {'c': 3})
+
+    def test_write_box(self):
+        """Test _write_box method replacing the file atomically."""
+        self._use_tmp_dir()
+        filename = Path(self.file_system.destination_path, 'filename')
+        filename.write_bytes(b'old')
+        self.file_system.serializer = MagicMock()
+        self.file_system.serializer.dumps.return_value = b'record'
+
+        box = MagicMock()
+        self.file_system._write_box(filename, box)
 
+        self.file_system.serializer.dumps.assert_called_with(box)
+        self.assertEqual(filename.read_bytes(), b'record')
+        self.assertEqual(list(Path(self.file_system.destination_path,
+                                   '.tmp').iterdir()), [])
+
+    def test_create_and_retrieve(self):
+        """Test create and retrieve methods."""
+        self._use_tmp_dir()
         box = Box('any', 'namespace', box_id='123')
-        boxes_dict_1 = self.file_system.backup(box.namespace, box.box_id)
-        boxes_dict_2 = self.file_system.backup(box.namespace)
 
-        self.assertEqual(boxes_dict_1, {'123': {}})
-        self.assertEqual(boxes_dict_2, {'456': {}})
+        self.file_system.create(box)
+
+        self.assertEqual(self.file_system.retrieve('namespace', '123').data,
+                         'any')
+        self.assertFalse(self.file_system.retrieve('namespace', '456'))
+        self.assertFalse(self.file_system.retrieve('missing', '123'))
+        filename = self.file_system._find_box('namespace', '123')
+        self.file_system.manifests.get.return_value.add.assert_called_with(
+            tagged(metadata_from_box(box),
+                   self.file_system._box_tag(filename)))
+
+    def test_update(self):
+        """Test update method."""
+        self._use_tmp_dir()
+        box = Box('any', 'namespace', box_id='123')
+        self.file_system.create(box)
+        box.data = 'other'
+
+        self.file_system.update('namespace', box)
+
+        self.assertEqual(self.file_system.retrieve('namespace', '123').data,
+                         'other')
+
+    @patch('napps.kytos.storehouse.backends.fs._fsync')
+    def test_create_many(self, mock_fsync):
+        """Test create_many method syncing each namespace once."""
+        self._use_tmp_dir()
+        boxes = [Box('any', 'ns1', box_id='1'), Box('any', 'ns1', box_id='2'),
+                 Box('any', 'ns2', box_id='3')]
+
+        self.file_system.create_many(boxes)
+        mock_fsync.assert_not_called()
+        self.file_system.sync()
+
+        self.assertEqual(sorted(self.file_system.list('ns1')), ['1', '2'])
+        self.assertEqual(mock_fsync.call_count, 2)
+        manifest = self.file_system.manifests.get.return_value
+        self.assertEqual(manifest.add_many.call_count, 2)
+
+    def test_delete(self):
+        """Test delete method to success and failure cases."""
+        self._use_tmp_dir()
+        self.file_system.create(Box('any', 'namespace', box_id='123'))
+
+        self.assertTrue(self.file_system.delete('namespace', '123'))
+        self.assertFalse(self.file_system.delete('namespace', '123'))
+        self.assertFalse(self.file_system.retrieve('namespace', '123'))
+        manifest = self.file_system.manifests.get.return_value
+        manifest.remove.assert_called_once_with('123')
+
+    @patch('napps.kytos.storehouse.backends.fs._fsync')
+    def test_delete_many(self, mock_fsync):
+        """Test delete_many method syncing the namespace once."""
+        self._use_tmp_dir()
+        self.file_system.create(Box('any', 'namespace', box_id='1'))
+
+        results = self.file_system.delete_many('namespace', ['1', '2'])
+        self.file_system.sync()
+
+        self.assertEqual(results, {'1': True, '2': False})
+        mock_fsync.assert_called_once()
+        manifest = self.file_system.manifests.get.return_value
+        manifest.remove_many.assert_called_once_with(['1'])
+
+    def test_list_namespace(self):
+        """Test _list_namespace method with both layouts."""
+        self._use_tmp_dir()
+        self.file_system.create(Box('any', 'namespace', box_id='flat'))
+        self.file_system.hashed_layout = True
+        self.file_system.create(Box('any', 'namespace', box_id='hashed'))
+        Path(self.file_system.destination_path, 'namespace',
+             '.hidden').touch()
+
+        self.assertEqual(sorted(self.file_system._list_namespace('namespace')),
+                         ['flat', 'hashed'])
+        self.assertEqual(self.file_system._list_namespace('missing'), [])
+
+    def test_exists_and_head(self):
+        """Test exists and head methods counting the PATCH journal."""
+        self._use_tmp_dir()
+        self.file_system.create(Box({'a': 1}, 'namespace', box_id='123'))
+        size = self.file_system.head('namespace', '123')['size']
+        self.file_system.patch('namespace', '123', {'b': 2})
+
+        self.assertTrue(self.file_system.exists('namespace', '123'))
+        self.assertFalse(self.file_system.exists('namespace', '12'))
+        self.assertGreater(self.file_system.head('namespace', '123')['size'],
+                           size)
+        self.assertIsNone(self.file_system.head('namespace', '12'))
+
+    def test_head_revision(self):
+        """Test head method reading the revision of the patched box."""
+        self._use_tmp_dir()
+        box = stamp(Box({'a': 1}, 'namespace', box_id='123'))
+        self.file_system.create(box)
+        self.assertEqual(self.file_system.head('namespace', '123')['revision'],
+                         box.revision)
+
+        patched = self.file_system.patch('namespace', '123', {'b': 2})
+
+        self.assertEqual(self.file_system.head('namespace', '123')['revision'],
+                         patched.revision)
+
+    def test_list_page(self):
+        """Test list_page method with boxes in both layouts."""
+        self._use_tmp_dir()
+        for box_id in ('3', '1'):
+            self.file_system.create(Box('any', 'namespace', box_id=box_id))
+        self.file_system.hashed_layout = True
+        self.file_system.create(Box('any', 'namespace', box_id='2'))
+
+        self.assertEqual(self.file_system.list_page('namespace', 2),
+                         ['1', '2'])
+        self.assertEqual(self.file_system.list_page('namespace', 2,
+                                                    after='2'), ['3'])
+        self.assertEqual(self.file_system.list_page('missing', 2), [])
+
+    def test_hashed_layout(self):
+        """Test boxes are written in two levels of hashed directories."""
+        self._use_tmp_dir()
+        self.file_system.hashed_layout = True
+
+        self.file_system.create(Box('any', 'namespace', box_id='123'))
+
+        path = self.file_system._find_box('namespace', '123')
+        self.assertEqual(path, self.file_system._get_hashed_path('namespace',
+                                                                 '123'))
+        self.assertEqual(len(path.relative_to(
+            self.file_system.destination_path).parts), 4)
+        self.assertEqual(self.file_system.retrieve('namespace', '123').data,
+                         'any')
+        self.assertTrue(self.file_system.delete('namespace', '123'))
+
+    def test_migrate(self):
+        """Test migrate method moving flat boxes with their journals."""
+        self._use_tmp_dir()
+        for box_id in ('1', '2'):
+            self.file_system.create(Box({'a': 'x' * 1000}, 'namespace',
+                                        box_id=box_id))
+        self.file_system.patch('namespace', '1', {'b': 1})
+        self.file_system.hashed_layout = True
+
+        self.assertEqual(self.file_system.migrate(), 2)
+
+        self.assertEqual(self.file_system._find_box('namespace', '1'),
+                         self.file_system._get_hashed_path('namespace', '1'))
+        self.assertEqual(self.file_system.retrieve('namespace', '1').data,
+                         {'a': 'x' * 1000, 'b': 1})
+        self.assertEqual(sorted(self.file_system.list('namespace')),
+                         ['1', '2'])
+        self.assertEqual(self.file_system.migrate('namespace'), 0)
+
+    def test_migrate_box_named_like_hashed_dir(self):
+        """Test a flat box named like a hashed directory is moved first."""
+        self._use_tmp_dir()
+        first = self.file_system._get_hashed_path('namespace',
+                                                  '123').parent.parent.name
+        self.file_system.create(Box('any', 'namespace', box_id=first))
+        self.file_system.hashed_layout = True
+
+        self.file_system.create(Box('any', 'namespace', box_id='123'))
+
+        self.assertEqual(sorted(self.file_system.list('namespace')),
+                         sorted(['123', first]))
+        self.assertEqual(self.file_system.retrieve('namespace', first).data,
+                         'any')
+
+    @patch('napps.kytos.storehouse.backends.fs._fsync')
+    @patch('os.fsync')
+    def test_write_without_durability(self, mock_fsync, mock_sync_dir):
+        """Test only the box files are synced with the "none" durability."""
+        self._use_tmp_dir()
+        for box_id in ['1', '2', '3']:
+            self.file_system.create(Box('any', 'namespace', box_id=box_id))
+        self.file_system.update('namespace',
+                                Box('other', 'namespace', box_id='1'))
+
+        self.assertEqual(mock_fsync.call_count, 4)
+        mock_sync_dir.assert_not_called()
+
+    def test_write_box_syncs_before_rename(self):
+        """Test _write_box method syncing the file before renaming it."""
+        self._use_tmp_dir()
+        filename = Path(self.file_system.destination_path, 'filename')
+        calls = MagicMock()
+
+        with patch('os.fsync', calls.fsync), \
+                patch('os.replace', side_effect=calls.replace):
+            self.file_system._write_box(filename, Box('any', 'namespace'))
+
+        self.assertEqual([name for name, _, _ in calls.mock_calls],
+                         ['fsync', 'replace'])
+
+    def test_retrieve_empty_box_file(self):
+        """Test retrieve method with an empty box file."""
+        self._use_tmp_dir()
+        self.file_system.create(Box('any', 'namespace', box_id='123'))
+        self.file_system._find_box('namespace', '123').write_bytes(b'')
+
+        self.assertFalse(self.file_system.retrieve('namespace', '123'))
+        self.assertIsNone(self.file_system.head('namespace',
+                                                '123')['revision'])
+
+    @patch('napps.kytos.storehouse.backends.fs._fsync')
+    def test_write_group_durability(self, mock_fsync):
+        """Test the directories are synced by the group commit sync."""
+        self._use_tmp_dir()
+        self.file_system.create(Box('any', 'namespace', box_id='1'))
+        filename = self.file_system._find_box('namespace', '1')
+        mock_fsync.assert_not_called()
+
+        self.file_system.sync()
+
+        self.assertEqual({call[0][0] for call in mock_fsync.call_args_list},
+                         {filename.parent})
+
+    @patch('napps.kytos.storehouse.backends.fs._fsync')
+    def test_sync(self, mock_fsync):
+        """Test sync method flushing the paths changed since the last one."""
+        self._use_tmp_dir()
+        self.file_system.create(Box({'a': 1}, 'namespace', box_id='123'))
+        self.file_system.patch('namespace', '123', {'a': 2})
+        filename = self.file_system._find_box('namespace', '123')
+
+        self.file_system.sync()
+        self.file_system.sync()
+
+        self.assertEqual({call[0][0] for call in mock_fsync.call_args_list},
+                         {filename.parent,
+                          self.file_system._get_journal(filename),
+                          self.file_system._get_journal(filename).parent})
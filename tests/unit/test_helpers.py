@@ -0,0 +1,85 @@
+"""Test the helpers of the REST endpoints and events."""
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from werkzeug.datastructures import ETags
+
+from napps.kytos.storehouse.helpers import (box_revision, check_box_ids,
+                                            decode_cursor, encode_cursor,
+                                            if_match_revision, metadata_page,
+                                            page_limit, since_revision)
+from napps.kytos.storehouse.main import Box, metadata_from_box, stamp
+from napps.kytos.storehouse.search import MetadataIndex
+from napps.kytos.storehouse.warmup import Warmup
+
+
+class TestHelpers(TestCase):
+    """Tests for the helpers of the REST endpoints and events."""
+
+    def test_cursor(self):
+        """Test decode_cursor returning the box_id of encode_cursor."""
+        self.assertEqual(decode_cursor(encode_cursor('box/1')), 'box/1')
+        with self.assertRaises(ValueError):
+            decode_cursor('not a cursor!')
+
+    def test_page_limit(self):
+        """Test page_limit method bounding the limit of a page."""
+        self.assertEqual(page_limit('10'), 10)
+        self.assertEqual(page_limit(10 ** 6), 1000)
+        for limit in ('0', 'ten', -1):
+            with self.assertRaises(ValueError):
+                page_limit(limit)
+
+    def test_metadata_page(self):
+        """Test metadata_page method returning the results after a cursor."""
+        results = [{'box_id': box_id} for box_id in ('1', '2', '3')]
+
+        page = metadata_page(results, 2)
+        self.assertEqual(page['results'], results[:2])
+        self.assertEqual(metadata_page(results, 2, page['next_cursor']),
+                         {'results': results[2:], 'next_cursor': None})
+
+    def test_if_match_revision(self):
+        """Test if_match_revision method reading a single revision."""
+        self.assertIsNone(if_match_revision(None))
+        self.assertIsNone(if_match_revision(ETags(star_tag=True)))
+        self.assertEqual(if_match_revision(ETags(['5'])), 5)
+        for if_match in (ETags(['5', '6']), ETags(['abc'])):
+            with self.assertRaises(ValueError):
+                if_match_revision(if_match)
+
+    def test_since_revision(self):
+        """Test since_revision method accepting ints and digit strings."""
+        self.assertIsNone(since_revision(None))
+        self.assertEqual(since_revision(5), 5)
+        self.assertEqual(since_revision('5'), 5)
+        for since in ('abc', True, 1.5, [5]):
+            with self.assertRaises(ValueError):
+                since_revision(since)
+
+    def test_box_revision(self):
+        """Test box_revision method using the cache once loaded."""
+        backend = MagicMock()
+        index = MetadataIndex()
+        warmup = Warmup()
+        box = stamp(Box('any', 'namespace', '1'))
+        index.add('namespace', metadata_from_box(box))
+
+        self.assertEqual(box_revision(backend, index.records, warmup,
+                                      'namespace', '1'), box.revision)
+        self.assertIsNone(box_revision(backend, index.records, warmup,
+                                       'namespace', '2'))
+        backend.head.assert_not_called()
+
+        warmup.start(['other'])
+        backend.head.return_value = {'size': 1, 'revision': 5}
+        self.assertEqual(box_revision(backend, index.records, warmup,
+                                      'other', '1'), 5)
+
+    def test_check_box_ids(self):
+        """Test check_box_ids method rejecting unsafe or repeated ids."""
+        check_box_ids(['1', 'a.b', '..a'])
+        for box_ids in (['a/b'], ['a\0'], ['.'], ['..'], [''], [None],
+                        [5], ['1', '1']):
+            with self.assertRaises(ValueError):
+                check_box_ids(box_ids)
@@ -0,0 +1,60 @@
+"""Test the sharded locks."""
+import tempfile
+import threading
+from pathlib import Path
+from unittest import TestCase
+
+from napps.kytos.storehouse.backends.locks import (ShardedLock,
+                                                   remove_stale_locks)
+
+
+class TestShardedLock(TestCase):
+    """Tests for the ShardedLock class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.locks = ShardedLock(self.tmp_dir.name, shards=8, files=2)
+        self.addCleanup(self.locks.close)
+
+    def test_shard_files(self):
+        """Test a fixed number of shard files is created."""
+        self.assertEqual(sorted(path.name for path in
+                                Path(self.tmp_dir.name).iterdir()),
+                         ['shard-0.lock', 'shard-1.lock'])
+        self.assertEqual(self.locks.shard('key'), self.locks.shard('key'))
+        self.assertLess(self.locks.shard('key'), 8)
+
+    def test_acquire_excludes_threads(self):
+        """Test a key can not be acquired by two threads at once."""
+        acquired = threading.Event()
+
+        def acquire():
+            with self.locks.acquire('key'):
+                acquired.set()
+
+        with self.locks.acquire('key'):
+            thread = threading.Thread(target=acquire)
+            thread.start()
+            self.assertFalse(acquired.wait(0.1))
+        thread.join(1)
+        self.assertTrue(acquired.is_set())
+
+
+class TestRemoveStaleLocks(TestCase):
+    """Tests for the remove_stale_locks function."""
+
+    def test_remove_stale_locks(self):
+        """Test only the lock files with the prefix are removed."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name in ('.var.storehouse.ns.1.lock',
+                         '.var.storehouse.ns.2.lock', 'other.lock'):
+                Path(tmp_dir, name).touch()
+
+            removed = remove_stale_locks(tmp_dir, '.var.storehouse.')
+
+            self.assertEqual(removed, 2)
+            self.assertEqual([path.name for path in Path(tmp_dir).iterdir()],
+                             ['other.lock'])
+        self.assertEqual(remove_stale_locks('/missing', '.'), 0)
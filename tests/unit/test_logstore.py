@@ -0,0 +1,311 @@
+"""Test LogStore methods."""
+from unittest import TestCase
+from unittest.mock import patch
+
+from napps.kytos.storehouse.backends.base import (NotFoundException,
+                                                  content_hash,
+                                                  metadata_from_box, stamp)
+from napps.kytos.storehouse.backends.logstore import (PATCH, PUT, LogStore,
+                                                      decode_record,
+                                                      encode_record)
+from napps.kytos.storehouse.main import Box
+from napps.kytos.storehouse.tests.unit.store_tests import StoreTests
+
+
+# pylint: disable=protected-access
+class TestLogStore(StoreTests, TestCase):
+    """Tests for the LogStore class."""
+
+    store_class = LogStore
+
+    def store_settings(self, directory):
+        """Return the settings of a log in directory."""
+        return {'CUSTOM_LOGSTORE_PATH': directory,
+                'LOGSTORE_SEGMENT_SIZE': 1024}
+
+    def test_encode_decode_record(self):
+        """Test encode_record and decode_record functions."""
+        raw = encode_record(PUT, 'namespace', '123', b'payload')
+
+        record = decode_record(raw)
+
+        self.assertEqual(record, (PUT, 'namespace', '123', b'payload',
+                                  len(raw)))
+
+    def test_decode_record_corrupted(self):
+        """Test decode_record with truncated and corrupted records."""
+        raw = encode_record(PUT, 'namespace', '123', b'payload')
+
+        self.assertIsNone(decode_record(raw[:-1]))
+        self.assertIsNone(decode_record(raw[:-1] + b'X'))
+
+    def test_update(self):
+        """Test update method."""
+        box = Box({'a': 1}, 'namespace', box_id='123')
+        self.store.create(box)
+        box.data = {'a': 2}
+        self.store.update('namespace', box)
+
+        self.assertEqual(self.store.retrieve('namespace', '123').data,
+                         {'a': 2})
+
+    def test_delete(self):
+        """Test delete method to success and failure cases."""
+        self.store.create(Box('any', 'namespace', box_id='123'))
+
+        self.assertTrue(self.store.delete('namespace', '123'))
+        self.assertFalse(self.store.delete('namespace', '123'))
+        self.assertFalse(self.store.retrieve('namespace', '123'))
+        self.assertEqual(self.store.list_namespaces(), [])
+
+    def test_create_many(self):
+        """Test create_many method appending the boxes at once."""
+        boxes = [Box(index, 'namespace', box_id=str(index))
+                 for index in range(3)]
+
+        self.store.create_many(boxes)
+
+        self.assertEqual(self.store.retrieve('namespace', '2').data, 2)
+        self.assertEqual(len(self.store.list_metadata('namespace')), 3)
+
+    def test_delete_many(self):
+        """Test delete_many method."""
+        self.store.create(Box('any', 'namespace', box_id='123'))
+
+        results = self.store.delete_many('namespace', ['123', '456'])
+
+        self.assertEqual(results, {'123': True, '456': False})
+        self.assertEqual(self.store.list('namespace'), [])
+
+    def test_list_and_list_namespaces(self):
+        """Test list and list_namespaces methods."""
+        self.store.create(Box('any', 'namespace', box_id='123'))
+        self.store.create(Box('any', 'namespace', box_id='456'))
+        self.store.create(Box('any', 'other', box_id='789'))
+
+        self.assertEqual(sorted(self.store.list('namespace')),
+                         ['123', '456'])
+        self.assertEqual(self.store.list('missing'), [])
+        self.assertEqual(sorted(self.store.list_namespaces()),
+                         ['namespace', 'other'])
+
+    def test_exists_and_head(self):
+        """Test exists and head methods counting the PATCH records."""
+        self.store.create(Box({'a': 1}, 'namespace', box_id='123'))
+        size = self.store.head('namespace', '123')['size']
+        self.store.patch('namespace', '123', {'b': 2})
+
+        self.assertTrue(self.store.exists('namespace', '123'))
+        self.assertFalse(self.store.exists('namespace', '12'))
+        self.assertGreater(self.store.head('namespace', '123')['size'], size)
+        self.assertIsNone(self.store.head('namespace', '12'))
+
+    def test_list_page(self):
+        """Test list_page method returning the box_ids after the cursor."""
+        for box_id in ('3', '1', '2'):
+            self.store.create(Box('any', 'namespace', box_id=box_id))
+
+        self.assertEqual(self.store.list_page('namespace', 2), ['1', '2'])
+        self.assertEqual(self.store.list_page('namespace', 2, after='2'),
+                         ['3'])
+
+    def test_backup(self):
+        """Test backup method."""
+        box = Box('any', 'namespace', box_id='123')
+        self.store.create(box)
+
+        boxes = self.store.backup('namespace')
+
+        self.assertEqual([box.box_id for box in boxes], ['123'])
+        with self.assertRaises(NotFoundException):
+            self.store.backup('missing')
+        with self.assertRaises(NotFoundException):
+            self.store.backup('namespace', '456')
+
+    def test_list_metadata(self):
+        """Test list_metadata method reading the namespace manifest."""
+        box = Box('any', 'namespace', box_id='123')
+        self.store.create(box)
+        self.store.create(Box('any', 'namespace', box_id='456'))
+        self.store.delete('namespace', '456')
+
+        with patch.object(self.store, 'retrieve') as mock_retrieve:
+            metadata = self.store.list_metadata('namespace')
+
+        mock_retrieve.assert_not_called()
+        self.assertEqual(metadata, [metadata_from_box(box)])
+
+    def test_list_metadata_out_of_date(self):
+        """Test list_metadata method reading boxes the manifest missed."""
+        box = stamp(Box('any', 'namespace', box_id='123'))
+        self.store.create(box)
+        # A write whose manifest entry was lost in a crash.
+        self.store._append([(PUT, 'namespace', '123',
+                             self.store.serializer.dumps(stamp(box)))])
+        self.store.close()
+
+        metadata = self._open().list_metadata('namespace')
+
+        self.assertEqual(metadata, [metadata_from_box(box)])
+
+    def test_compact_retags_manifest(self):
+        """Test boxes moved by compaction are still read from the manifest."""
+        box = Box('any', 'namespace', box_id='123')
+        self.store.create(box)
+        for _ in range(10):
+            self.store.create(Box('x' * 100, 'other', box_id='456'))
+
+        self.store.compact()
+        self.store.close()
+        store = self._open()
+        with patch.object(store, 'retrieve') as mock_retrieve:
+            metadata = store.list_metadata('namespace')
+
+        mock_retrieve.assert_not_called()
+        self.assertEqual(metadata, [metadata_from_box(box)])
+
+    def test_replay_on_open(self):
+        """Test the index is rebuilt from the segments."""
+        self.store.create(Box('any', 'namespace', box_id='123'))
+        self.store.create(Box('any', 'namespace', box_id='456'))
+        self.store.delete('namespace', '456')
+        self.store.close()
+
+        store = self._open()
+
+        self.assertEqual(store.list('namespace'), ['123'])
+        self.assertEqual(store.retrieve('namespace', '123').data, 'any')
+
+    def test_replay_truncates_torn_record(self):
+        """Test a partially written record is discarded on open."""
+        self.store.create(Box('any', 'namespace', box_id='123'))
+        self.store.close()
+        segment = self.store._segment_path(self.store._active_id)
+        with open(segment, 'ab') as segment_file:
+            segment_file.write(encode_record(PUT, 'namespace', '456',
+                                             b'payload')[:-3])
+
+        store = self._open()
+
+        self.assertEqual(store.list('namespace'), ['123'])
+        self.assertEqual(store._sizes[store._active_id],
+                         segment.stat().st_size)
+
+    def test_segment_rollover(self):
+        """Test a new segment is started after the size limit."""
+        for box_id in range(20):
+            self.store.create(Box('x' * 100, 'namespace', box_id=str(box_id)))
+
+        self.assertGreater(len(self.store._segment_ids()), 1)
+        self.assertEqual(len(self.store.list('namespace')), 20)
+
+    def test_compact(self):
+        """Test compaction keeps live records and removes dead segments."""
+        for _ in range(10):
+            self.store.create(Box('x' * 100, 'namespace', box_id='123'))
+        self.store.create(Box('any', 'namespace', box_id='456'))
+        self.store.delete('namespace', '456')
+        first_segment = self.store._segment_ids()[0]
+
+        self.store.compact()
+
+        self.assertNotIn(first_segment, self.store._segment_ids())
+        self.assertEqual(self.store.retrieve('namespace', '123').data,
+                         'x' * 100)
+        self.store.close()
+        store = self._open()
+        self.assertEqual(store.list('namespace'), ['123'])
+
+    def test_delete_survives_compaction(self):
+        """Test a deleted box is not restored by an older segment."""
+        self.store.create(Box('x' * 600, 'namespace', box_id='123'))
+        self.store.create(Box('x' * 600, 'namespace', box_id='456'))
+        self.store.delete('namespace', '123')
+        for box_id in range(10):
+            self.store.create(Box('x' * 100, 'other', box_id=str(box_id)))
+            self.store.delete('other', str(box_id))
+        segments = self.store._segment_ids()
+
+        self.store._compact_segment(segments[1])
+        self.store.close()
+        store = self._open()
+
+        self.assertEqual(store.list('namespace'), ['456'])
+        self.assertEqual(store.list('other'), [])
+
+    def test_patch(self):
+        """Test patch method appending only the changed data."""
+        self.store.create(Box({'a': 1, 'b': 'x' * 500}, 'namespace',
+                              box_id='123'))
+        size = self.store._sizes[self.store._active_id]
+
+        self.assertTrue(self.store.patch('namespace', '123', {'a': 2}))
+        self.assertFalse(self.store.patch('namespace', '456', {'a': 2}))
+
+        self.assertLess(self.store._sizes[self.store._active_id] - size, 100)
+        self.assertEqual(self.store.retrieve('namespace', '123').data,
+                         {'a': 2, 'b': 'x' * 500})
+        self.store.close()
+        store = self._open()
+        self.assertEqual(store.retrieve('namespace', '123').data,
+                         {'a': 2, 'b': 'x' * 500})
+
+    def test_patch_revision(self):
+        """Test patch method journaling the revision of the merged box."""
+        box = stamp(Box({'a': 1, 'b': 'x' * 500}, 'namespace', box_id='123'))
+        self.store.create(box)
+
+        patched = self.store.patch('namespace', '123', {'a': 2})
+
+        self.assertGreater(patched.revision, box.revision)
+        self.assertEqual(patched.hash, content_hash({'a': 2, 'b': 'x' * 500}))
+        self.assertEqual(self.store.list_metadata('namespace'),
+                         [metadata_from_box(patched)])
+        self.store.close()
+        retrieved = self._open().retrieve('namespace', '123')
+        self.assertEqual((retrieved.revision, retrieved.hash),
+                         (patched.revision, patched.hash))
+
+    def test_patch_fold(self):
+        """Test the patches are folded in a whole box record."""
+        self.store.journal_max_entries = 2
+        self.store.create(Box({'a': 0, 'b': 'x' * 500}, 'namespace',
+                              box_id='123'))
+        for value in range(1, 4):
+            self.store.patch('namespace', '123', {'a': value})
+
+        self.assertEqual(len(self.store._locate_patches('namespace', '123')),
+                         0)
+        self.assertEqual(self.store.retrieve('namespace', '123').data,
+                         {'a': 3, 'b': 'x' * 500})
+
+    def test_compact_folds_patches(self):
+        """Test compaction folds the patches of the boxes it rewrites."""
+        self.store.create(Box({'a': 0}, 'namespace', box_id='123'))
+        self.store.patch('namespace', '123', {'b': 1})
+        for _ in range(10):
+            self.store.create(Box('x' * 100, 'other', box_id='456'))
+        first_segment = self.store._segment_ids()[0]
+
+        self.store._compact_segment(first_segment)
+        self.store.close()
+        store = self._open()
+
+        self.assertEqual(store.retrieve('namespace', '123').data,
+                         {'a': 0, 'b': 1})
+        self.assertEqual(store._locate_patches('namespace', '123'), [])
+
+    def test_decode_patch_record(self):
+        """Test PATCH records are decoded like the other records."""
+        raw = encode_record(PATCH, 'namespace', '123', b'delta')
+
+        self.assertEqual(decode_record(raw)[0], PATCH)
+
+    @patch('os.fsync')
+    def test_sync(self, mock_fsync):
+        """Test sync method flushing the active segment."""
+        self.store.create(Box('any', 'namespace', box_id='123'))
+
+        self.store.sync()
+
+        mock_fsync.assert_called_once_with(self.store._active_file.fileno())
@@ -1,10 +1,15 @@
 """Test Main methods."""
+import gzip
+import json
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
 from kytos.lib.helpers import (get_controller_mock, get_kytos_event_mock,
                                get_test_client)
-from napps.kytos.storehouse.main import Box
+from napps.kytos.storehouse.backends.etcd import Etcd
+from napps.kytos.storehouse.benchmarks.fake_etcd import FakeEtcd
+from napps.kytos.storehouse.main import (UNCHANGED, Box, RevisionConflict,
+                                         metadata_from_box, stamp)
 
 
 # pylint: disable=protected-access, unused-argument, no-member
@@ -24,6 +29,9 @@ class TestMain(TestCase):
         mock_etcd.return_value = MagicMock()
 
         patch('kytos.core.helpers.run_on_thread', lambda x: x).start()
+        # The backend mock is used directly, without the timing proxy.
+        patch('napps.kytos.storehouse.settings.METRICS_ENABLED', False,
+              create=True).start()
         # pylint: disable=import-outside-toplevel
         from napps.kytos.storehouse.main import Main
         self.addCleanup(patch.stopall)
@@ -37,53 +45,190 @@ class TestMain(TestCase):
 
         mock_log.info.assert_called_once()
 
+    def test_create_cache_etcd(self):
+        """Test create_cache method loading the namespaces of etcd."""
+        self.napp.backend = Etcd(FakeEtcd())
+        box = Box('any', 'namespace', '123')
+        self.napp.backend.create(box)
+
+        self.napp.create_cache()
+
+        record = self.napp.metadata_cache['namespace'][box.box_id]
+        self.assertEqual(record.owner, box.owner)
+
     def test_create_cache(self):
         """Test create_cache method."""
         box = Box('any', 'namespace', '123')
         self.napp.backend.list_namespaces.return_value = ['namespace']
-        self.napp.backend.list.return_value = ['123']
-        self.napp.backend.retrieve.return_value = box
+        self.napp.backend.list_metadata.return_value = [
+            metadata_from_box(box)]
 
         self.napp.create_cache()
 
-        box_metadata = self.napp.metadata_cache['namespace'][0]
-        self.assertEqual(box_metadata['box_id'], box.box_id)
-        self.assertEqual(box_metadata['owner'], box.owner)
-        self.assertEqual(box_metadata['created_at'], box.created_at)
+        self.napp.backend.list_metadata.assert_called_with('namespace')
+        self.napp.backend.retrieve.assert_not_called()
+
+        record = self.napp.metadata_cache['namespace'][box.box_id]
+        self.assertEqual(record.owner, box.owner)
+        self.assertEqual(record.created_at, box.created_at)
+
+    def test_start_cache_warmup(self):
+        """Test start_cache_warmup method loading namespaces in background."""
+        box = Box('any', 'namespace', '123')
+        self.napp.backend.list_namespaces.return_value = ['namespace']
+        self.napp.backend.list_metadata.return_value = [
+            metadata_from_box(box)]
+
+        self.napp.start_cache_warmup()
+        self.napp._warmup_executor.shutdown(wait=True)
+
+        self.assertEqual(self.napp.warmup.status()['state'], 'done')
+        self.assertEqual(self.napp.search_metadata_by('namespace',
+                                                      query='123'),
+                         [metadata_from_box(box)])
+
+    def test_load_namespace_cache_fails(self):
+        """Test load_namespace_cache leaves a failed namespace pending."""
+        self.napp.warmup.start(['namespace'])
+        self.napp.backend.list_metadata.side_effect = OSError('corrupted')
+        self.napp.backend.exists.return_value = True
+
+        self.napp.load_namespace_cache('namespace')
+
+        self.assertFalse(self.napp.warmup.is_loaded('namespace'))
+        self.assertTrue(self.napp.box_exists('namespace', '123'))
+        self.napp.backend.exists.assert_called_with('namespace', '123')
+
+    def test_load_namespace_cache_skips_deleted(self):
+        """Test load_namespace_cache ignores boxes deleted meanwhile."""
+        self.napp.warmup.start(['namespace'])
+        self.napp.delete_metadata_from_cache('namespace', '123')
+        self.napp.backend.list_metadata.return_value = [
+            metadata_from_box(Box('any', 'namespace', '123'))]
+
+        self.napp.load_namespace_cache('namespace')
+
+        self.assertEqual(self.napp.metadata_cache, {'namespace': {}})
+        self.assertTrue(self.napp.warmup.is_loaded('namespace'))
+
+    def test_load_namespace_cache_skips_updated(self):
+        """Test load_namespace_cache keeps boxes updated meanwhile."""
+        self.napp.warmup.start(['namespace'])
+        old = Box('old', 'namespace', '123')
+        new = Box('new', 'namespace', '123')
+        new.owner = 'new owner'
+        self.napp.add_metadata_to_cache(new)
+        self.napp.backend.list_metadata.return_value = [
+            metadata_from_box(old)]
+
+        self.napp.load_namespace_cache('namespace')
+
+        record = self.napp.metadata_cache['namespace']['123']
+        self.assertEqual(record.owner, 'new owner')
+
+    def test_namespace_exists(self):
+        """Test namespace_exists method for the metric labels."""
+        self.napp.warmup.start(['pending'])
+        self.napp.add_metadata_to_cache(Box('any', 'namespace', '123'))
+
+        self.assertTrue(self.napp.namespace_exists('namespace'))
+        self.assertTrue(self.napp.namespace_exists('pending'))
+        self.assertFalse(self.napp.namespace_exists('random'))
+
+    def test_search_metadata_by_during_warmup(self):
+        """Test search_metadata_by falls through to the backend."""
+        box = Box('any', 'namespace', '123')
+        self.napp.warmup.start(['namespace'])
+        self.napp.backend.search_metadata.return_value = [
+            metadata_from_box(box)]
+
+        results = self.napp.search_metadata_by('namespace', query='123')
+
+        self.napp.backend.search_metadata.assert_called_with(
+            'namespace', 'box_id', '123', 'contains')
+        self.assertEqual(results, [metadata_from_box(box)])
+
+    def test_box_exists_during_warmup(self):
+        """Test box_exists method asks the backend until loaded."""
+        self.napp.warmup.start(['namespace'])
+        self.napp.backend.exists.return_value = True
+
+        self.assertTrue(self.napp.box_exists('namespace', '1'))
+        self.napp.backend.exists.assert_called_with('namespace', '1')
 
     def test_delete_metadata_from_cache_by_box_id(self):
         """Test delete_metadata_from_cache method using box_id."""
-        self.napp.metadata_cache = {'namespace': [{'box_id': '1'}]}
+        self.napp.add_metadata_to_cache(Box('any', 'namespace', '1'))
+        self.napp.add_metadata_to_cache(Box('any', 'namespace', '123'))
+
         self.napp.delete_metadata_from_cache('namespace', box_id='1')
-        self.assertEqual(self.napp.metadata_cache, {'namespace': []})
+
+        self.assertEqual(list(self.napp.metadata_cache['namespace']),
+                         ['123'])
 
     def test_add_metadata_to_cache(self):
         """Test add_metadata_to_cache method."""
         box = Box('any', 'namespace', '123')
         self.napp.add_metadata_to_cache(box)
 
-        box_metadata = self.napp.metadata_cache['namespace'][0]
-        self.assertEqual(box_metadata['box_id'], box.box_id)
-        self.assertEqual(box_metadata['owner'], box.owner)
-        self.assertEqual(box_metadata['created_at'], box.created_at)
+        box.owner = 'alice'
+        self.napp.add_metadata_to_cache(box)
+
+        self.assertEqual(len(self.napp.metadata_cache['namespace']), 1)
+        record = self.napp.metadata_cache['namespace']['123']
+        self.assertEqual(record.owner, 'alice')
+        self.assertEqual(record.created_at, box.created_at)
+        self.assertTrue(self.napp.box_exists('namespace', '123'))
+        self.assertFalse(self.napp.box_exists('namespace', '12'))
 
     def test_search_metadata_by(self):
         """Test search_metadata_by method."""
-        self.napp.metadata_cache = {'namespace': [{'box_id': '123'}]}
+        box = Box('any', 'namespace', '123')
+        self.napp.add_metadata_to_cache(box)
 
         results_1 = self.napp.search_metadata_by('namespace', query='123')
         results_2 = self.napp.search_metadata_by('namespace', query='456')
+        results_3 = self.napp.search_metadata_by('namespace', query='12',
+                                                 mode='exact')
 
-        self.assertEqual(results_1, [{'box_id': '123'}])
+        self.assertEqual(results_1, [metadata_from_box(box)])
         self.assertEqual(results_2, [])
+        self.assertEqual(results_3, [])
+
+    def test_delete_metadata_from_cache_updates_index(self):
+        """Test delete_metadata_from_cache method removes the box index."""
+        self.napp.add_metadata_to_cache(Box('any', 'namespace', '123'))
+        self.napp.delete_metadata_from_cache('namespace', box_id='123')
+
+        self.assertEqual(self.napp.search_metadata_by('namespace',
+                                                      query='123'), [])
+
+    def test_retrieve_box(self):
+        """Test retrieve_box method using the box cache."""
+        box = Box('any', 'namespace', '123')
+        self.napp.backend.retrieve.return_value = box
+
+        retrieved_1 = self.napp.retrieve_box('namespace', '123')
+        retrieved_2 = self.napp.retrieve_box('namespace', '123')
+
+        self.napp.backend.retrieve.assert_called_once_with('namespace', '123')
+        self.assertEqual(vars(retrieved_1), vars(box))
+        self.assertEqual(vars(retrieved_2), vars(box))
+
+    def test_retrieve_box_not_found(self):
+        """Test retrieve_box method does not cache missing boxes."""
+        self.napp.backend.retrieve.return_value = False
+
+        self.assertFalse(self.napp.retrieve_box('namespace', '123'))
+        self.assertFalse(self.napp.retrieve_box('namespace', '123'))
+        self.assertEqual(self.napp.backend.retrieve.call_count, 2)
 
     @patch('napps.kytos.storehouse.main.Main.add_metadata_to_cache')
     @patch('napps.kytos.storehouse.main.Box')
     def test_rest_create_201(self, *args):
         """Test rest_create method to HTTP 201 response."""
         (mock_box, mock_add_metadata_to_cache) = args
-        box = MagicMock()
-        box.box_id = '123'
+        box = Box({'data': '123'}, '123', box_id='123')
         mock_box.return_value = box
 
         api = get_test_client(self.napp.controller, self.napp)
@@ -107,8 +252,7 @@ class TestMain(TestCase):
     def test_rest_create_v2_201(self, *args):
         """Test rest_create_v2 method to HTTP 201 response."""
         (mock_box, mock_add_metadata_to_cache) = args
-        box = MagicMock()
-        box.box_id = '123'
+        box = Box({'data': '123'}, 'namespace', box_id='123')
         mock_box.return_value = box
 
         api = get_test_client(self.napp.controller, self.napp)
@@ -127,6 +271,137 @@ class TestMain(TestCase):
 
         self.assertEqual(response.status_code, 400)
 
+    def test_create_boxes(self):
+        """Test create_boxes method using a single backend batch."""
+        boxes = [Box('any', 'namespace', '1'), Box('any', 'namespace', '2')]
+
+        self.napp.create_boxes(boxes)
+
+        self.napp.backend.create_many.assert_called_once_with(boxes)
+        self.assertEqual(vars(self.napp.box_cache.get('namespace', '2')),
+                         vars(boxes[1]))
+        self.assertEqual(len(self.napp.search_metadata_by('namespace')), 2)
+
+    def test_retrieve_boxes(self):
+        """Test retrieve_boxes method reading only missing boxes."""
+        cached = Box('any', 'namespace', '1')
+        self.napp.box_cache.put(cached)
+        self.napp.backend.retrieve_many.return_value = {'2': False}
+
+        results = self.napp.retrieve_boxes('namespace', ['1', '2'])
+
+        self.napp.backend.retrieve_many.assert_called_once_with('namespace',
+                                                                ['2'])
+        self.assertEqual(vars(results['1']), vars(cached))
+        self.assertFalse(results['2'])
+
+    def test_delete_boxes(self):
+        """Test delete_boxes method updating the caches."""
+        self.napp.add_metadata_to_cache(Box('any', 'namespace', '1'))
+        self.napp.backend.delete_many.return_value = {'1': True, '2': False}
+
+        results = self.napp.delete_boxes('namespace', ['1', '2'])
+
+        self.assertEqual(results, {'1': True, '2': False})
+        self.assertEqual(self.napp.search_metadata_by('namespace'), [])
+
+    def test_rest_bulk_create(self):
+        """Test rest_bulk_create method."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v2/namespace/bulk" % self.API_URL
+        response = api.open(url, method='POST',
+                            json=[{'id': '1', 'data': {'a': 1}},
+                                  {'data': {'b': 2}}])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json[0], {'id': '1', 'status': 201})
+        boxes = self.napp.backend.create_many.call_args[0][0]
+        self.assertEqual([box.data for box in boxes], [{'a': 1}, {'b': 2}])
+
+    def test_rest_bulk_create_400(self):
+        """Test rest_bulk_create method to HTTP 400 response."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v2/namespace/bulk" % self.API_URL
+        response = api.open(url, method='POST', json=[{'id': '1'}])
+
+        self.assertEqual(response.status_code, 400)
+        self.napp.backend.create_many.assert_not_called()
+
+    def test_rest_bulk_create_invalid_ids(self):
+        """Test rest_bulk_create method rejecting unsafe or repeated ids."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v2/namespace/bulk" % self.API_URL
+        for box_ids in (['../../escaped'], [5], ['.'], ['a\0b'],
+                        ['1', '1']):
+            items = [{'id': box_id, 'data': {'a': 1}} for box_id in box_ids]
+            response = api.open(url, method='POST', json=items)
+
+            self.assertEqual(response.status_code, 400)
+        self.napp.backend.create_many.assert_not_called()
+
+    def test_rest_bulk_retrieve(self):
+        """Test rest_bulk_retrieve method."""
+        self.napp.backend.retrieve_many.return_value = {
+            '1': Box({'a': 1}, 'namespace', '1'), '2': False}
+
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v2/namespace/bulk?id=1&id=2" % self.API_URL
+        response = api.open(url, method='GET')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json,
+                         [{'id': '1', 'status': 200, 'data': {'a': 1}},
+                          {'id': '2', 'status': 404}])
+
+    def test_rest_bulk_retrieve_400(self):
+        """Test rest_bulk_retrieve method to HTTP 400 response."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v2/namespace/bulk" % self.API_URL
+        response = api.open(url, method='GET')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_rest_bulk_retrieve_invalid_ids(self):
+        """Test rest_bulk_retrieve method rejecting unsafe or repeated ids."""
+        api = get_test_client(self.napp.controller, self.napp)
+        for query in ('id=..%2Fsecret', 'id=..', 'id=1&id=1'):
+            url = "%s/v2/namespace/bulk?%s" % (self.API_URL, query)
+            response = api.open(url, method='GET')
+
+            self.assertEqual(response.status_code, 400)
+        self.napp.backend.retrieve_many.assert_not_called()
+
+    def test_rest_bulk_delete(self):
+        """Test rest_bulk_delete method."""
+        self.napp.backend.delete_many.return_value = {'1': True, '2': False}
+
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v2/namespace/bulk" % self.API_URL
+        response = api.open(url, method='DELETE', json=['1', '2'])
+
+        self.napp.backend.delete_many.assert_called_with('namespace',
+                                                         ['1', '2'])
+        self.assertEqual(response.json, [{'id': '1', 'status': 200},
+                                         {'id': '2', 'status': 404}])
+
+    def test_rest_bulk_delete_400(self):
+        """Test rest_bulk_delete method to HTTP 400 response."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v2/namespace/bulk" % self.API_URL
+        response = api.open(url, method='DELETE', json={'id': '1'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_rest_bulk_delete_invalid_ids(self):
+        """Test rest_bulk_delete method rejecting unsafe or repeated ids."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v2/namespace/bulk" % self.API_URL
+        for box_ids in (['../../victim.txt'], ['1', 5], ['..'], ['1', '1']):
+            response = api.open(url, method='DELETE', json=box_ids)
+
+            self.assertEqual(response.status_code, 400)
+        self.napp.backend.delete_many.assert_not_called()
+
     def test_rest_list(self):
         """Test rest_list method."""
         self.napp.backend.list.return_value = ['123', '456']
@@ -138,32 +413,123 @@ class TestMain(TestCase):
         self.assertEqual(response.json, ['123', '456'])
         self.assertEqual(response.status_code, 200)
 
+    def test_rest_list_page(self):
+        """Test rest_list method returning a page and the next cursor."""
+        self.napp.backend.list_page.side_effect = [['1', '2', '3'], ['3']]
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/namespace" % self.API_URL
+
+        first = api.get(url + '?limit=2').json
+        last = api.get(url + '?limit=2&cursor=' + first['next_cursor']).json
+
+        self.napp.backend.list_page.assert_called_with('namespace', 3, '2')
+        self.assertEqual(first['boxes'], ['1', '2'])
+        self.assertEqual(last, {'boxes': ['3'], 'next_cursor': None})
+
+    def test_rest_list_page_400(self):
+        """Test rest_list method with an invalid limit or cursor."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/namespace" % self.API_URL
+
+        self.assertEqual(api.get(url + '?limit=0').status_code, 400)
+        self.assertEqual(api.get(url + '?cursor=%25').status_code, 400)
+
     def test_rest_update_200_patch(self):
         """Test rest_update method to HTTP 200 response with PATCH."""
-        box = MagicMock()
-        box.data = {'data': 'any'}
-        self.napp.backend.retrieve.return_value = box
+        patched = stamp(Box({'data': '123', 'x': 0}, 'namespace', '123'))
+        self.napp.backend.patch.return_value = patched
 
         api = get_test_client(self.napp.controller, self.napp)
         url = "%s/v1/namespace/123" % self.API_URL
         response = api.open(url, method='PATCH', json={'data': '123'})
 
-        self.napp.backend.update.assert_called_with('namespace', box)
+        self.napp.backend.patch.assert_called_with(
+            'namespace', '123', {'data': '123'}, None)
+        self.assertEqual(
+            self.napp.metadata_cache['namespace']['123'].revision,
+            patched.revision)
+        self.napp.backend.retrieve.assert_not_called()
+        self.napp.backend.update.assert_not_called()
+        self.assertEqual(response.json, {'data': '123', 'x': 0})
+        self.assertEqual(response.headers['ETag'], f'"{patched.revision}"')
         self.assertEqual(response.status_code, 200)
 
+    def test_patch_box_invalidates_cache(self):
+        """Test patch_box method dropping the cached box."""
+        self.napp.box_cache.put(stamp(Box({'x': 0}, 'namespace', '123')))
+        patched = stamp(Box({'x': 0, 'a': 1, 'b': 2}, 'namespace', '123'))
+        self.napp.backend.patch.return_value = patched
+
+        box = self.napp.patch_box('namespace', '123', {'b': 2})
+
+        self.assertEqual(box.data, {'x': 0, 'a': 1, 'b': 2})
+        self.assertIsNone(self.napp.box_cache.get('namespace', '123'))
+        record = self.napp.metadata_cache['namespace']['123']
+        self.assertEqual((record.revision, record.hash),
+                         (patched.revision, patched.hash))
+
     def test_rest_update_200_put(self):
         """Test rest_update method to HTTP 200 response with PUT."""
-        box = MagicMock()
-        box.data = {'data': 'any'}
+        box = Box({'data': 'any'}, 'namespace', box_id='123')
         self.napp.backend.retrieve.return_value = box
 
         api = get_test_client(self.napp.controller, self.napp)
         url = "%s/v1/namespace/123" % self.API_URL
         response = api.open(url, method='PUT', json={'data': '123'})
 
-        self.napp.backend.update.assert_called_with('namespace', box)
+        self.napp.backend.update.assert_called_with('namespace', box, None)
         self.assertEqual(response.status_code, 200)
 
+    def test_rest_update_if_match(self):
+        """Test rest_update method with an If-Match header."""
+        revision = stamp(Box({'data': 'any'}, 'namespace', '123')).revision
+        patched = stamp(Box({'data': '123'}, 'namespace', '123'))
+        self.napp.backend.patch.side_effect = [RevisionConflict('conflict'),
+                                               patched]
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/namespace/123" % self.API_URL
+
+        stale = api.open(url, method='PATCH', json={'data': '123'},
+                         headers={'If-Match': f'"{revision - 1}"'})
+        invalid = api.open(url, method='PATCH', json={'data': '123'},
+                           headers={'If-Match': '"a", "b"'})
+        self.assertEqual(self.napp.backend.patch.call_count, 1)
+
+        response = api.open(url, method='PATCH', json={'data': '123'},
+                            headers={'If-Match': f'"{revision}"'})
+
+        self.assertEqual(stale.status_code, 412)
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], f'"{patched.revision}"')
+        self.assertEqual(self.napp.backend.patch.call_args[0][-1], revision)
+
+    def test_rest_update_conflict_in_backend(self):
+        """Test rest_update method when the backend detects a conflict."""
+        self.napp.backend.retrieve.return_value = Box({}, 'namespace', '123')
+        self.napp.backend.update.side_effect = RevisionConflict('conflict')
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/namespace/123" % self.API_URL
+
+        response = api.open(url, method='PUT', json={'data': '123'},
+                            headers={'If-Match': '*'})
+
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.napp.box_cache.get('namespace', '123').data, {})
+
+    def test_patch_box_write_fails(self):
+        """Test patch_box method leaves the cached box unchanged."""
+        box = stamp(Box({'key': 'old'}, 'namespace', '123'))
+        self.napp.box_cache.put(box)
+        self.napp.backend.patch.side_effect = OSError('disk full')
+
+        with self.assertRaises(OSError):
+            self.napp.patch_box('namespace', '123', {'key': 'new'})
+
+        self.assertEqual(box.data, {'key': 'old'})
+        cached = self.napp.retrieve_box('namespace', '123')
+        self.assertNotEqual(getattr(cached, 'data', None), {'key': 'new'})
+
     def test_rest_update_404(self):
         """Test rest_update method to HTTP 404 response."""
         self.napp.backend.retrieve.return_value = None
@@ -182,6 +548,58 @@ class TestMain(TestCase):
 
         self.assertEqual(response.status_code, 400)
 
+    def test_rest_retrieve_head(self):
+        """Test rest_retrieve method answering HEAD requests."""
+        self.napp.backend.head.side_effect = [{'size': 42, 'revision': 7},
+                                              None]
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/namespace/123" % self.API_URL
+
+        found = api.head(url)
+        missing = api.head(url)
+
+        self.napp.backend.head.assert_called_with('namespace', '123')
+        self.napp.backend.retrieve.assert_not_called()
+        self.assertEqual(found.status_code, 200)
+        self.assertEqual(found.headers['X-Box-Size'], '42')
+        self.assertEqual(found.headers['X-Box-Revision'], '7')
+        self.assertEqual(found.get_data(), b'')
+        self.assertEqual(missing.status_code, 404)
+
+    def test_rest_retrieve_head_etag(self):
+        """Test HEAD requests take the revision from the cache if needed."""
+        box = stamp(Box('any', 'namespace', '123'))
+        self.napp.add_metadata_to_cache(box)
+        self.napp.backend.head.return_value = {'size': 42, 'revision': None}
+        api = get_test_client(self.napp.controller, self.napp)
+
+        response = api.head("%s/v1/namespace/123" % self.API_URL)
+
+        self.assertEqual(response.headers['X-Box-Revision'],
+                         str(box.revision))
+        self.assertEqual(response.headers['ETag'], f'"{box.revision}"')
+
+    def test_rest_retrieve_not_modified(self):
+        """Test rest_retrieve method answering If-None-Match requests."""
+        box = stamp(Box({'data': 'any'}, 'namespace', '123'))
+        self.napp.add_metadata_to_cache(box)
+        self.napp.backend.retrieve.return_value = box
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/namespace/123" % self.API_URL
+
+        response = api.get(url, headers={'If-None-Match':
+                                         f'"{box.revision}"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b'')
+        self.napp.backend.retrieve.assert_not_called()
+
+        response = api.get(url, headers={'If-None-Match': '"1"'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], f'"{box.revision}"')
+        self.assertEqual(response.json, {'data': 'any'})
+
     def test_rest_retrieve_200(self):
         """Test rest_retrieve method to HTTP 200 response."""
         box = MagicMock()
@@ -242,6 +660,43 @@ class TestMain(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json, {'box_id': '123'})
 
+    @patch('napps.kytos.storehouse.main.Main.search_metadata_by')
+    def test_rest_search_by_mode(self, mock_search_metadata_by):
+        """Test rest_search_by method forwarding the query mode."""
+        mock_search_metadata_by.return_value = [{'box_id': '123'}]
+
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/namespace/search_by/box_id/12?mode=prefix" % self.API_URL
+        api.open(url, method='GET')
+
+        mock_search_metadata_by.assert_called_with('namespace', 'box_id',
+                                                   '12', 'prefix')
+
+    @patch('napps.kytos.storehouse.main.Main.search_metadata_by')
+    def test_rest_search_by_page(self, mock_search_metadata_by):
+        """Test rest_search_by method returning pages of results."""
+        mock_search_metadata_by.return_value = [{'box_id': '1'},
+                                                {'box_id': '2'},
+                                                {'box_id': '3'}]
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/namespace/search_by/box_id/1?limit=2" % self.API_URL
+
+        first = api.get(url).json
+        last = api.get(url + '&cursor=' + first['next_cursor']).json
+
+        self.assertEqual(first['results'], [{'box_id': '1'},
+                                            {'box_id': '2'}])
+        self.assertEqual(last, {'results': [{'box_id': '3'}],
+                                'next_cursor': None})
+
+    def test_rest_search_by_400(self):
+        """Test rest_search_by method to HTTP 400 response."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/namespace/search_by/box_id/12?mode=fuzzy" % self.API_URL
+        response = api.open(url, method='GET')
+
+        self.assertEqual(response.status_code, 400)
+
     @patch('napps.kytos.storehouse.main.Main.search_metadata_by')
     def test_rest_search_by_404(self, mock_search_metadata_by):
         """Test rest_search_by method to HTTP 404 response."""
@@ -253,9 +708,103 @@ class TestMain(TestCase):
 
         self.assertEqual(response.status_code, 404)
 
+    def test_rest_cache_stats(self):
+        """Test rest_cache_stats method."""
+        self.napp.box_cache.put(Box('any', 'namespace', '123'))
+        self.napp.box_cache.get('namespace', '123')
+
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/cache/stats" % self.API_URL
+        response = api.open(url, method='GET')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['hits'], 1)
+        self.assertEqual(response.json['entries'], 1)
+
+    def test_rest_delete_invalidates_cache(self):
+        """Test rest_delete method removes the box from the box cache."""
+        self.napp.box_cache.put(Box('any', 'namespace', '123'))
+        self.napp.backend.delete.return_value = True
+
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/namespace/123" % self.API_URL
+        api.open(url, method='DELETE')
+
+        self.assertIsNone(self.napp.box_cache.get('namespace', '123'))
+
+    def test_rest_warmup_status(self):
+        """Test rest_warmup_status method."""
+        self.napp.warmup.start(['namespace'])
+
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/cache/warmup" % self.API_URL
+        response = api.open(url, method='GET')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['state'], 'running')
+        self.assertEqual(response.json['namespaces_total'], 1)
+
+    def test_rest_metrics(self):
+        """Test rest_metrics method answering in the Prometheus format."""
+        self.napp.box_cache.get('namespace', '123')
+
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/metrics" % self.API_URL
+        response = api.open(url, method='GET')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.mimetype.startswith('text/plain'))
+        self.assertIn('storehouse_cache_misses_total 1',
+                      response.get_data(as_text=True))
+
+    @patch('napps.kytos.storehouse.main.PROFILER')
+    def test_rest_profile(self, mock_profiler):
+        """Test rest_profile_* methods starting and stopping a profile."""
+        mock_profiler.start.side_effect = [{'state': 'running'},
+                                           RuntimeError('running'),
+                                           ValueError('mode')]
+        mock_profiler.stop.side_effect = [True, False]
+        mock_profiler.status.return_value = {'state': 'done'}
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/profile" % self.API_URL
+
+        started = api.post(url, json={'mode': 'memory', 'seconds': 5})
+        running = api.post(url, json={})
+        invalid = api.post(url, json={'mode': 'disk'})
+        stopped = api.delete(url)
+        not_running = api.delete(url)
+
+        mock_profiler.start.assert_any_call('memory', 5)
+        mock_profiler.start.assert_any_call('cpu', 30)
+        self.assertEqual(started.status_code, 202)
+        self.assertEqual(running.status_code, 409)
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(stopped.status_code, 200)
+        self.assertEqual(not_running.status_code, 404)
+
+    @patch('napps.kytos.storehouse.main.PROFILER')
+    def test_rest_profile_result(self, mock_profiler):
+        """Test rest_profile_result method downloading the result."""
+        mock_profiler.status.return_value = {'state': 'done'}
+        mock_profiler.result.side_effect = [
+            (b'dump', 'application/octet-stream', 'storehouse.prof'), None]
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v1/profile/result" % self.API_URL
+
+        response = api.get(url + '?format=pstats')
+        missing = api.get(url)
+
+        mock_profiler.result.assert_any_call('pstats')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(), b'dump')
+        self.assertIn('storehouse.prof',
+                      response.headers['Content-Disposition'])
+        self.assertEqual(missing.status_code, 404)
+
     def test_rest_backup_200(self):
         """Test rest_backup method to HTTP 200 response."""
-        self.napp.backend.backup.return_value = 'backup'
+        box = Box('any', 'namespace', box_id='123')
+        self.napp.backend.backup.return_value = iter([box])
 
         api = get_test_client(self.napp.controller, self.napp)
         url = "%s/v1/backup/namespace/123" % self.API_URL
@@ -263,6 +812,70 @@ class TestMain(TestCase):
 
         self.napp.backend.backup.assert_called_with('namespace', '123')
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {'123': box.to_json()})
+
+    def test_rest_backup_stream(self):
+        """Test rest_backup_stream method returning JSON lines."""
+        boxes = [Box(index, 'namespace', box_id=str(index))
+                 for index in range(2)]
+        self.napp.backend.backup.return_value = iter(boxes)
+
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v2/backup/namespace/" % self.API_URL
+        response = api.open(url, method='GET')
+
+        self.napp.backend.backup.assert_called_with('namespace', None)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = response.data.decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [box.to_dict() for box in boxes])
+
+    def test_rest_backup_stream_gzip(self):
+        """Test rest_backup_stream method compressing the response."""
+        box = Box('any', 'namespace', box_id='123')
+        self.napp.backend.backup.return_value = iter([box])
+
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v2/backup/namespace/123" % self.API_URL
+        response = api.open(url, method='GET',
+                            headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.data)),
+                         box.to_dict())
+
+    def test_rest_backup_stream_interrupted(self):
+        """Test rest_backup_stream method ending with an error record."""
+        box = Box('any', 'namespace', box_id='123')
+
+        def boxes():
+            yield box
+            raise OSError('unreadable box')
+
+        self.napp.backend.backup.return_value = boxes()
+
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v2/backup/namespace/" % self.API_URL
+        response = api.open(url, method='GET',
+                            headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.status_code, 200)
+        lines = gzip.decompress(response.data).decode().splitlines()
+        self.assertEqual(json.loads(lines[0]), box.to_dict())
+        self.assertEqual(json.loads(lines[1]),
+                         {'error': 'Backup interrupted: unreadable box'})
+        self.assertEqual(len(lines), 2)
+
+    def test_rest_backup_stream_404(self):
+        """Test rest_backup_stream method to HTTP 404 response."""
+        self.napp.backend.backup.side_effect = [ValueError()]
+
+        api = get_test_client(self.napp.controller, self.napp)
+        url = "%s/v2/backup/namespace/123" % self.API_URL
+        response = api.open(url, method='GET')
+
+        self.assertEqual(response.status_code, 404)
 
     def test_rest_backup_404(self):
         """Test rest_backup method to HTTP 404 response."""
@@ -277,12 +890,12 @@ class TestMain(TestCase):
     @patch('napps.kytos.storehouse.main.Box')
     @patch('napps.kytos.storehouse.main.Main._execute_callback')
     @patch('napps.kytos.storehouse.main.Main.add_metadata_to_cache')
-    @patch('napps.kytos.storehouse.main.Main.search_metadata_by')
+    @patch('napps.kytos.storehouse.main.Main.box_exists')
     def test_event_create_success_case(self, *args):
         """Test event_create method to success case."""
-        (mock_search_metadata_by, mock_add_metadata_to_cache, _,
-         mock_box) = args
-        mock_search_metadata_by.return_value = False
+        (mock_box_exists, mock_add_metadata_to_cache, _, mock_box) = args
+        mock_box_exists.return_value = False
+        mock_box.return_value = Box('data', 'namespace', box_id='box_id')
 
         event = get_kytos_event_mock(name='kytos.storehouse.create',
                                      content={'namespace': 'namespace',
@@ -296,11 +909,11 @@ class TestMain(TestCase):
 
     @patch('napps.kytos.storehouse.main.Main._execute_callback')
     @patch('napps.kytos.storehouse.main.Main.add_metadata_to_cache')
-    @patch('napps.kytos.storehouse.main.Main.search_metadata_by')
+    @patch('napps.kytos.storehouse.main.Main.box_exists')
     def test_event_create_failure_case(self, *args):
         """Test event_create method to failure case."""
-        (mock_search_metadata_by, mock_add_metadata_to_cache, _) = args
-        mock_search_metadata_by.return_value = True
+        (mock_box_exists, mock_add_metadata_to_cache, _) = args
+        mock_box_exists.return_value = True
 
         event = get_kytos_event_mock(name='kytos.storehouse.create',
                                      content={'namespace': 'namespace',
@@ -312,6 +925,93 @@ class TestMain(TestCase):
         self.napp.backend.create.assert_not_called()
         mock_add_metadata_to_cache.assert_not_called()
 
+    @patch('napps.kytos.storehouse.main.Main._execute_callback')
+    def test_event_create_many_success_case(self, mock_execute_callback):
+        """Test event_create_many method to success case."""
+        self.napp.add_metadata_to_cache(Box('any', 'namespace', '2'))
+        event = get_kytos_event_mock(name='kytos.storehouse.create_many',
+                                     content={'namespace': 'namespace',
+                                              'boxes': [
+                                                  {'box_id': '1',
+                                                   'data': 'data'},
+                                                  {'box_id': '2',
+                                                   'data': 'data'}]})
+
+        self.napp.event_create_many(event)
+
+        boxes = self.napp.backend.create_many.call_args[0][0]
+        self.assertEqual([box.box_id for box in boxes], ['1'])
+        (_, result, error), _ = mock_execute_callback.call_args
+        self.assertEqual(result, {'1': boxes[0], '2': None})
+        self.assertIsInstance(error['2'], KeyError)
+
+    @patch('napps.kytos.storehouse.main.Main._execute_callback')
+    def test_event_create_many_duplicated_id(self, mock_execute_callback):
+        """Test event_create_many method with an id repeated in the batch."""
+        event = get_kytos_event_mock(name='kytos.storehouse.create_many',
+                                     content={'namespace': 'namespace',
+                                              'boxes': [
+                                                  {'box_id': '1',
+                                                   'data': 'first'},
+                                                  {'box_id': '1',
+                                                   'data': 'second'}]})
+
+        self.napp.event_create_many(event)
+
+        boxes = self.napp.backend.create_many.call_args[0][0]
+        self.assertEqual([box.data for box in boxes], ['first'])
+        (_, result, error), _ = mock_execute_callback.call_args
+        self.assertEqual(result, {'1': boxes[0]})
+        self.assertIsInstance(error['1'], KeyError)
+
+    @patch('napps.kytos.storehouse.main.Main._execute_callback')
+    def test_event_create_many_failure_case(self, mock_execute_callback):
+        """Test event_create_many method to failure case."""
+        event = get_kytos_event_mock(name='kytos.storehouse.create_many',
+                                     content={'namespace': 'namespace'})
+
+        self.napp.event_create_many(event)
+
+        self.napp.backend.create_many.assert_not_called()
+        (_, result, error), _ = mock_execute_callback.call_args
+        self.assertIsNone(result)
+        self.assertIsInstance(error, KeyError)
+
+    @patch('napps.kytos.storehouse.main.Main._execute_callback')
+    def test_event_retrieve_many(self, mock_execute_callback):
+        """Test event_retrieve_many method."""
+        self.napp.backend.retrieve_many.return_value = {'1': False}
+        event = get_kytos_event_mock(name='kytos.storehouse.retrieve_many',
+                                     content={'namespace': 'namespace',
+                                              'box_ids': ['1']})
+
+        self.napp.event_retrieve_many(event)
+
+        mock_execute_callback.assert_called_with(event, {'1': False}, None)
+
+    @patch('napps.kytos.storehouse.main.Main._execute_callback')
+    def test_event_delete_many(self, mock_execute_callback):
+        """Test event_delete_many method."""
+        self.napp.backend.delete_many.return_value = {'1': True}
+        event = get_kytos_event_mock(name='kytos.storehouse.delete_many',
+                                     content={'namespace': 'namespace',
+                                              'box_ids': ['1']})
+
+        self.napp.event_delete_many(event)
+
+        self.napp.backend.delete_many.assert_called_with('namespace', ['1'])
+        mock_execute_callback.assert_called_with(event, {'1': True}, None)
+
+    @patch('napps.kytos.storehouse.main.Main._execute_callback')
+    def test_event_delete_many_failure_case(self, mock_execute_callback):
+        """Test event_delete_many method to failure case."""
+        event = get_kytos_event_mock(name='kytos.storehouse.delete_many',
+                                     content={'namespace': 'namespace'})
+
+        self.napp.event_delete_many(event)
+
+        self.napp.backend.delete_many.assert_not_called()
+
     @patch('napps.kytos.storehouse.main.Main._execute_callback')
     def test_event_retrieve_success_case(self, mock_execute_callback):
         """Test event_retrieve method to success case."""
@@ -327,6 +1027,49 @@ class TestMain(TestCase):
         self.napp.backend.retrieve.assert_called_with('namespace', '123')
         mock_execute_callback.assert_called_with(event, box, None)
 
+    @patch('napps.kytos.storehouse.main.Main._execute_callback')
+    def test_event_retrieve_since_revision(self, mock_execute_callback):
+        """Test event_retrieve method with an up to date since_revision."""
+        box = stamp(Box('any', 'namespace', '123'))
+        self.napp.add_metadata_to_cache(box)
+        self.napp.backend.retrieve.return_value = box
+
+        for since, expected in ((box.revision, UNCHANGED),
+                                (box.revision - 1, box)):
+            event = get_kytos_event_mock(name='kytos.storehouse.retrieve',
+                                         content={'namespace': 'namespace',
+                                                  'box_id': '123',
+                                                  'since_revision': since})
+            self.napp.event_retrieve(event)
+            mock_execute_callback.assert_called_with(event, expected, None)
+        self.napp.backend.retrieve.assert_called_once_with('namespace', '123')
+
+    @patch('napps.kytos.storehouse.main.Main._execute_callback')
+    def test_event_retrieve_invalid_since_revision(self,
+                                                   mock_execute_callback):
+        """Test event_retrieve method with an invalid since_revision."""
+        box = stamp(Box('any', 'namespace', '123'))
+        self.napp.add_metadata_to_cache(box)
+
+        for since in ('abc', 1.5, [1], True):
+            event = get_kytos_event_mock(name='kytos.storehouse.retrieve',
+                                         content={'namespace': 'namespace',
+                                                  'box_id': '123',
+                                                  'since_revision': since})
+            self.napp.event_retrieve(event)
+            (_, result, error), _ = mock_execute_callback.call_args
+            self.assertIsNone(result)
+            self.assertIsInstance(error, ValueError)
+        self.napp.backend.retrieve.assert_not_called()
+
+        event = get_kytos_event_mock(name='kytos.storehouse.retrieve',
+                                     content={'namespace': 'namespace',
+                                              'box_id': '123',
+                                              'since_revision':
+                                                  str(box.revision)})
+        self.napp.event_retrieve(event)
+        mock_execute_callback.assert_called_with(event, UNCHANGED, None)
+
     @patch('napps.kytos.storehouse.main.Main._execute_callback')
     def test_event_retrieve_failure_case(self, mock_execute_callback):
         """Test event_retrieve method to failure case."""
@@ -343,20 +1086,52 @@ class TestMain(TestCase):
     @patch('napps.kytos.storehouse.main.Main._execute_callback')
     def test_event_update_success_case(self, mock_execute_callback):
         """Test event_update method to success case."""
-        box = MagicMock()
+        box = Box({}, 'namespace', box_id='123')
         self.napp.backend.retrieve.return_value = box
+        self.napp.backend.patch.return_value = stamp(box)
 
         event = get_kytos_event_mock(name='kytos.storehouse.update',
                                      content={'namespace': 'namespace',
                                               'box_id': '123'})
         self.napp.event_update(event)
 
-        self.napp.backend.update.assert_called_with('namespace', box)
+        self.napp.backend.patch.assert_called_with('namespace', '123', {},
+                                                   None)
+
+        event = get_kytos_event_mock(name='kytos.storehouse.update',
+                                     content={'namespace': 'namespace',
+                                              'box_id': '123',
+                                              'method': 'PUT',
+                                              'data': {'a': 1}})
+        self.napp.event_update(event)
+
+        namespace, updated, revision = self.napp.backend.update.call_args[0]
+        self.assertEqual((namespace, updated.box_id, updated.data, revision),
+                         ('namespace', '123', {'a': 1}, None))
+
+    @patch('napps.kytos.storehouse.main.Main._execute_callback')
+    def test_event_update_expected_revision(self, mock_execute_callback):
+        """Test event_update method with a stale expected_revision."""
+        self.napp.backend.patch.side_effect = RevisionConflict('conflict')
+
+        event = get_kytos_event_mock(name='kytos.storehouse.update',
+                                     content={'namespace': 'namespace',
+                                              'box_id': '123',
+                                              'data': {'a': 1},
+                                              'expected_revision': 5})
+        self.napp.event_update(event)
+
+        self.napp.backend.patch.assert_called_with('namespace', '123',
+                                                   {'a': 1}, 5)
+        _, data, error = mock_execute_callback.call_args[0]
+        self.assertIsNone(data)
+        self.assertIsInstance(error, RevisionConflict)
 
     @patch('napps.kytos.storehouse.main.Main._execute_callback')
     def test_event_update_failure_case(self, mock_execute_callback):
         """Test event_update method to failure case."""
         self.napp.backend.retrieve.return_value = None
+        self.napp.backend.patch.return_value = False
 
         event = get_kytos_event_mock(name='kytos.storehouse.update',
                                      content={'namespace': 'namespace',
@@ -364,6 +1139,9 @@ class TestMain(TestCase):
         self.napp.event_update(event)
 
         self.napp.backend.update.assert_not_called()
+        _, data, error = mock_execute_callback.call_args[0]
+        self.assertIsNone(data)
+        self.assertIsInstance(error, KeyError)
 
     @patch('napps.kytos.storehouse.main.Main._execute_callback')
     @patch('napps.kytos.storehouse.main.Main.delete_metadata_from_cache')
@@ -397,14 +1175,27 @@ class TestMain(TestCase):
     @patch('napps.kytos.storehouse.main.Main._execute_callback')
     def test_event_list_success_case(self, mock_execute_callback):
         """Test event_list method to success case."""
-        result = MagicMock()
-        self.napp.backend.list.return_value = result
+        self.napp.backend.list.return_value = iter(['123'])
 
         event = get_kytos_event_mock(name='kytos.storehouse.list',
                                      content={'namespace': 'namespace'})
         self.napp.event_list(event)
 
-        mock_execute_callback.assert_called_with(event, result, None)
+        mock_execute_callback.assert_called_with(event, ['123'], None)
+
+    @patch('napps.kytos.storehouse.main.Main._execute_callback')
+    def test_event_list_page(self, mock_execute_callback):
+        """Test event_list method returning a page of box_ids."""
+        self.napp.backend.list_page.return_value = ['123', '456']
+
+        event = get_kytos_event_mock(name='kytos.storehouse.list',
+                                     content={'namespace': 'namespace',
+                                              'limit': 1})
+        self.napp.event_list(event)
+
+        self.napp.backend.list_page.assert_called_with('namespace', 2, None)
+        mock_execute_callback.assert_called_with(
+            event, {'boxes': ['123'], 'next_cursor': 'MTIz'}, None)
 
     @patch('napps.kytos.storehouse.main.Main._execute_callback')
     def test_event_list_failure_case(self, mock_execute_callback):
@@ -0,0 +1,153 @@
+"""Test Manifest methods."""
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from napps.kytos.storehouse.backends.base import metadata_from_box
+from napps.kytos.storehouse.backends.manifest import (Manifest, Manifests,
+                                                      load_metadata, tagged)
+from napps.kytos.storehouse.main import Box
+
+
+class TestManifest(TestCase):
+    """Tests for the Manifest class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = Path(self.tmp_dir.name, 'manifests', 'namespace.jsonl')
+        self.manifest = Manifest(self.path)
+
+    def test_load_missing(self):
+        """Test load method without a manifest file."""
+        self.assertIsNone(self.manifest.load())
+
+    def test_add_remove_load(self):
+        """Test load method replaying additions and removals."""
+        self.manifest.add({'box_id': '1', 'owner': None, 'created_at': 'a'})
+        self.manifest.add({'box_id': '2', 'owner': None, 'created_at': 'b'})
+        self.manifest.remove('1')
+
+        self.assertEqual(self.manifest.load(),
+                         {'2': {'box_id': '2', 'owner': None,
+                                'created_at': 'b'}})
+
+    def test_add_many_remove_many(self):
+        """Test add_many and remove_many methods."""
+        self.manifest.add_many([{'box_id': str(i)} for i in range(3)])
+        self.manifest.remove_many(['0', '1'])
+
+        self.assertEqual(self.manifest.load(), {'2': {'box_id': '2'}})
+        self.assertEqual(len(self.path.read_text().splitlines()), 5)
+
+    def test_load_corrupted(self):
+        """Test load method with a corrupted manifest file."""
+        self.manifest.add({'box_id': '1', 'owner': None, 'created_at': 'a'})
+        with open(self.path, 'a') as manifest_file:
+            manifest_file.write('{"op": "add", "box_')
+
+        self.assertIsNone(self.manifest.load())
+
+    def test_load_compacts_journal(self):
+        """Test load method rewrites a journal with many dead entries."""
+        self.path.parent.mkdir()
+        self.path.write_text('{"op":"add","box_id":"1"}\n' * 100)
+
+        self.manifest.load()
+
+        self.assertEqual(len(self.path.read_text().splitlines()), 1)
+
+    def test_append_compacts_journal(self):
+        """Test appending rewrites a journal with many dead entries."""
+        for i in range(1000):
+            self.manifest.add({'box_id': str(i % 10), 'created_at': i})
+            self.manifest.remove(str(i % 5))
+
+        lines = len(self.path.read_text().splitlines())
+        self.assertLessEqual(lines, 2 * 10 + Manifest.COMPACTION_SLACK + 2)
+        self.assertEqual(self.manifest.load()['9'],
+                         {'box_id': '9', 'created_at': 999})
+        self.assertNotIn('4', self.manifest.load())
+
+    def test_append_keeps_live_entries(self):
+        """Test appending does not rewrite a journal of live entries."""
+        self.manifest.add_many([{'box_id': str(i)} for i in range(500)])
+
+        self.assertEqual(len(self.path.read_text().splitlines()), 500)
+
+    def test_rewrite(self):
+        """Test rewrite method."""
+        self.manifest.add({'box_id': '1', 'owner': None, 'created_at': 'a'})
+        self.manifest.rewrite({'2': {'box_id': '2', 'owner': None,
+                                     'created_at': 'b'}})
+
+        self.assertEqual(list(self.manifest.load()), ['2'])
+
+    def test_manifests_get(self):
+        """Test Manifests.get returns one manifest per namespace."""
+        manifests = Manifests(self.tmp_dir.name)
+
+        self.assertIs(manifests.get('namespace'), manifests.get('namespace'))
+        self.assertEqual(manifests.get('namespace').path,
+                         Path(self.tmp_dir.name, 'namespace.jsonl'))
+
+    def test_load_metadata_from_manifest(self):
+        """Test load_metadata function with a valid manifest."""
+        metadata = {'box_id': '1', 'owner': None, 'created_at': 'a'}
+        self.manifest.add(tagged(metadata, [1, 2]))
+        retrieve = MagicMock()
+
+        self.assertEqual(load_metadata(self.manifest, {'1': [1, 2]},
+                                       retrieve),
+                         [metadata])
+        retrieve.assert_not_called()
+
+    def test_load_metadata_rebuild(self):
+        """Test load_metadata function with a stale manifest."""
+        self.manifest.add({'box_id': '1', 'owner': None, 'created_at': 'a'})
+        box = Box('any', 'namespace', box_id='2')
+        retrieve = MagicMock(return_value=box)
+
+        self.assertEqual(load_metadata(self.manifest, {'2': [1]}, retrieve),
+                         [metadata_from_box(box)])
+        retrieve.assert_called_once_with('2')
+        self.assertEqual(self.manifest.load(),
+                         {'2': tagged(metadata_from_box(box), [1])})
+
+    def test_load_metadata_out_of_date(self):
+        """Test load_metadata function reading boxes with another tag."""
+        old = {'box_id': '1', 'owner': None, 'created_at': 'a'}
+        kept = {'box_id': '2', 'owner': None, 'created_at': 'b'}
+        self.manifest.add_many([tagged(old, [1]), tagged(kept, [2])])
+        new = Box('any', 'namespace', box_id='1')
+        retrieve = MagicMock(return_value=new)
+
+        metadata = load_metadata(self.manifest, {'1': [3], '2': [2]},
+                                 retrieve)
+
+        self.assertEqual(metadata, [metadata_from_box(new), kept])
+        retrieve.assert_called_once_with('1')
+
+    def test_load_metadata_unreadable_box(self):
+        """Test load_metadata function skipping a box it cannot read."""
+        box = Box('any', 'namespace', box_id='2')
+        retrieve = MagicMock(side_effect=[False, box])
+
+        metadata = load_metadata(self.manifest, {'1': [1], '2': [2]},
+                                 retrieve)
+
+        self.assertEqual(metadata, [metadata_from_box(box)])
+        self.assertEqual(list(self.manifest.load()), ['2'])
+
+    def test_retag_many(self):
+        """Test retag_many method only moving entries with the old tag."""
+        self.manifest.add_many([tagged({'box_id': '1'}, [1]),
+                                tagged({'box_id': '2'}, [2])])
+
+        self.manifest.retag_many([('1', [1], [5]), ('2', [9], [6])])
+
+        self.assertEqual(self.manifest.load(),
+                         {'1': {'box_id': '1', 'tag': [5]},
+                          '2': {'box_id': '2', 'tag': [2]}})
@@ -0,0 +1,95 @@
+"""Test the operation metrics."""
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from napps.kytos.storehouse.main import Box
+from napps.kytos.storehouse.metrics import (InstrumentedBackend, Metrics,
+                                            timed_handler)
+
+
+class TestMetrics(TestCase):
+    """Tests for the Metrics class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.metrics = Metrics()
+
+    def test_render_histogram(self):
+        """Test histograms are cumulative and labeled."""
+        self.metrics.observe(('backend', 'retrieve', 'namespace'), 0.002)
+        self.metrics.observe(('backend', 'retrieve', 'namespace'), 20, True)
+
+        text = self.metrics.render()
+
+        labels = 'operation="retrieve",namespace="namespace"'
+        self.assertIn(f'storehouse_backend_seconds_bucket{{{labels},'
+                      'le="0.001"} 0', text)
+        self.assertIn(f'storehouse_backend_seconds_bucket{{{labels},'
+                      'le="0.0025"} 1', text)
+        self.assertIn(f'storehouse_backend_seconds_bucket{{{labels},'
+                      'le="+Inf"} 2', text)
+        self.assertIn(f'storehouse_backend_seconds_count{{{labels}}} 2', text)
+        self.assertIn(f'storehouse_backend_errors_total{{{labels}}} 1', text)
+
+    def test_render_counters(self):
+        """Test the bytes, cache and write pipeline counters."""
+        self.metrics.add_bytes('read', 10)
+        self.metrics.add_bytes('written', 20)
+        cache = {'hits': 3, 'misses': 1, 'evictions': 0, 'entries': 2}
+        writes = MagicMock(groups=4, writes=9)
+
+        text = self.metrics.render(cache, writes)
+
+        self.assertIn('storehouse_read_bytes_total 10', text)
+        self.assertIn('storehouse_written_bytes_total 20', text)
+        self.assertIn('storehouse_cache_hit_ratio 0.75', text)
+        self.assertIn('storehouse_write_groups_total 4', text)
+
+    def test_escape_labels(self):
+        """Test label values are escaped."""
+        self.metrics.observe(('handler', 'rest_list', 'a"b'), 0.1)
+
+        self.assertIn('namespace="a\\"b"', self.metrics.render())
+
+    def test_instrumented_backend(self):
+        """Test the backend calls are timed by namespace."""
+        backend = MagicMock()
+        backend.delete.side_effect = OSError
+        instrumented = InstrumentedBackend(backend, self.metrics)
+
+        instrumented.create(Box('any', 'namespace'))
+        with self.assertRaises(OSError):
+            instrumented.delete('other', '123')
+
+        text = self.metrics.render()
+        self.assertIn('storehouse_backend_seconds_count{operation="create",'
+                      'namespace="namespace"} 1', text)
+        self.assertIn('storehouse_backend_errors_total{operation="delete",'
+                      'namespace="other"} 1', text)
+
+    def test_unknown_namespaces(self):
+        """Test namespaces that do not exist share a single label."""
+        self.metrics.namespace_exists = {'namespace'}.__contains__
+        for namespace in ['namespace', 'random1', 'random2']:
+            self.metrics.observe(('handler', 'rest_retrieve', namespace), 0.01)
+
+        text = self.metrics.render()
+        self.assertIn('storehouse_handler_seconds_count{handler='
+                      '"rest_retrieve",namespace="namespace"} 1', text)
+        self.assertIn('storehouse_handler_seconds_count{handler='
+                      '"rest_retrieve",namespace="_other"} 2', text)
+        self.assertNotIn('random', text)
+
+    def test_timed_handler(self):
+        """Test REST handlers answering 5xx are counted as errors."""
+        @timed_handler
+        def rest_fail(napp, namespace):
+            # pylint: disable=unused-argument
+            return 'error', 500
+
+        with patch('napps.kytos.storehouse.metrics.METRICS',
+                   self.metrics):
+            rest_fail(None, namespace='namespace')
+
+        self.assertIn('storehouse_handler_errors_total{handler="rest_fail",'
+                      'namespace="namespace"} 1', self.metrics.render())
@@ -0,0 +1,113 @@
+"""Test the write pipeline."""
+import threading
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from napps.kytos.storehouse.main import Box
+from napps.kytos.storehouse.pipeline import WritePipeline
+
+
+class TestWritePipeline(TestCase):
+    """Tests for the WritePipeline class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.backend = MagicMock()
+
+    def _open(self, durability, **kwargs):
+        pipeline = WritePipeline(self.backend, durability, **kwargs)
+        self.addCleanup(pipeline.close)
+        return pipeline
+
+    def test_invalid_durability(self):
+        """Test unknown policies raise ValueError."""
+        with self.assertRaises(ValueError):
+            WritePipeline(self.backend, 'always')
+
+    def test_none(self):
+        """Test writes are not synced with the none policy."""
+        self.backend.delete.return_value = True
+
+        result = self._open('none').submit('delete', 'namespace', '123')
+
+        self.assertTrue(result)
+        self.backend.delete.assert_called_once_with('namespace', '123')
+        self.backend.sync.assert_not_called()
+
+    def test_write(self):
+        """Test every write is synced with the write policy."""
+        pipeline = self._open('write')
+
+        pipeline.submit('patch', 'namespace', '123', {'a': 1})
+        pipeline.submit('delete', 'namespace', '123')
+
+        self.assertEqual(self.backend.sync.call_count, 2)
+
+    def test_group(self):
+        """Test concurrent writes are committed and synced together."""
+        pipeline = self._open('group', interval=0.5, max_batch=4)
+        boxes = [Box('any', 'namespace', box_id=str(i)) for i in range(4)]
+        results = {}
+
+        def create(box):
+            results[box.box_id] = pipeline.submit('create', box)
+
+        threads = [threading.Thread(target=create, args=(box,))
+                   for box in boxes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {box.box_id: box.box_id for box in boxes})
+        self.backend.create_many.assert_called_once()
+        self.assertEqual(len(self.backend.create_many.call_args[0][0]), 4)
+        self.backend.sync.assert_called_once()
+        self.assertEqual((pipeline.groups, pipeline.writes), (1, 4))
+
+    def test_group_keeps_order(self):
+        """Test the writes of a group are applied in order."""
+        pipeline = self._open('group', interval=0.5, max_batch=3)
+        box = Box('any', 'namespace', box_id='1')
+        group = [('create', (box,)), ('delete', ('namespace', '1')),
+                 ('create', (box,))]
+        futures = [MagicMock() for _ in group]
+
+        pipeline._commit([(*write, future)
+                          for write, future in zip(group, futures)])
+
+        self.assertEqual([call[0] for call in self.backend.method_calls],
+                         ['create', 'delete', 'create', 'sync'])
+
+    def test_group_errors(self):
+        """Test only the failing writes of a group raise."""
+        pipeline = self._open('group', interval=0)
+        self.backend.create_many.side_effect = OSError
+        self.backend.create.side_effect = ['1', OSError('disk full')]
+        futures = [MagicMock(), MagicMock()]
+        boxes = [Box('any', 'namespace', box_id=box_id)
+                 for box_id in ('1', '2')]
+
+        pipeline._commit([('create', (box,), future)
+                          for box, future in zip(boxes, futures)])
+
+        futures[0].set_result.assert_called_once_with('1')
+        futures[1].set_exception.assert_called_once()
+
+    def test_group_sync_error(self):
+        """Test every write of a group raises if the sync fails."""
+        pipeline = self._open('group', interval=0)
+        self.backend.sync.side_effect = OSError('disk full')
+
+        with self.assertRaises(OSError):
+            pipeline.submit('delete', 'namespace', '123')
+
+    def test_close(self):
+        """Test close stops the committer and later writes are synced."""
+        pipeline = self._open('group', interval=0)
+        pipeline.close()
+
+        pipeline.submit('delete', 'namespace', '123')
+
+        self.backend.delete.assert_called_once_with('namespace', '123')
+        self.backend.sync.assert_called_once()
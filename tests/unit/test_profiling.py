@@ -0,0 +1,137 @@
+"""Test the slow operation log and the profiler."""
+import marshal
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from napps.kytos.storehouse.profiling import (Profiler, TimedLock, current,
+                                              phase, track)
+
+
+class TestTrack(TestCase):
+    """Tests for the tracked operations and their phases."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        patch('napps.kytos.storehouse.settings.SLOW_OPERATION_THRESHOLD', 1,
+              create=True).start()
+        self.mock_log = patch('napps.kytos.storehouse.profiling.log').start()
+        self.addCleanup(patch.stopall)
+
+    def test_phases(self):
+        """Test nested phases pause the phase around them."""
+        with track('retrieve', 'namespace', '123'):
+            operation = current()
+            with phase('io'):
+                time.sleep(0.01)
+                with phase('lock'):
+                    time.sleep(0.02)
+            with phase('io'):
+                pass
+
+        self.assertIsNone(current())
+        self.assertGreaterEqual(operation.phases['lock'], 0.02)
+        self.assertGreaterEqual(operation.phases['io'], 0.01)
+        self.assertLess(operation.phases['io'], 0.02)
+
+    def test_slow_operation_logged(self):
+        """Test operations over the threshold are logged with their phases."""
+        with track('rest_retrieve', 'namespace', '123'):
+            with track('retrieve', 'namespace', '123'), phase('io'):
+                time.sleep(0.005)
+
+        self.mock_log.warning.assert_called_once()
+        message = self.mock_log.warning.call_args[0][0]
+        self.assertIn("Slow operation rest_retrieve on namespace "
+                      "'namespace', box '123'", message)
+        self.assertIn('io ', message)
+
+    def test_fast_operation_not_logged(self):
+        """Test operations under the threshold are not logged."""
+        with patch('napps.kytos.storehouse.settings.SLOW_OPERATION_THRESHOLD',
+                   0):
+            with track('retrieve'):
+                self.assertIsNone(current())
+
+        with track('retrieve'):
+            pass
+
+        self.mock_log.warning.assert_not_called()
+
+    def test_timed_lock(self):
+        """Test the waits for a TimedLock are in the 'lock' phase."""
+        lock = TimedLock(threading.Lock())
+        holder = threading.Timer(0.02, lock.__exit__)
+        lock.__enter__()
+        holder.start()
+
+        with track('create'):
+            operation = current()
+            with lock:
+                pass
+
+        self.assertGreaterEqual(operation.phases['lock'], 0.01)
+
+
+class TestProfiler(TestCase):
+    """Tests for the Profiler class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.profiler = Profiler()
+        patch('napps.kytos.storehouse.profiling.PROFILER',
+              self.profiler).start()
+        patch('napps.kytos.storehouse.profiling.log').start()
+        self.addCleanup(patch.stopall)
+        self.addCleanup(self.profiler.stop)
+
+    def test_cpu_profile(self):
+        """Test a cpu profile covers the tracked operations."""
+        def slow_function():
+            return sum(range(1000))
+
+        self.profiler.start('cpu', 10)
+        with track('retrieve'):
+            slow_function()
+        with self.assertRaises(RuntimeError):
+            self.profiler.start('cpu', 10)
+        self.assertIsNone(self.profiler.result())
+        self.assertTrue(self.profiler.stop())
+
+        text, mimetype, _ = self.profiler.result()
+        dump, _, _ = self.profiler.result('pstats')
+        self.assertEqual(self.profiler.status()['operations'], 1)
+        self.assertEqual(mimetype, 'text/plain')
+        self.assertIn('slow_function', text)
+        self.assertTrue(any(function[2] == 'slow_function'
+                            for function in marshal.loads(dump)))
+
+    def test_memory_profile(self):
+        """Test a memory profile reports the allocations of the window."""
+        self.profiler.start('memory', 10)
+        allocated = [bytearray(1024) for _ in range(100)]
+        self.profiler.stop()
+
+        text, _, _ = self.profiler.result()
+        self.assertIn('test_profiling.py', text)
+        self.assertEqual(len(allocated), 100)
+        with self.assertRaises(ValueError):
+            self.profiler.result('pstats')
+
+    def test_window(self):
+        """Test profiles stop by themselves after their window."""
+        self.profiler.start('cpu', 0.01)
+        time.sleep(0.1)
+
+        self.assertEqual(self.profiler.status()['state'], 'done')
+
+    def test_invalid(self):
+        """Test invalid modes and windows are refused."""
+        with self.assertRaises(ValueError):
+            self.profiler.start('disk', 10)
+        with self.assertRaises(ValueError):
+            self.profiler.start('cpu', 0)
+        with self.assertRaises(ValueError):
+            self.profiler.start('cpu', 'ten')
+        self.assertEqual(self.profiler.status()['state'], 'idle')
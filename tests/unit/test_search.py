@@ -0,0 +1,126 @@
+"""Test MetadataIndex methods."""
+from unittest import TestCase
+
+from napps.kytos.storehouse.search import FieldIndex, MetadataIndex, ngrams
+
+
+class TestFieldIndex(TestCase):
+    """Tests for the FieldIndex class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.index = FieldIndex()
+        for box_id, value in [('1', 'switch_a'), ('2', 'switch_b'),
+                              ('3', 'link_a'), ('4', 'switch_a')]:
+            self.index.add(value, box_id)
+
+    def test_ngrams(self):
+        """Test ngrams function."""
+        self.assertEqual(ngrams('abcd'), {'abc', 'bcd'})
+        self.assertEqual(ngrams('ab'), set())
+
+    def test_exact(self):
+        """Test exact method."""
+        self.assertEqual(self.index.exact('switch_a'), {'1', '4'})
+        self.assertEqual(self.index.exact('switch'), set())
+
+    def test_prefix(self):
+        """Test prefix method."""
+        self.assertEqual(self.index.prefix('switch'), {'1', '2', '4'})
+        self.assertEqual(self.index.prefix('port'), set())
+
+    def test_contains(self):
+        """Test contains method with short and long queries."""
+        self.assertEqual(self.index.contains('_a'), {'1', '3', '4'})
+        self.assertEqual(self.index.contains('tch_b'), {'2'})
+        self.assertEqual(self.index.contains('xyz'), set())
+
+    def test_regex(self):
+        """Test regex method."""
+        self.assertEqual(self.index.regex('^link|_b$'), {'2', '3'})
+
+    def test_remove(self):
+        """Test remove method cleans every structure."""
+        self.index.remove('switch_b', '2')
+        self.index.remove('switch_a', '1')
+
+        self.assertEqual(self.index.prefix('switch'), {'4'})
+        self.assertNotIn('switch_b', self.index.sorted_values)
+        self.assertNotIn('h_b', self.index.ngrams)
+
+
+class TestMetadataIndex(TestCase):
+    """Tests for the MetadataIndex class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.index = MetadataIndex()
+        self.index.add('namespace', {'box_id': '123', 'owner': None,
+                                     'created_at': '2021-01-01'})
+        self.index.add('namespace', {'box_id': '1234', 'owner': 'of_core',
+                                     'created_at': '2021-01-02'})
+
+    def test_search(self):
+        """Test search method with every mode."""
+        search = self.index.search
+        self.assertEqual(len(search('namespace', 'box_id', '123', 'exact')),
+                         1)
+        self.assertEqual(len(search('namespace', 'box_id', '12', 'prefix')),
+                         2)
+        self.assertEqual(len(search('namespace', 'created_at', '01-0')), 2)
+        self.assertEqual(search('namespace', 'owner', 'core$', 'regex'),
+                         [{'box_id': '1234', 'owner': 'of_core',
+                           'created_at': '2021-01-02', 'revision': None,
+                           'hash': None}])
+
+    def test_search_escapes_query(self):
+        """Test contains mode does not interpret the query as a regex."""
+        self.assertEqual(self.index.search('namespace', 'box_id', '.*'), [])
+
+    def test_search_unknown(self):
+        """Test search method with unknown namespace and field."""
+        self.assertEqual(self.index.search('other', 'box_id', '1'), [])
+        self.assertEqual(self.index.search('namespace', 'name', '1'), [])
+
+    def test_search_invalid(self):
+        """Test search method with invalid mode and regex."""
+        with self.assertRaises(ValueError):
+            self.index.search('namespace', 'box_id', '1', 'fuzzy')
+        with self.assertRaises(ValueError):
+            self.index.search('namespace', 'box_id', '(', 'regex')
+
+    def test_add_overwrites(self):
+        """Test add method replaces the previous metadata of a box."""
+        self.index.add('namespace', {'box_id': '123', 'owner': 'topology',
+                                     'created_at': '2021-01-03'})
+
+        self.assertEqual(self.index.search('namespace', 'owner', 'topology'),
+                         [{'box_id': '123', 'owner': 'topology',
+                           'created_at': '2021-01-03', 'revision': None,
+                           'hash': None}])
+        self.assertEqual(
+            self.index.search('namespace', 'created_at', '2021-01-01'), [])
+
+    def test_remove(self):
+        """Test remove method."""
+        self.index.remove('namespace', '123')
+        self.index.remove('namespace', 'missing')
+
+        self.assertEqual(len(self.index.search('namespace', 'box_id', '12')),
+                         1)
+
+    def test_records(self):
+        """Test the records, exists and get methods."""
+        self.index.add_namespace('empty')
+
+        self.assertEqual(self.index.records['empty'], {})
+        self.assertEqual(self.index.records['namespace']['1234'],
+                         ('of_core', '2021-01-02', None, None))
+        self.assertTrue(self.index.exists('namespace', '123'))
+        self.assertFalse(self.index.exists('namespace', '12'))
+        self.assertFalse(self.index.exists('other', '123'))
+        self.assertEqual(self.index.get('namespace', '123'),
+                         {'box_id': '123', 'owner': None,
+                          'created_at': '2021-01-01', 'revision': None,
+                          'hash': None})
+        self.assertIsNone(self.index.get('namespace', '12'))
@@ -0,0 +1,127 @@
+"""Test the box serializers."""
+import os
+import pickle
+from unittest import TestCase, skipIf
+
+from napps.kytos.storehouse.backends.serializers import (HEADER, JSON, LZMA,
+                                                         MAGIC, MSGPACK,
+                                                         PICKLE, ZLIB,
+                                                         Serializer, msgpack)
+from napps.kytos.storehouse.main import Box
+
+
+class TestSerializer(TestCase):
+    """Tests for the Serializer class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.box = Box({'a': [1, 2], 'b': None}, 'namespace', box_id='123')
+        self.box.owner = 'owner'
+
+    def assert_same_box(self, box):
+        """Assert box has the same attributes as self.box."""
+        self.assertEqual(box.to_dict(), self.box.to_dict())
+
+    def test_json(self):
+        """Test the json serializer."""
+        record = Serializer('json').dumps(self.box)
+
+        self.assertEqual(HEADER.unpack_from(record), (MAGIC, JSON, 0))
+        self.assert_same_box(Serializer.loads(record))
+
+    def test_pickle(self):
+        """Test the pickle serializer."""
+        record = Serializer('pickle').dumps(self.box)
+
+        self.assertEqual(HEADER.unpack_from(record), (MAGIC, PICKLE, 0))
+        self.assert_same_box(Serializer.loads(record))
+
+    @skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack(self):
+        """Test the msgpack serializer."""
+        record = Serializer('msgpack').dumps(self.box)
+
+        self.assertEqual(HEADER.unpack_from(record), (MAGIC, MSGPACK, 0))
+        self.assert_same_box(Serializer.loads(record))
+
+    def test_legacy_pickle(self):
+        """Test records written without a header are unpickled."""
+        record = pickle.dumps(self.box)
+
+        self.assert_same_box(Serializer('json').loads(record))
+
+    def test_fallback_to_pickle(self):
+        """Test boxes that can not be encoded as JSON are pickled."""
+        box = Box({1, 2}, 'namespace', box_id='123')
+
+        record = Serializer('json').dumps(box)
+
+        self.assertEqual(HEADER.unpack_from(record)[1], PICKLE)
+        self.assertEqual(Serializer.loads(record).data, {1, 2})
+
+    def test_fallback_to_pickle_lossy_json(self):
+        """Test boxes with int keys or tuples are pickled, not changed."""
+        for data in [{1: 'a'}, {'a': (1, 2)}, [{'a': {2: None}}]]:
+            box = Box(data, 'namespace', box_id='123')
+
+            record = Serializer('json').dumps(box)
+
+            self.assertEqual(HEADER.unpack_from(record)[1], PICKLE)
+            self.assertEqual(Serializer.loads(record).data, data)
+
+    @skipIf(msgpack is None, 'msgpack is not installed')
+    def test_fallback_to_pickle_lossy_msgpack(self):
+        """Test boxes with tuples are pickled, int keys kept in msgpack."""
+        serializer = Serializer('msgpack')
+        tuples = serializer.dumps(Box({'a': (1, 2)}, 'namespace'))
+        int_keys = serializer.dumps(Box({1: 'a'}, 'namespace'))
+
+        self.assertEqual(HEADER.unpack_from(tuples)[1], PICKLE)
+        self.assertEqual(Serializer.loads(tuples).data, {'a': (1, 2)})
+        self.assertEqual(HEADER.unpack_from(int_keys)[1], MSGPACK)
+        self.assertEqual(Serializer.loads(int_keys).data, {1: 'a'})
+
+    def test_invalid_records(self):
+        """Test unknown names and record formats raise ValueError."""
+        with self.assertRaises(ValueError):
+            Serializer('xml')
+        with self.assertRaises(ValueError):
+            Serializer.loads(HEADER.pack(MAGIC, 9, 0) + b'payload')
+
+    def test_compression(self):
+        """Test large payloads are compressed with zlib and lzma."""
+        box = Box('x' * 10000, 'namespace', box_id='123')
+
+        for name, flag in (('zlib', ZLIB), ('lzma', LZMA)):
+            serializer = Serializer('json', compression=name)
+            record = serializer.dumps(box)
+
+            self.assertEqual(HEADER.unpack_from(record)[2], flag)
+            self.assertLess(len(record), 1000)
+            self.assertEqual(Serializer.loads(record).data, 'x' * 10000)
+
+    def test_compression_threshold(self):
+        """Test small and incompressible payloads are not compressed."""
+        serializer = Serializer('pickle', compression='zlib', threshold=1000)
+
+        small = serializer.dumps(self.box)
+        random = serializer.dumps(Box(os.urandom(1024), 'namespace'))
+
+        self.assertEqual(HEADER.unpack_from(small)[2], 0)
+        self.assertEqual(HEADER.unpack_from(random)[2], 0)
+
+    def test_compression_per_namespace(self):
+        """Test the codec of the closest parent namespace is used."""
+        serializer = Serializer('json', namespaces={'kytos': 'zlib',
+                                                    'kytos.of_lldp': None})
+
+        self.assertEqual(serializer.codec('kytos.topology.switches'), 'zlib')
+        self.assertIsNone(serializer.codec('kytos.of_lldp.interfaces'))
+        self.assertIsNone(serializer.codec('other'))
+        with self.assertRaises(ValueError):
+            Serializer('json', compression='bz2')
+
+    def test_corrupted_compressed_record(self):
+        """Test a corrupted compressed payload raises ValueError."""
+        with self.assertRaises(ValueError):
+            Serializer.loads(HEADER.pack(MAGIC, JSON, ZLIB) + b'payload')
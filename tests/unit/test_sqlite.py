@@ -0,0 +1,210 @@
+"""Test SQLite methods."""
+import os
+import sqlite3
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from napps.kytos.storehouse.backends.base import (NotFoundException,
+                                                  metadata_from_box, stamp)
+from napps.kytos.storehouse.backends.sqlite import SQLite
+from napps.kytos.storehouse.main import Box
+from napps.kytos.storehouse.tests.unit.store_tests import StoreTests
+
+
+# pylint: disable=protected-access
+class TestSQLite(StoreTests, TestCase):
+    """Tests for the SQLite class."""
+
+    store_class = SQLite
+
+    def store_settings(self, directory):
+        """Return the settings of a database in directory."""
+        return {'CUSTOM_SQLITE_PATH': os.path.join(directory, 'db.sqlite3')}
+
+    def _create_boxes(self):
+        for box_id, owner in (('abc', 'alice'), ('abd', 'bob'),
+                              ('xab', None)):
+            box = Box({'id': box_id}, 'namespace', box_id=box_id)
+            box.owner = owner
+            self.store.create(box)
+
+    def test_wal_mode(self):
+        """Test the database is opened in WAL mode."""
+        mode, = self.store._connection().execute(
+            'PRAGMA journal_mode').fetchone()
+
+        self.assertEqual(mode, 'wal')
+
+    def test_update_and_patch(self):
+        """Test update and patch methods."""
+        box = Box({'a': 1}, 'namespace', box_id='123')
+        self.store.create(box)
+        box.data = {'a': 2}
+        self.store.update('namespace', box)
+
+        self.assertTrue(self.store.patch('namespace', '123', {'b': 3}))
+        self.assertFalse(self.store.patch('namespace', '456', {'b': 3}))
+        self.assertEqual(self.store.retrieve('namespace', '123').data,
+                         {'a': 2, 'b': 3})
+
+    def test_revision(self):
+        """Test the revision and hash are stored in their own columns."""
+        self.store.create(stamp(Box({'a': 1}, 'namespace', box_id='123')))
+
+        patched = self.store.patch('namespace', '123', {'b': 2})
+
+        self.assertEqual(self.store.list_metadata('namespace'),
+                         [metadata_from_box(patched)])
+        self.assertEqual(self.store.retrieve('namespace', '123').revision,
+                         patched.revision)
+
+    def test_add_columns(self):
+        """Test the columns missing from an older database are added."""
+        self.store.close()
+        os.remove(self.store.destination_path)
+        connection = sqlite3.connect(str(self.store.destination_path))
+        connection.execute('CREATE TABLE boxes (namespace TEXT NOT NULL,'
+                           ' box_id TEXT NOT NULL, owner TEXT,'
+                           ' created_at TEXT, data BLOB NOT NULL,'
+                           ' PRIMARY KEY (namespace, box_id)) WITHOUT ROWID')
+        connection.close()
+
+        store = self._open()
+        store.create(stamp(Box('any', 'namespace', box_id='123')))
+
+        self.assertIsNotNone(store.head('namespace', '123')['revision'])
+
+    def test_many(self):
+        """Test create_many, retrieve_many and delete_many methods."""
+        self.store.create_many([Box('any', 'namespace', box_id='1'),
+                                Box('any', 'other', box_id='2')])
+
+        boxes = self.store.retrieve_many('namespace', ['1', '2'])
+        deleted = self.store.delete_many('namespace', ['1', '2'])
+
+        self.assertEqual(boxes['1'].data, 'any')
+        self.assertFalse(boxes['2'])
+        self.assertEqual(deleted, {'1': True, '2': False})
+        self.assertEqual(self.store.list_namespaces(), ['other'])
+
+    def test_create_many_is_atomic(self):
+        """Test a batch is not written if any box fails to serialize."""
+        boxes = [Box('any', 'namespace', box_id='1'),
+                 Box(threading.Lock(), 'namespace', box_id='2')]
+
+        with self.assertRaises(TypeError):
+            self.store.create_many(boxes)
+
+        self.assertEqual(self.store.list('namespace'), [])
+
+    def test_delete(self):
+        """Test delete method to success and failure cases."""
+        self.store.create(Box('any', 'namespace', box_id='123'))
+
+        self.assertTrue(self.store.delete('namespace', '123'))
+        self.assertFalse(self.store.delete('namespace', '123'))
+        self.assertFalse(self.store.retrieve('namespace', '123'))
+
+    def test_list(self):
+        """Test list, list_namespaces and list_metadata methods."""
+        self._create_boxes()
+        self.store.create(Box('any', 'other', box_id='123'))
+
+        self.assertEqual(self.store.list('namespace'), ['abc', 'abd', 'xab'])
+        self.assertEqual(self.store.list_namespaces(), ['namespace', 'other'])
+        self.assertEqual(self.store.list_metadata('namespace')[0]['owner'],
+                         'alice')
+        self.assertEqual(self.store.list('missing'), [])
+
+    def test_exists_and_head(self):
+        """Test exists and head methods."""
+        self._create_boxes()
+
+        self.assertTrue(self.store.exists('namespace', 'abc'))
+        self.assertFalse(self.store.exists('namespace', 'ab'))
+        self.assertGreater(self.store.head('namespace', 'abc')['size'], 0)
+        self.assertIsNone(self.store.head('namespace', 'ab'))
+
+    def test_list_page(self):
+        """Test list_page method reading the box_ids after the cursor."""
+        self._create_boxes()
+
+        self.assertEqual(self.store.list_page('namespace', 2), ['abc', 'abd'])
+        self.assertEqual(self.store.list_page('namespace', 2, after='abd'),
+                         ['xab'])
+
+    def test_search_metadata(self):
+        """Test search_metadata method with every mode."""
+        self._create_boxes()
+
+        def search(field, query, mode):
+            return [metadata['box_id'] for metadata in
+                    self.store.search_metadata('namespace', field, query,
+                                               mode)]
+
+        self.assertEqual(search('box_id', 'abd', 'exact'), ['abd'])
+        self.assertEqual(search('box_id', 'ab', 'prefix'), ['abc', 'abd'])
+        self.assertEqual(search('box_id', 'ab', 'contains'),
+                         ['abc', 'abd', 'xab'])
+        self.assertEqual(search('box_id', '%', 'contains'), [])
+        self.assertEqual(search('owner', '^b', 'regex'), ['abd'])
+        self.assertEqual(search('owner', '', 'prefix'), ['abc', 'abd'])
+        self.assertEqual(search('data', 'x', 'contains'), [])
+        with self.assertRaises(ValueError):
+            search('box_id', '(', 'regex')
+        with self.assertRaises(ValueError):
+            search('box_id', 'a', 'fuzzy')
+
+    def test_backup(self):
+        """Test backup method streaming a namespace."""
+        self._create_boxes()
+
+        boxes = self.store.backup('namespace')
+        box = next(self.store.backup('namespace', 'abd'))
+
+        self.assertEqual([box.box_id for box in boxes], ['abc', 'abd', 'xab'])
+        self.assertEqual(box.owner, 'bob')
+        with self.assertRaises(NotFoundException):
+            self.store.backup('missing')
+        with self.assertRaises(NotFoundException):
+            self.store.backup('namespace', 'missing')
+
+    def test_threads_share_the_database(self):
+        """Test boxes written by a thread are read by another one."""
+        thread = threading.Thread(target=self.store.create,
+                                  args=(Box('any', 'namespace', box_id='1'),))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(self.store.list('namespace'), ['1'])
+        self.assertEqual(len(self.store._connections), 1)
+
+    def test_thread_connections_are_closed(self):
+        """Test the connection of a thread is closed when it ends."""
+        self.store.create(Box('any', 'namespace', box_id='1'))
+        for _ in range(50):
+            thread = threading.Thread(target=self.store.exists,
+                                      args=('namespace', '1'))
+            thread.start()
+            thread.join()
+
+        self.assertLessEqual(len(self.store._connections), 2)
+
+    def test_reopen(self):
+        """Test boxes are kept when the database is opened again."""
+        self.store.create(Box('any', 'namespace', box_id='123'))
+        self.store.close()
+
+        store = self._open()
+
+        self.assertEqual(store.retrieve('namespace', '123').data, 'any')
+
+    @patch('os.fsync')
+    def test_sync(self, mock_fsync):
+        """Test sync method flushing the write-ahead log."""
+        self.store.create(Box('any', 'namespace', box_id='123'))
+
+        self.store.sync()
+
+        mock_fsync.assert_called_once()
@@ -0,0 +1,79 @@
+"""Test Warmup methods."""
+from unittest import TestCase
+
+from napps.kytos.storehouse.warmup import Warmup
+
+
+class TestWarmup(TestCase):
+    """Tests for the Warmup class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.warmup = Warmup()
+
+    def test_status_not_started(self):
+        """Test status method before the warmup starts."""
+        self.assertEqual(self.warmup.status()['state'], 'not started')
+        self.assertTrue(self.warmup.is_loaded('namespace'))
+
+    def test_namespace_loaded(self):
+        """Test the progress while namespaces are loaded."""
+        self.warmup.start(['ns1', 'ns2'])
+        self.assertFalse(self.warmup.is_loaded('ns1'))
+
+        self.warmup.namespace_loaded('ns1', 3)
+        status = self.warmup.status()
+        self.assertTrue(self.warmup.is_loaded('ns1'))
+        self.assertEqual(status['state'], 'running')
+        self.assertEqual(status['namespaces_loaded'], 1)
+        self.assertEqual(status['boxes_loaded'], 3)
+
+        self.warmup.namespace_loaded('ns2', 2)
+        status = self.warmup.status()
+        self.assertEqual(status['state'], 'done')
+        self.assertEqual(status['namespaces_total'], 2)
+        self.assertEqual(status['boxes_loaded'], 5)
+
+    def test_namespace_failed(self):
+        """Test a namespace that failed to load stays pending."""
+        self.warmup.start(['ns1', 'ns2'])
+        self.warmup.namespace_loaded('ns1', 3)
+
+        self.warmup.namespace_failed('ns2')
+        self.warmup.box_changed('ns2', '123')
+
+        status = self.warmup.status()
+        self.assertFalse(self.warmup.is_loaded('ns2'))
+        self.assertFalse(self.warmup.was_changed('ns2', '123'))
+        self.assertEqual(status['state'], 'done')
+        self.assertEqual((status['namespaces_loaded'],
+                          status['namespaces_failed']), (1, 1))
+
+    def test_start_without_namespaces(self):
+        """Test a warmup without namespaces is done right away."""
+        self.warmup.start([])
+
+        self.assertEqual(self.warmup.status()['state'], 'done')
+
+    def test_box_changed(self):
+        """Test changes are only remembered for pending namespaces."""
+        self.warmup.start(['ns1'])
+        self.warmup.box_changed('ns1', '123')
+        self.warmup.box_changed('ns2', '456')
+
+        self.assertTrue(self.warmup.was_changed('ns1', '123'))
+        self.assertFalse(self.warmup.was_changed('ns2', '456'))
+        self.warmup.namespace_loaded('ns1', 0)
+        self.assertFalse(self.warmup.was_changed('ns1', '123'))
+
+    def test_add_unchanged(self):
+        """Test add_unchanged skips the boxes changed during the warmup."""
+        self.warmup.start(['ns1'])
+        self.warmup.box_changed('ns1', '123')
+        added = []
+
+        count = self.warmup.add_unchanged(
+            'ns1', [{'box_id': '123'}, {'box_id': '456'}], added.append)
+
+        self.assertEqual(count, 1)
+        self.assertEqual(added, [{'box_id': '456'}])
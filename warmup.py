@@ -0,0 +1,114 @@
+"""Progress of the metadata cache warmup of the Storehouse NApp."""
+
+import time
+from threading import Lock
+
+
+class Warmup:
+    """Track which namespaces are already in the metadata cache.
+
+    Boxes created, updated or deleted in namespaces still being loaded are
+    remembered, so a loader holding an older listing does not overwrite
+    them in the cache with their previous metadata, or add them back.
+    Namespaces that failed to load stay pending, so they are served from
+    the backend.
+    """
+
+    def __init__(self):
+        self.namespaces_total = 0
+        self.boxes_loaded = 0
+        self.started_at = None
+        self.finished_at = None
+        self._loaded = set()
+        self._pending = set()
+        self._failed = set()
+        self._changed = {}
+        self._lock = Lock()
+
+    def start(self, namespaces):
+        """Register the namespaces that are going to be loaded."""
+        with self._lock:
+            self._pending = set(namespaces)
+            self._loaded = set()
+            self._failed = set()
+            self.namespaces_total = len(self._pending)
+            self.boxes_loaded = 0
+            self.started_at = time.monotonic()
+            self.finished_at = None if self._pending else self.started_at
+
+    def is_loaded(self, namespace):
+        """Return True if the namespace can be served from the cache."""
+        with self._lock:
+            return namespace not in self._pending
+
+    def box_changed(self, namespace, box_id):
+        """Remember a box changed while its namespace is being loaded.
+
+        It must be called before the change is applied to the cache.
+        """
+        with self._lock:
+            if namespace in self._pending - self._failed:
+                self._changed.setdefault(namespace, set()).add(box_id)
+
+    def was_changed(self, namespace, box_id):
+        """Return True if the box was changed during the warmup."""
+        with self._lock:
+            return box_id in self._changed.get(namespace, ())
+
+    def add_unchanged(self, namespace, metadata, add):
+        """Call add with the metadata of each box not changed meanwhile.
+
+        Each box is checked and added holding the lock, so a change
+        remembered by box_changed is never overwritten.
+
+        Returns:
+            int: number of boxes added.
+
+        """
+        added = 0
+        for record in metadata:
+            with self._lock:
+                if record['box_id'] in self._changed.get(namespace, ()):
+                    continue
+                add(record)
+            added += 1
+        return added
+
+    def namespace_loaded(self, namespace, boxes):
+        """Mark a namespace as loaded with the given number of boxes."""
+        with self._lock:
+            self._pending.discard(namespace)
+            self._changed.pop(namespace, None)
+            self._loaded.add(namespace)
+            self.boxes_loaded += boxes
+            self._check_finished()
+
+    def namespace_failed(self, namespace):
+        """Mark a namespace as failed to load, leaving it pending."""
+        with self._lock:
+            self._failed.add(namespace)
+            self._changed.pop(namespace, None)
+            self._check_finished()
+
+    def _check_finished(self):
+        """Record when every namespace is loaded or failed to load."""
+        if self._pending <= self._failed and self.finished_at is None:
+            self.finished_at = time.monotonic()
+
+    def status(self):
+        """Return the warmup progress as a dictionary."""
+        with self._lock:
+            if self.started_at is None:
+                state, elapsed = 'not started', 0
+            elif self.finished_at is None:
+                state = 'running'
+                elapsed = time.monotonic() - self.started_at
+            else:
+                state = 'done'
+                elapsed = self.finished_at - self.started_at
+            return {"state": state,
+                    "namespaces_total": self.namespaces_total,
+                    "namespaces_loaded": len(self._loaded),
+                    "namespaces_failed": len(self._failed),
+                    "boxes_loaded": self.boxes_loaded,
+                    "elapsed_seconds": round(elapsed, 3)}